@@ -1,17 +1,50 @@
 """
 FastAPI server for stores frontend chatbot widget.
 
+Chat transports (all share the graph, role routing and thread_id = user_id;
+turns on one thread run one at a time, see chat_turns.py):
+    /ws/chat            — websocket; single replies, or streamed frames with ?stream=true
+    POST /chat          — one JSON reply per request
+    GET|POST /chat/stream — the streamed frames as Server-Sent Events
+
 Usage:
     uvicorn FastAPI:app --host 0.0.0.0 --port 8000
 """
 
 import json
+import asyncio
+from contextlib import asynccontextmanager
 from graph import graph
+from catalog import catalog
+from order_warehouse import warehouse, WAREHOUSE_ENABLED
+from shopify_client import aclose_async_client
+from retry import retry_metrics
+from throttle import throttle_metrics
+from tool_cache import tool_cache_metrics
+from utils import coalesce_metrics
+from webhooks import TOPICS, verify_hmac, is_duplicate, dispatch
 from fastapi.middleware.cors import CORSMiddleware
-from langchain_core.messages import HumanMessage, AIMessage
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
+from chat_stream import turn_input, final_reply, stream_turn, sse_event
+from chat_turns import turns, Ticket, chat_turn_metrics
+from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query, Request, HTTPException, BackgroundTasks
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Full catalog load + incremental syncs run on a background thread
+    catalog.start()
+    if WAREHOUSE_ENABLED:
+        # First run loads every order; later runs only pull updated ones
+        warehouse.start()
+    yield
+    catalog.stop()
+    warehouse.stop()
+    await aclose_async_client()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # 1. FIX CORS: This allows your Shopify store to talk to this API
 app.add_middleware(
@@ -21,52 +54,221 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/metrics/shopify")
+def shopify_metrics():
+    """
+    Shopify query-cost bucket state (throttle.py), retry counters (retry.py),
+    catalog/order-warehouse freshness, tool result cache hit rates (tool_cache.py),
+    and how many GraphQL requests were shared between identical callers.
+    """
+    return {
+        "throttle": throttle_metrics(),
+        "retry": retry_metrics(),
+        "catalog": catalog.stats(),
+        "orders": warehouse.stats(),
+        "tool_cache": tool_cache_metrics(),
+        "coalescing": coalesce_metrics(),
+    }
+
+
+@app.post("/webhooks/{resource}/{event}")
+async def shopify_webhook(resource: str, event: str, request: Request, background_tasks: BackgroundTasks):
+    """
+    Receive a Shopify webhook (e.g. POST /webhooks/products/update).
+
+    The signature is checked against the raw body before anything is parsed;
+    cache updates run after the response so Shopify gets its 200 quickly.
+    """
+    topic = f"{resource}/{event}"
+    if topic not in TOPICS:
+        raise HTTPException(status_code=404, detail=f"Unsupported webhook topic: {topic}")
+
+    body = await request.body()
+    if not verify_hmac(body, request.headers.get("X-Shopify-Hmac-Sha256")):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    if is_duplicate(request.headers.get("X-Shopify-Webhook-Id")):
+        return {"status": "duplicate"}
+
+    background_tasks.add_task(dispatch, topic, json.loads(body))
+    return {"status": "accepted"}
+
+
+# ─────────────────────────────────────────────
+# Chat
+# ─────────────────────────────────────────────
+
+def _thread_config(user_id: str) -> dict:
+    return {"configurable": {"thread_id": user_id}}
+
+
+async def _reply(messages: list[str], role: str, config: dict) -> str:
+    """Run a whole turn and return the final reply text (or the error)."""
+    try:
+        # ainvoke awaits the LLM and Shopify calls, so other chats keep being served meanwhile.
+        result = await graph.ainvoke(turn_input(messages, role), config=config)
+        return final_reply(result.get("messages", []))
+    except Exception as e:
+        return f"Error processing request: {str(e)}"
+
+
+async def _reply_frames(messages: list[str], role: str, config: dict):
+    yield {"type": "done", "reply": await _reply(messages, role, config), "role": role}
+
+
+def _submit(user_id: str, message: str, role: str, stream: bool) -> Ticket:
+    """Queue a message on its thread (chat_turns.py); the ticket yields the answering turn's frames."""
+    config = _thread_config(user_id)
+    if stream:
+        run = lambda messages: stream_turn(graph, turn_input(messages, role), config, role)
+    else:
+        run = lambda messages: _reply_frames(messages, role, config)
+    return turns.submit(user_id, message, run)
+
+
+async def _frames(ticket: Ticket, role: str):
+    async for frame in ticket:
+        yield {"role": role, **frame} if frame["type"] == "done" else frame
+
+
+async def _done(ticket: Ticket, role: str) -> dict:
+    """The final frame of a ticket's turn."""
+    done = {}
+    async for frame in _frames(ticket, role):
+        done = frame
+    return done
+
+
+def _reply_body(done: dict) -> dict:
+    """Single-reply body; a turn cancelled by a newer message says so."""
+    body = {"reply": done.get("reply"), "role": done.get("role")}
+    return {**body, "cancelled": True} if done.get("cancelled") else body
+
+
 @app.websocket("/ws/chat")
 async def websocket_endpoint(
     websocket: WebSocket, 
     role: str = Query(...),   # "admin" or "customer"
-    user_id: str = Query(...) # Shopify Customer ID or Admin ID
+    user_id: str = Query(...), # Shopify Customer ID or Admin ID
+    stream: bool = Query(False), # True → token/tool/progress frames, then "done" (see chat_stream.py)
 ):
     await websocket.accept()
     print(f"New connection: Role={role}, ID={user_id}")
 
-    try:
-        while True:
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
-            user_msg = message_data.get("message")
-            
-            config = {"configurable": {"thread_id": user_id}}
-            state_input = {
-                "messages": [HumanMessage(content=user_msg)],
-                "user_role": role,
-                "active_agent": "customer_support_agent", 
-            }
+    # Messages are read while a turn runs, so the thread's busy mode (chat_turns.py)
+    # decides what a mid-turn message does; answers are sent in message order.
+    tickets: asyncio.Queue = asyncio.Queue()
+    unanswered: set[Ticket] = set()
+    connected = True
+
+    def cancel_unanswered():
+        for ticket in list(unanswered):
+            ticket.cancel()
 
-            try:
-                result = graph.invoke(state_input, config=config)
-                messages = result.get("messages", [])
-                
-                ai_response = "I'm sorry, I couldn't generate a response."
-                for msg in reversed(messages):
-                    if isinstance(msg, AIMessage):
-                        content = msg.content
-                        if isinstance(content, list):
-                            content = " ".join(
-                                b.get("text", "") for b in content 
-                                if isinstance(b, dict) and b.get("type") == "text"
-                            )
-                        ai_response = content
-                        break
-            except Exception as e:
-                ai_response = f"Error processing request: {str(e)}"
-
-            await websocket.send_text(json.dumps({
-                "reply": ai_response,
-                "role": role # Optional: echo back the role
-            }))
+    async def receive():
+        nonlocal connected
+        try:
+            while True:
+                data = await websocket.receive_text()
+                message_data = json.loads(data)
+                if message_data.get("type") == "cancel":
+                    # {"type": "cancel"} stops this connection's running and queued turns.
+                    cancel_unanswered()
+                    continue
+                # A message may override the connection's mode with {"stream": true|false}.
+                wants_stream = message_data.get("stream", stream)
+                ticket = _submit(user_id, message_data.get("message"), role, wants_stream)
+                unanswered.add(ticket)
+                await tickets.put((ticket, wants_stream))
+        except WebSocketDisconnect:
+            print(f"User {user_id} disconnected.")
+        finally:
+            # Nobody is left to answer: abandon the turns rather than run them to the end.
+            connected = False
+            cancel_unanswered()
+            tickets.put_nowait(None)
+
+    receiver = asyncio.create_task(receive())
+    try:
+        answered = None
+        while (item := await tickets.get()) is not None:
+            ticket, wants_stream = item
+            if not connected or ticket.turn is answered:
+                # Disconnected, or coalesced into the turn whose frames were just sent.
+                ticket.close()
+            elif wants_stream:
+                answered = ticket.turn
+                async for frame in _frames(ticket, role):
+                    if connected:
+                        await websocket.send_text(json.dumps(frame))
+            else:
+                answered = ticket.turn
+                done = await _done(ticket, role)
+                if connected and not done.get("cancelled"):
+                    await websocket.send_text(json.dumps(_reply_body(done)))
+            unanswered.discard(ticket)
     except WebSocketDisconnect:
         print(f"User {user_id} disconnected.")
+    finally:
+        receiver.cancel()
+        cancel_unanswered()
+
+
+class ChatRequest(BaseModel):
+    message: str
+    role: str      # "admin" or "customer"
+    user_id: str   # Shopify Customer ID or Admin ID; the conversation thread
+
+
+async def _cancel_on_disconnect(http_request: Request, ticket: Ticket) -> None:
+    while not await http_request.is_disconnected():
+        await asyncio.sleep(1)
+    ticket.cancel()
+
+
+@app.post("/chat")
+async def chat(request: ChatRequest, http_request: Request):
+    """One turn over plain HTTP: the same {"reply", "role"} body as the websocket's single-reply mode."""
+    ticket = _submit(request.user_id, request.message, request.role, stream=False)
+    # A client that hangs up mid-turn abandons it, as a websocket disconnect does.
+    watcher = asyncio.create_task(_cancel_on_disconnect(http_request, ticket))
+    try:
+        return _reply_body(await _done(ticket, request.role))
+    finally:
+        watcher.cancel()
+
+
+def _sse_response(message: str, role: str, user_id: str) -> StreamingResponse:
+    # When the client disconnects the response stops iterating, which closes the ticket and abandons the turn.
+    ticket = _submit(user_id, message, role, stream=True)
+    return StreamingResponse(
+        (sse_event(frame) async for frame in _frames(ticket, role)),
+        media_type="text/event-stream",
+        # No caching, and no proxy buffering (nginx honours X-Accel-Buffering) so tokens arrive as sent.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/chat/stream")
+async def chat_stream_post(request: ChatRequest):
+    """One turn as Server-Sent Events: the websocket's streamed frames, one event each."""
+    return _sse_response(request.message, request.role, request.user_id)
+
+
+@app.get("/chat/stream")
+async def chat_stream_get(
+    message: str = Query(...),
+    role: str = Query(...),     # "admin" or "customer"
+    user_id: str = Query(...),  # Shopify Customer ID or Admin ID
+):
+    """GET form of /chat/stream for EventSource clients, which can't POST."""
+    return _sse_response(message, role, user_id)
+
+
+@app.get("/metrics/chat")
+def chat_metrics():
+    """Turn scheduling per conversation thread (chat_turns.py): busy mode, queue depth, wait times."""
+    return chat_turn_metrics()
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -140,12 +342,23 @@ The frontend part layout/theme.liquid
         const sendBtn = document.getElementById('send-btn');
         const chatMessages = document.getElementById('chat-messages');
 
-        // 2. Pass role and id in the Connection URL
-        const socket = new WebSocket(`ws://localhost:8000/ws/chat?role=${userRole}&user_id=${userId}`);
+        // 2. Pass role and id in the Connection URL; stream=true sends the reply as it is generated
+        const socket = new WebSocket(`ws://localhost:8000/ws/chat?role=${userRole}&user_id=${userId}&stream=true`);
+
+        // Tokens grow one bot bubble; the "done" frame carries the full reply and ends the turn.
+        // "tool" and "progress" frames could drive a typing indicator; they are ignored here.
+        let botBubble = null;
 
         socket.onmessage = (event) => {
             const data = JSON.parse(event.data);
-            addMessage(data.reply, 'bot');
+            if (data.type === 'token') {
+                if (!botBubble) botBubble = addMessage('', 'bot');
+                botBubble.textContent += data.text;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            } else if (data.type === 'done') {
+                if (data.reply) (botBubble || addMessage('', 'bot')).textContent = data.reply;
+                botBubble = null;
+            }
         };
 
         function addMessage(text, sender) {
@@ -155,6 +368,7 @@ The frontend part layout/theme.liquid
             div.innerHTML = `<span style="background: ${sender === 'user' ? '#e1ffc7' : '#f0f0f0'}; padding: 8px; border-radius: 10px; display: inline-block;">${text}</span>`;
             chatMessages.appendChild(div);
             chatMessages.scrollTop = chatMessages.scrollHeight;
+            return div.firstElementChild;
         }
 
         sendBtn.onclick = () => {
@@ -10,42 +10,279 @@ Tools:
     get_refunded_orders        — Refunded/partially refunded orders.
     get_zero_sales_products    — Products with no paid sales in a period.
     get_recent_orders          — Orders placed in a given date range.
+
+Order reports are answered from the local order warehouse (order_warehouse.py)
+when it is enabled, and from live Shopify scans otherwise. Live aggregations
+over more orders than the page cap switch to a streamed bulk operation (bulk.py);
+if Shopify won't start one, the capped scan is used and the report says so.
+
+Report tools sit behind the shared result cache (tool_cache.py); repeated
+calls with equivalent arguments inside a tool's TTL are answered from it.
+
+Environment:
+    ADMIN_CACHE_TTL_REPORTS   — Seconds to cache period reports: revenue, comparisons,
+                                refunds, zero sales (default 120).
+    ADMIN_CACHE_TTL_ORDERS    — Seconds to cache order lists: unfulfilled, recent (default 30).
+    ADMIN_CACHE_TTL_INVENTORY — Seconds to cache low-inventory results (default 30).
 """
 
+import os
+import itertools
+import contextvars
+from contextlib import contextmanager
 from datetime import date
 from langchain.tools import tool
-from rapidfuzz import process, fuzz
-from utils import gql_paginated, summarize_order, is_same_string, format_money, PRODUCT_FIELDS, ORDER_FIELDS
+from throttle import PRIORITY_ANALYTICS
+from catalog import catalog, has_tag, CATALOG_ENABLED, MAX_AGE_BROWSE, MAX_AGE_INVENTORY
+from product_index import TitleIndex, catalog_index, acatalog_index
+from order_columns import OrderColumns
+from order_warehouse import warehouse, WAREHOUSE_ENABLED
+from bulk import bulk_orders, bulk_order_lines, should_bulk_orders, BulkOperationRejected, PAGE_CAP_ORDERS
+from tool_cache import cache_tool
+from cancellation import to_thread
+from utils import (
+    gql_paginated,
+    agql_paginated,
+    iter_gql_paginated,
+    created_at_slices,
+    run_bounded,
+    arun_bounded,
+    summarize_order,
+    format_money,
+)
+from queries import (
+    paginated_query,
+    order_summary_fields,
+    order_totals_fields,
+    order_revenue_fields,
+    order_titles_fields,
+    PRODUCT_TITLE,
+    PRODUCT_STOCK_FIELDS,
+)
 
 
 # ─────────────────────────────────────────────
 # Private Helpers
 # ─────────────────────────────────────────────
 
-def _fetch_orders_gql(query_filter: str) -> list:
-    """Fetch all orders matching a Shopify query filter string, paginated."""
-    query = f"""
-    query ($cursor: String, $query: String) {{
-        orders(first: 250, after: $cursor, query: $query) {{
-            pageInfo {{ hasNextPage endCursor }}
-            edges {{ node {{ {ORDER_FIELDS} }} }}
-        }}
-    }}
+# Each query selects only what its report reads (queries.py). Aggregations
+# carry (paginated query, bulk selection) pairs for _aggregate_orders.
+_ORDERS_QUERY = paginated_query("orders", order_summary_fields())
+_ORDER_TOTALS = (paginated_query("orders", order_totals_fields()), order_totals_fields(bulk=True))
+_ORDER_REVENUE = (paginated_query("orders", order_revenue_fields()), order_revenue_fields(bulk=True))
+_ORDER_TITLES = (paginated_query("orders", order_titles_fields()), order_titles_fields(bulk=True))
+
+_PRODUCT_STOCK_QUERY = paginated_query("products", PRODUCT_STOCK_FIELDS)
+_PRODUCT_TITLES_QUERY = paginated_query("products", PRODUCT_TITLE)
+
+
+def _fetch_orders_gql(query_filter: str, query: str = _ORDERS_QUERY, window: tuple[date, date] | None = None) -> list:
+    """
+    Fetch all orders matching a Shopify query filter string, paginated (analytics priority).
+    A created_at `window` the filter is bounded by is paginated as concurrent time slices.
+    """
+    return gql_paginated(
+        query,
+        variables={"query": query_filter},
+        data_path=["orders"],
+        priority=PRIORITY_ANALYTICS,
+        slices=created_at_slices(*window) if window else None,
+    )
+
+
+def _fetch_products_gql(query_filter: str = "status:active", query: str = _PRODUCT_STOCK_QUERY) -> list:
+    """Fetch all products matching a query filter, paginated (analytics priority)."""
+    return gql_paginated(
+        query,
+        variables={"query": query_filter},
+        data_path=["products"],
+        priority=PRIORITY_ANALYTICS,
+    )
+
+
+async def _afetch_orders_gql(query_filter: str, query: str = _ORDERS_QUERY, window: tuple[date, date] | None = None) -> list:
+    """Async variant of _fetch_orders_gql."""
+    return await agql_paginated(
+        query,
+        variables={"query": query_filter},
+        data_path=["orders"],
+        priority=PRIORITY_ANALYTICS,
+        slices=created_at_slices(*window) if window else None,
+    )
+
+
+async def _afetch_products_gql(query_filter: str = "status:active", query: str = _PRODUCT_STOCK_QUERY) -> list:
+    """Async variant of _fetch_products_gql."""
+    return await agql_paginated(
+        query,
+        variables={"query": query_filter},
+        data_path=["products"],
+        priority=PRIORITY_ANALYTICS,
+    )
+
+
+def _order_stream(
+    query_filter: str,
+    window: tuple[date, date],
+    projection: tuple[str, str],
+    flat: bool = False,
+    allow_bulk: bool = True,
+):
+    """
+    Every order matching the filter with only the projection's fields, as a
+    stream: pages are prefetched while the previous one is consumed, and
+    windows larger than the page cap come from a bulk operation instead of
+    being truncated. With `flat`, a bulk result is passed through as its raw
+    flattened lines rather than re-nested.
+
+    Each created_at slice is paginated up to its own page cap, so bulk is only
+    used when a slice would hit it. Only slices whose first page says there
+    is more to come are counted (one ordersCount round trip each); most
+    windows fit in one page per slice and cost no count at all.
+    """
+    query, bulk_fields = projection
+    more_pages = []
+    stream = iter_gql_paginated(
+        query,
+        variables={"query": query_filter},
+        data_path=["orders"],
+        priority=PRIORITY_ANALYTICS,
+        slices=created_at_slices(*window),
+        more_pages=more_pages,
+    )
+    if not allow_bulk:
+        return stream
+    first = next(stream, None)
+    if any(should_bulk_orders(slice_filter) for slice_filter in more_pages):
+        stream.close()
+        return (bulk_order_lines if flat else bulk_orders)(query_filter, bulk_fields)
+    return stream if first is None else itertools.chain([first], stream)
+
+
+# Notes for the report being built (e.g. a truncated scan), collected across
+# the worker threads it fans out to — they all share the caller's context.
+_report_notes: contextvars.ContextVar[list | None] = contextvars.ContextVar("report_notes", default=None)
+
+
+@contextmanager
+def _collecting_notes():
+    token = _report_notes.set([])
+    try:
+        yield _report_notes.get()
+    finally:
+        _report_notes.reset(token)
+
+
+def _note(message: str) -> None:
+    notes = _report_notes.get()
+    if notes is not None and message not in notes:
+        notes.append(message)
+
+
+def _with_notes(result, notes: list):
+    """Attach collected notes: a "notes" key on dict reports, trailing "Note: ..." lines on list reports."""
+    if not notes:
+        return result
+    if isinstance(result, dict):
+        return {**result, "notes": list(notes)}
+    if isinstance(result, list):
+        return result + [f"Note: {note}" for note in notes]
+    return result
+
+
+def _aggregate_orders(
+    query_filter: str,
+    window: tuple[date, date],
+    projection: tuple[str, str],
+    aggregate,
+    flat: bool = False,
+):
+    """
+    aggregate(orders) in one pass over _order_stream(); no full result list is
+    built. `flat` aggregates also accept flattened bulk lines.
+
+    A rejected bulk operation fails before any order is read, so the capped
+    paginated scan is aggregated instead and the report gets a note.
+    """
+    try:
+        return aggregate(_order_stream(query_filter, window, projection, flat))
+    except BulkOperationRejected as e:
+        print(f"Falling back to a capped scan for {query_filter!r}: {e}")
+        _note(
+            f"Shopify did not start a bulk export (another may be running), so at most "
+            f"{PAGE_CAP_ORDERS:,} orders per date slice were counted; totals may be low."
+        )
+        return aggregate(_order_stream(query_filter, window, projection, flat, allow_bulk=False))
+
+
+async def _aaggregate_orders(
+    query_filter: str,
+    window: tuple[date, date],
+    projection: tuple[str, str],
+    aggregate,
+    flat: bool = False,
+):
+    """
+    Async variant of _aggregate_orders; the stream is consumed on a worker
+    thread, which stops requesting pages once this coroutine is cancelled.
+    """
+    return await to_thread(_aggregate_orders, query_filter, window, projection, aggregate, flat)
+
+
+def _active_products_filter(tag: str = "") -> str:
+    query_parts = ["status:active"]
+    if tag:
+        query_parts.append(f'tag:"{tag}"')
+    return " AND ".join(query_parts)
+
+
+def _active_products(
+    tag: str = "",
+    max_age: float = MAX_AGE_BROWSE,
+    query: str = _PRODUCT_STOCK_QUERY,
+    stock_max_age: float | None = None,
+) -> list:
     """
-    return gql_paginated(query, variables={"query": query_filter}, data_path=["orders"])
-
-
-def _fetch_products_gql(query_filter: str = "status:active") -> list:
-    """Fetch all products matching a query filter, paginated."""
-    query = f"""
-    query ($cursor: String, $query: String) {{
-        products(first: 250, after: $cursor, query: $query) {{
-            pageInfo {{ hasNextPage endCursor }}
-            edges {{ node {{ {PRODUCT_FIELDS} }} }}
-        }}
-    }}
+    Active products (optionally one tag) from the catalog mirror, or live when
+    it is disabled — then only `query`'s fields are fetched.
     """
-    return gql_paginated(query, variables={"query": query_filter}, data_path=["products"])
+    if not CATALOG_ENABLED:
+        return _fetch_products_gql(_active_products_filter(tag), query)
+    products = catalog.products(max_age, priority=PRIORITY_ANALYTICS, stock_max_age=stock_max_age)
+    return [p for p in products if has_tag(p, tag)] if tag else products
+
+
+async def _aactive_products(
+    tag: str = "",
+    max_age: float = MAX_AGE_BROWSE,
+    query: str = _PRODUCT_STOCK_QUERY,
+    stock_max_age: float | None = None,
+) -> list:
+    """Async variant of _active_products."""
+    if not CATALOG_ENABLED:
+        return await _afetch_products_gql(_active_products_filter(tag), query)
+    products = await catalog.aproducts(max_age, priority=PRIORITY_ANALYTICS, stock_max_age=stock_max_age)
+    return [p for p in products if has_tag(p, tag)] if tag else products
+
+
+def _live_titles(products: list) -> tuple[TitleIndex, list[int]]:
+    return TitleIndex([p.get("title", "") for p in products]), list(range(len(products)))
+
+
+def _active_titles(tag: str = "") -> tuple[TitleIndex, list[int]]:
+    """Title index plus the positions of active products (optionally one tag)."""
+    if not CATALOG_ENABLED:
+        return _live_titles(_fetch_products_gql(_active_products_filter(tag), _PRODUCT_TITLES_QUERY))
+    index = catalog_index(MAX_AGE_BROWSE, priority=PRIORITY_ANALYTICS)
+    return index.titles, index.tag_positions([tag] if tag else [])
+
+
+async def _aactive_titles(tag: str = "") -> tuple[TitleIndex, list[int]]:
+    """Async variant of _active_titles."""
+    if not CATALOG_ENABLED:
+        return _live_titles(await _afetch_products_gql(_active_products_filter(tag), _PRODUCT_TITLES_QUERY))
+    index = await acatalog_index(MAX_AGE_BROWSE, priority=PRIORITY_ANALYTICS)
+    return index.titles, index.tag_positions([tag] if tag else [])
 
 
 def _order_revenue(order: dict) -> float:
@@ -56,8 +293,266 @@ def _paid_orders_filter(start: date, end: date) -> str:
     return f'(financial_status:PAID OR financial_status:PENDING) AND created_at:>"{start}" AND created_at:<"{end}"'
 
 
+def _created_between_filter(start: date, end: date) -> str:
+    return f'created_at:>"{start}" AND created_at:<"{end}"'
+
+
+_UNFULFILLED_FILTER = "fulfillment_status:unfulfilled AND status:open"
+
+
+def _refund_filter(start: date, end: date) -> str:
+    return f"(financial_status:refunded OR financial_status:partially_refunded) AND {_created_between_filter(start, end)}"
+
+
+def _refunded_first(orders: list) -> list:
+    """Fully refunded orders, then partially refunded ones, each in scan order."""
+    return sorted(orders, key=lambda o: o.get("displayFinancialStatus") != "REFUNDED")
+
+
+# ─────────────────────────────────────────────
+# Shared Report Builders (used by sync and async tools)
+# ─────────────────────────────────────────────
+
+def _resolve_allowed_titles(titles: TitleIndex, candidates: list[int], product_name: str) -> tuple[set, dict | None]:
+    """
+    Narrow the tag-filtered catalog to the titles revenue should be counted for.
+
+    Returns (allowed_titles, error) — error is a tool-ready dict when the product
+    name matches nothing or is ambiguous.
+    """
+    if not product_name:
+        return {titles.titles[i] for i in candidates if titles.titles[i]}, None
+
+    matched, exact = titles.match(product_name, candidates)
+    if exact:
+        return set(matched), None
+    if not matched:
+        return set(), {"error": "No matching product found. Please refine."}
+    if len(matched) > 1:
+        options = ", ".join(f'"{m}"' for m in matched)
+        return set(), {"error": f"Multiple similar products found: [{options}]. Which one did you mean?"}
+    return set(matched), None
+
+
+def _aggregate_revenue(orders, allowed_titles: set | None, limit: int | None = None) -> tuple[float, int, list[tuple[str, int]]]:
+    """
+    (revenue, order_count, [(title, units)]) over orders with at least one line
+    item in `allowed_titles` (any title when None); titles ranked by units sold,
+    the top `limit` only when given. `orders` may be order nodes or flattened
+    bulk lines; see order_columns.py.
+    """
+    return OrderColumns(orders).revenue(allowed_titles, limit)
+
+
+def _revenue_report(
+    totals: tuple[float, int, list[tuple[str, int]]],
+    allowed_titles: set | None,
+    iso_start_date: date,
+    iso_end_date: date,
+    n: int,
+    tag: str,
+    product_name: str,
+) -> dict:
+    total_revenue, total_orders, ranked = totals
+
+    return {
+        "period_days": (iso_end_date - iso_start_date).days + 1,
+        "start_date": iso_start_date.isoformat()[:10],
+        "end_date": iso_end_date.isoformat()[:10],
+        "tag_filter": tag or None,
+        "product_filter": next(iter(allowed_titles)) if allowed_titles and product_name else None,
+        "total_revenue": format_money(total_revenue),
+        "total_orders": total_orders,
+        "average_order_value": format_money(total_revenue / total_orders if total_orders else 0),
+        "top_products": [{"product_title": title, "total_units_sold": units} for title, units in ranked[:n]],
+    }
+
+
+def _unfulfilled_report(orders: list) -> dict:
+    return {
+        "count": len(orders),
+        "total_value": format_money(sum(_order_revenue(o) for o in orders)),
+        "orders": [summarize_order(o) for o in orders[:20]],
+    }
+
+
+def _low_stock_report(products: list, threshold: int) -> list:
+    low_stock = []
+    for p in products:
+        for edge in p.get("variants", {}).get("edges", []):
+            v = edge["node"]
+            qty = v.get("inventoryQuantity", 0) or 0
+            if qty <= threshold:
+                low_stock.append({
+                    "product_title": p.get("title", ""),
+                    "variant_title": v.get("title", "Default"),
+                    "inventory_quantity": qty,
+                    "sku": v.get("sku", "N/A"),
+                })
+    return sorted(low_stock, key=lambda x: x["inventory_quantity"])
+
+
+def _period_stats(orders) -> dict:
+    """Order count and revenue in one pass (orders may be a stream)."""
+    count, revenue = 0, 0
+    for o in orders:
+        count += 1
+        revenue += _order_revenue(o)
+    return {"order_count": count, "revenue": revenue}
+
+
+def _period_comparison(
+    iso_start_date_period_1: date,
+    iso_end_date_period_1: date,
+    iso_start_date_period_2: date,
+    iso_end_date_period_2: date,
+    curr: dict,
+    prev: dict,
+) -> dict:
+    rev_change = curr["revenue"] - prev["revenue"]
+    ord_change = curr["order_count"] - prev["order_count"]
+
+    return {
+        "current_period": {
+            "start": iso_start_date_period_1.isoformat()[:10],
+            "end": iso_end_date_period_1.isoformat()[:10],
+            "revenue": format_money(curr["revenue"]),
+            "order_count": curr["order_count"],
+        },
+        "previous_period": {
+            "start": iso_start_date_period_2.isoformat()[:10],
+            "end": iso_end_date_period_2.isoformat()[:10],
+            "revenue": format_money(prev["revenue"]),
+            "order_count": prev["order_count"],
+        },
+        "changes": {
+            "revenue_change": format_money(rev_change),
+            "revenue_change_pct": f"{(rev_change / prev['revenue'] * 100) if prev['revenue'] else 0:+.1f}%",
+            "order_change": ord_change,
+            "order_change_pct": f"{(ord_change / prev['order_count'] * 100) if prev['order_count'] else 0:+.1f}%",
+        },
+    }
+
+
+def _line_item_titles(orders) -> set:
+    return {
+        edge["node"].get("title")
+        for o in orders
+        for edge in o.get("lineItems", {}).get("edges", [])
+    }
+
+
+def _zero_sales_report(products: list, sold: set) -> list:
+    all_titles = {p.get("title") for p in products}
+    zero = sorted(all_titles - sold)
+    return zero or ["All products have had at least one sale in this period."]
+
+
+# ─────────────────────────────────────────────
+# Order Sources (warehouse when enabled, else live scans)
+# ─────────────────────────────────────────────
+
+def _revenue_totals(start: date, end: date, allowed_titles: set | None, limit: int | None = None) -> tuple:
+    if WAREHOUSE_ENABLED:
+        warehouse.ensure_fresh()
+        return warehouse.revenue(start, end, allowed_titles)
+    return _aggregate_orders(
+        _paid_orders_filter(start, end),
+        (start, end),
+        _ORDER_REVENUE,
+        lambda orders: _aggregate_revenue(orders, allowed_titles, limit),
+        flat=True,
+    )
+
+
+async def _arevenue_totals(start: date, end: date, allowed_titles: set | None, limit: int | None = None) -> tuple:
+    if WAREHOUSE_ENABLED:
+        await warehouse.aensure_fresh()
+        return warehouse.revenue(start, end, allowed_titles)
+    return await _aaggregate_orders(
+        _paid_orders_filter(start, end),
+        (start, end),
+        _ORDER_REVENUE,
+        lambda orders: _aggregate_revenue(orders, allowed_titles, limit),
+        flat=True,
+    )
+
+
+def _period_totals(start: date, end: date) -> dict:
+    if WAREHOUSE_ENABLED:
+        warehouse.ensure_fresh()
+        return warehouse.period_stats(start, end)
+    return _aggregate_orders(_paid_orders_filter(start, end), (start, end), _ORDER_TOTALS, _period_stats)
+
+
+async def _aperiod_totals(start: date, end: date) -> dict:
+    if WAREHOUSE_ENABLED:
+        await warehouse.aensure_fresh()
+        return warehouse.period_stats(start, end)
+    return await _aaggregate_orders(_paid_orders_filter(start, end), (start, end), _ORDER_TOTALS, _period_stats)
+
+
+def _sold_titles(start: date, end: date) -> set:
+    if WAREHOUSE_ENABLED:
+        warehouse.ensure_fresh()
+        return warehouse.sold_titles(start, end)
+    return _aggregate_orders(_paid_orders_filter(start, end), (start, end), _ORDER_TITLES, _line_item_titles)
+
+
+async def _asold_titles(start: date, end: date) -> set:
+    if WAREHOUSE_ENABLED:
+        await warehouse.aensure_fresh()
+        return warehouse.sold_titles(start, end)
+    return await _aaggregate_orders(_paid_orders_filter(start, end), (start, end), _ORDER_TITLES, _line_item_titles)
+
+
+def _unfulfilled_orders() -> list:
+    if WAREHOUSE_ENABLED:
+        warehouse.ensure_fresh()
+        return warehouse.unfulfilled()
+    return _fetch_orders_gql(_UNFULFILLED_FILTER)
+
+
+async def _aunfulfilled_orders() -> list:
+    if WAREHOUSE_ENABLED:
+        await warehouse.aensure_fresh()
+        return warehouse.unfulfilled()
+    return await _afetch_orders_gql(_UNFULFILLED_FILTER)
+
+
+def _refunded_orders(start: date, end: date) -> list:
+    if WAREHOUSE_ENABLED:
+        warehouse.ensure_fresh()
+        return warehouse.refunded_between(start, end)
+    return _refunded_first(_fetch_orders_gql(_refund_filter(start, end), window=(start, end)))
+
+
+async def _arefunded_orders(start: date, end: date) -> list:
+    if WAREHOUSE_ENABLED:
+        await warehouse.aensure_fresh()
+        return warehouse.refunded_between(start, end)
+    return _refunded_first(await _afetch_orders_gql(_refund_filter(start, end), window=(start, end)))
+
+
+def _orders_created_between(start: date, end: date) -> list:
+    if WAREHOUSE_ENABLED:
+        warehouse.ensure_fresh()
+        return warehouse.created_between(start, end)
+    return _fetch_orders_gql(_created_between_filter(start, end), window=(start, end))
+
+
+async def _aorders_created_between(start: date, end: date) -> list:
+    if WAREHOUSE_ENABLED:
+        await warehouse.aensure_fresh()
+        return warehouse.created_between(start, end)
+    return await _afetch_orders_gql(_created_between_filter(start, end), window=(start, end))
+
+
 # ─────────────────────────────────────────────
 # Tools
+#
+# Each @tool also gets a native coroutine (attached right after it) so the
+# admin agent can be driven with ainvoke without a thread per tool call.
 # ─────────────────────────────────────────────
 
 @tool(description="Returns today's date in ISO format (YYYY-MM-DD).")
@@ -65,6 +560,13 @@ def fetch_today_date() -> str:
     return f"Today's date is {date.today().isoformat()}"
 
 
+async def _afetch_today_date() -> str:
+    return fetch_today_date.func()
+
+
+fetch_today_date.coroutine = _afetch_today_date
+
+
 @tool
 def get_revenue_summary(
     iso_start_date: date,
@@ -93,79 +595,48 @@ def get_revenue_summary(
 
         allowed_titles: set | None = None
         if tag or product_name:
-            query_parts = ["status:active"]
-            if tag:
-                query_parts.append(f'tag:"{tag}"')
-            filtered_products = _fetch_products_gql(" AND ".join(query_parts))
-            all_titles = [p.get("title", "") for p in filtered_products if p.get("title")]
-
-            if product_name:
-                exact = is_same_string(product_name, all_titles)
-                if exact:
-                    allowed_titles = set(exact)
-                else:
-                    fuzzy_matches = process.extract(
-                        product_name, all_titles,
-                        scorer=fuzz.WRatio, processor=str.lower,
-                        score_cutoff=65, limit=2,
-                    )
-                    matched = {m[0] for m in fuzzy_matches}
-                    if not matched:
-                        return {"error": "No matching product found. Please refine."}
-                    if len(matched) > 1:
-                        options = ", ".join(f'"{m}"' for m in matched)
-                        return {"error": f"Multiple similar products found: [{options}]. Which one did you mean?"}
-                    allowed_titles = matched
-            else:
-                allowed_titles = set(all_titles)
-
-        orders = _fetch_orders_gql(_paid_orders_filter(iso_start_date, iso_end_date))
-
-        total_revenue = 0.0
-        total_orders = 0
-        stats: dict = {}
-
-        for order in orders:
-            order_contributes = False
-            order_revenue = _order_revenue(order)
-
-            for edge in order.get("lineItems", {}).get("edges", []):
-                item = edge["node"]
-                title = item.get("title", "Unknown")
-
-                if allowed_titles is not None and title not in allowed_titles:
-                    continue
-
-                qty = item.get("quantity", 0) or 0
-                order_contributes = True
-                stats.setdefault(title, {"total_units_sold": 0})
-                stats[title]["total_units_sold"] += qty
-
-            if order_contributes:
-                total_revenue += order_revenue
-                total_orders += 1
-
-        ranked = sorted(
-            [{"product_title": k, **v} for k, v in stats.items()],
-            key=lambda x: x["total_units_sold"],
-            reverse=True,
-        )
+            titles, candidates = _active_titles(tag)
+            allowed_titles, error = _resolve_allowed_titles(titles, candidates, product_name)
+            if error:
+                return error
+
+        with _collecting_notes() as notes:
+            totals = _revenue_totals(iso_start_date, iso_end_date, allowed_titles, n)
+        report = _revenue_report(totals, allowed_titles, iso_start_date, iso_end_date, n, tag, product_name)
+        return _with_notes(report, notes)
+    except Exception as e:
+        return {"error": f"Failed to get revenue summary: {e}"}
+
+
+async def _aget_revenue_summary(
+    iso_start_date: date,
+    iso_end_date: date,
+    top_n: int = 0,
+    tag: str = "",
+    product_name: str = "",
+) -> dict:
+    """Async variant of get_revenue_summary."""
+    try:
+        n = top_n if top_n > 0 else 3
 
-        return {
-            "period_days": (iso_end_date - iso_start_date).days + 1,
-            "start_date": iso_start_date.isoformat()[:10],
-            "end_date": iso_end_date.isoformat()[:10],
-            "tag_filter": tag or None,
-            "product_filter": next(iter(allowed_titles)) if allowed_titles and product_name else None,
-            "total_revenue": format_money(total_revenue),
-            "total_orders": total_orders,
-            "average_order_value": format_money(total_revenue / total_orders if total_orders else 0),
-            "top_products": ranked[:n],
-        }
+        allowed_titles: set | None = None
+        if tag or product_name:
+            titles, candidates = await _aactive_titles(tag)
+            allowed_titles, error = _resolve_allowed_titles(titles, candidates, product_name)
+            if error:
+                return error
+
+        with _collecting_notes() as notes:
+            totals = await _arevenue_totals(iso_start_date, iso_end_date, allowed_titles, n)
+        report = _revenue_report(totals, allowed_titles, iso_start_date, iso_end_date, n, tag, product_name)
+        return _with_notes(report, notes)
     except Exception as e:
         return {"error": f"Failed to get revenue summary: {e}"}
 
 
+get_revenue_summary.coroutine = _aget_revenue_summary
+
+
 @tool
 def get_unfulfilled_orders() -> dict:
     """
@@ -175,16 +646,22 @@ def get_unfulfilled_orders() -> dict:
         Dict: count, total_value (PKR), orders (up to 20 summarized orders).
     """
     try:
-        orders = _fetch_orders_gql("fulfillment_status:unfulfilled AND status:open")
-        return {
-            "count": len(orders),
-            "total_value": format_money(sum(_order_revenue(o) for o in orders)),
-            "orders": [summarize_order(o) for o in orders[:20]],
-        }
+        return _unfulfilled_report(_unfulfilled_orders())
     except Exception as e:
         return {"error": f"Failed to get unfulfilled orders: {e}"}
 
 
+async def _aget_unfulfilled_orders() -> dict:
+    """Async variant of get_unfulfilled_orders."""
+    try:
+        return _unfulfilled_report(await _aunfulfilled_orders())
+    except Exception as e:
+        return {"error": f"Failed to get unfulfilled orders: {e}"}
+
+
+get_unfulfilled_orders.coroutine = _aget_unfulfilled_orders
+
+
 @tool
 def get_low_inventory_products(threshold: int = 3) -> list:
     """
@@ -197,24 +674,22 @@ def get_low_inventory_products(threshold: int = 3) -> list:
         List of {product_title, variant_title, inventory_quantity, sku}.
     """
     try:
-        products = _fetch_products_gql("status:active")
-        low_stock = []
-        for p in products:
-            for edge in p.get("variants", {}).get("edges", []):
-                v = edge["node"]
-                qty = v.get("inventoryQuantity", 0) or 0
-                if qty <= threshold:
-                    low_stock.append({
-                        "product_title": p.get("title", ""),
-                        "variant_title": v.get("title", "Default"),
-                        "inventory_quantity": qty,
-                        "sku": v.get("sku", "N/A"),
-                    })
-        return sorted(low_stock, key=lambda x: x["inventory_quantity"])
+        return _low_stock_report(_active_products(stock_max_age=MAX_AGE_INVENTORY), threshold)
     except Exception as e:
         return [{"error": f"Failed to get low inventory products: {e}"}]
 
 
+async def _aget_low_inventory_products(threshold: int = 3) -> list:
+    """Async variant of get_low_inventory_products."""
+    try:
+        return _low_stock_report(await _aactive_products(stock_max_age=MAX_AGE_INVENTORY), threshold)
+    except Exception as e:
+        return [{"error": f"Failed to get low inventory products: {e}"}]
+
+
+get_low_inventory_products.coroutine = _aget_low_inventory_products
+
+
 @tool
 def compare_sales_periods(
     iso_start_date_period_1: date,
@@ -233,39 +708,46 @@ def compare_sales_periods(
         Dict: current_period stats, previous_period stats, and changes (absolute + %).
     """
     try:
-        def fetch_stats(start, end):
-            orders = _fetch_orders_gql(_paid_orders_filter(start, end))
-            return {"order_count": len(orders), "revenue": sum(_order_revenue(o) for o in orders)}
-
-        curr = fetch_stats(iso_start_date_period_1, iso_end_date_period_1)
-        prev = fetch_stats(iso_start_date_period_2, iso_end_date_period_2)
-        rev_change = curr["revenue"] - prev["revenue"]
-        ord_change = curr["order_count"] - prev["order_count"]
-
-        return {
-            "current_period": {
-                "start": iso_start_date_period_1.isoformat()[:10],
-                "end": iso_end_date_period_1.isoformat()[:10],
-                "revenue": format_money(curr["revenue"]),
-                "order_count": curr["order_count"],
-            },
-            "previous_period": {
-                "start": iso_start_date_period_2.isoformat()[:10],
-                "end": iso_end_date_period_2.isoformat()[:10],
-                "revenue": format_money(prev["revenue"]),
-                "order_count": prev["order_count"],
-            },
-            "changes": {
-                "revenue_change": format_money(rev_change),
-                "revenue_change_pct": f"{(rev_change / prev['revenue'] * 100) if prev['revenue'] else 0:+.1f}%",
-                "order_change": ord_change,
-                "order_change_pct": f"{(ord_change / prev['order_count'] * 100) if prev['order_count'] else 0:+.1f}%",
-            },
-        }
+        # Both periods are scanned at once on the shared fan-out pool.
+        with _collecting_notes() as notes:
+            curr, prev = run_bounded(
+                lambda period: _period_totals(*period),
+                [(iso_start_date_period_1, iso_end_date_period_1), (iso_start_date_period_2, iso_end_date_period_2)],
+            )
+        return _with_notes(_period_comparison(
+            iso_start_date_period_1, iso_end_date_period_1,
+            iso_start_date_period_2, iso_end_date_period_2,
+            curr, prev,
+        ), notes)
+    except Exception as e:
+        return {"error": f"Failed to compare sales periods: {e}"}
+
+
+async def _acompare_sales_periods(
+    iso_start_date_period_1: date,
+    iso_end_date_period_1: date,
+    iso_start_date_period_2: date,
+    iso_end_date_period_2: date,
+) -> dict:
+    """Async variant of compare_sales_periods."""
+    try:
+        with _collecting_notes() as notes:
+            curr, prev = await arun_bounded(
+                lambda period: _aperiod_totals(*period),
+                [(iso_start_date_period_1, iso_end_date_period_1), (iso_start_date_period_2, iso_end_date_period_2)],
+            )
+        return _with_notes(_period_comparison(
+            iso_start_date_period_1, iso_end_date_period_1,
+            iso_start_date_period_2, iso_end_date_period_2,
+            curr, prev,
+        ), notes)
     except Exception as e:
         return {"error": f"Failed to compare sales periods: {e}"}
 
 
+compare_sales_periods.coroutine = _acompare_sales_periods
+
+
 @tool
 def get_refunded_orders(iso_start_date: date, iso_end_date: date) -> list:
     """
@@ -279,17 +761,22 @@ def get_refunded_orders(iso_start_date: date, iso_end_date: date) -> list:
         List of summarized order dicts with refund transaction details.
     """
     try:
-        refunded = _fetch_orders_gql(
-            f'financial_status:refunded AND created_at:>"{iso_start_date}" AND created_at:<"{iso_end_date}"'
-        )
-        partial = _fetch_orders_gql(
-            f'financial_status:partially_refunded AND created_at:>"{iso_start_date}" AND created_at:<"{iso_end_date}"'
-        )
-        return [summarize_order(o) for o in refunded + partial]
+        return [summarize_order(o) for o in _refunded_orders(iso_start_date, iso_end_date)]
     except Exception as e:
         return [{"error": f"Failed to get refunded orders: {e}"}]
 
 
+async def _aget_refunded_orders(iso_start_date: date, iso_end_date: date) -> list:
+    """Async variant of get_refunded_orders."""
+    try:
+        return [summarize_order(o) for o in await _arefunded_orders(iso_start_date, iso_end_date)]
+    except Exception as e:
+        return [{"error": f"Failed to get refunded orders: {e}"}]
+
+
+get_refunded_orders.coroutine = _aget_refunded_orders
+
+
 @tool
 def get_zero_sales_products(iso_start_date: date, iso_end_date: date) -> list:
     """
@@ -303,19 +790,28 @@ def get_zero_sales_products(iso_start_date: date, iso_end_date: date) -> list:
         Sorted list of product title strings with no sales, or a confirmation message if all sold.
     """
     try:
-        all_titles = {p.get("title") for p in _fetch_products_gql("status:active")}
-        orders = _fetch_orders_gql(_paid_orders_filter(iso_start_date, iso_end_date))
-        sold = {
-            edge["node"].get("title")
-            for o in orders
-            for edge in o.get("lineItems", {}).get("edges", [])
-        }
-        zero = sorted(all_titles - sold)
-        return zero or ["All products have had at least one sale in this period."]
+        products = _active_products(query=_PRODUCT_TITLES_QUERY)
+        with _collecting_notes() as notes:
+            sold = _sold_titles(iso_start_date, iso_end_date)
+        return _with_notes(_zero_sales_report(products, sold), notes)
     except Exception as e:
         return [f"Error: Failed to get zero-sales products: {e}"]
 
 
+async def _aget_zero_sales_products(iso_start_date: date, iso_end_date: date) -> list:
+    """Async variant of get_zero_sales_products."""
+    try:
+        products = await _aactive_products(query=_PRODUCT_TITLES_QUERY)
+        with _collecting_notes() as notes:
+            sold = await _asold_titles(iso_start_date, iso_end_date)
+        return _with_notes(_zero_sales_report(products, sold), notes)
+    except Exception as e:
+        return [f"Error: Failed to get zero-sales products: {e}"]
+
+
+get_zero_sales_products.coroutine = _aget_zero_sales_products
+
+
 @tool
 def get_recent_orders(iso_start_date: date, iso_end_date: date) -> list:
     """
@@ -329,14 +825,56 @@ def get_recent_orders(iso_start_date: date, iso_end_date: date) -> list:
         List of summarized order dicts.
     """
     try:
-        orders = _fetch_orders_gql(
-            f'created_at:>"{iso_start_date}" AND created_at:<"{iso_end_date}"'
-        )
+        orders = _orders_created_between(iso_start_date, iso_end_date)
         return [summarize_order(o) for o in orders]
     except Exception as e:
         return [{"error": f"Failed to get recent orders: {e}"}]
 
 
+async def _aget_recent_orders(iso_start_date: date, iso_end_date: date) -> list:
+    """Async variant of get_recent_orders."""
+    try:
+        orders = await _aorders_created_between(iso_start_date, iso_end_date)
+        return [summarize_order(o) for o in orders]
+    except Exception as e:
+        return [{"error": f"Failed to get recent orders: {e}"}]
+
+
+get_recent_orders.coroutine = _aget_recent_orders
+
+
+# ─────────────────────────────────────────────
+# Result Cache
+# ─────────────────────────────────────────────
+
+CACHE_TTL_REPORTS = float(os.getenv("ADMIN_CACHE_TTL_REPORTS", "120"))
+CACHE_TTL_ORDERS = float(os.getenv("ADMIN_CACHE_TTL_ORDERS", "30"))
+CACHE_TTL_INVENTORY = float(os.getenv("ADMIN_CACHE_TTL_INVENTORY", "30"))
+
+
+def _succeeded(result) -> bool:
+    """
+    Tools report failures as {"error": ...} or [{"error": ...}]; those are not
+    cached, and neither are reports carrying notes (e.g. a truncated scan).
+    """
+    if isinstance(result, dict):
+        return "error" not in result and "notes" not in result
+    if isinstance(result, list) and result and isinstance(result[0], dict):
+        return "error" not in result[0]
+    if isinstance(result, list) and result and isinstance(result[-1], str):
+        return not result[-1].startswith("Note: ")
+    return True
+
+
+cache_tool(get_revenue_summary, CACHE_TTL_REPORTS, fold=("tag", "product_name"), cacheable=_succeeded)
+cache_tool(compare_sales_periods, CACHE_TTL_REPORTS, cacheable=_succeeded)
+cache_tool(get_refunded_orders, CACHE_TTL_REPORTS, cacheable=_succeeded)
+cache_tool(get_zero_sales_products, CACHE_TTL_REPORTS, cacheable=_succeeded)
+cache_tool(get_unfulfilled_orders, CACHE_TTL_ORDERS, cacheable=_succeeded)
+cache_tool(get_recent_orders, CACHE_TTL_ORDERS, cacheable=_succeeded)
+cache_tool(get_low_inventory_products, CACHE_TTL_INVENTORY, cacheable=_succeeded)
+
+
 # ─────────────────────────────────────────────
 # Exported tool list
 # ─────────────────────────────────────────────
@@ -112,7 +112,7 @@ get_zero_sales_products(iso_start_date, iso_end_date)
 get_recent_orders(iso_start_date, iso_end_date)
   → Orders in a date range with customer details and values. Default: last 3 days.
 
-search_products(tags, max_price, color, product_name, in_stock_only)
+search_products(tags, max_price, min_price, color, product_name, in_stock_only)
   → Browse or filter store products. Use when admin asks about specific products
     or inventory by category.
 
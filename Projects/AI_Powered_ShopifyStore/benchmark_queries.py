@@ -0,0 +1,203 @@
+"""
+benchmark_queries.py — Payload size and query cost of each tool's projected query.
+
+Compares the full utils.ORDER_FIELDS / PRODUCT_FIELDS selections with the
+per-report selections in queries.py.
+
+Offline (default): order nodes from a Shopify bulk JSONL file (re-nested as
+bulk.py does) are projected onto each selection set, then the serialised
+bytes, json.loads time and an estimated requested query cost per 250-node page
+are reported. Products come from a JSON list of product nodes when given.
+
+Live (--live): one page of each query is run against the store and the
+actual response bytes and extensions.cost are reported.
+
+Usage:
+    python benchmark_queries.py bulk_orders_sample.jsonl
+    python benchmark_queries.py export.jsonl --products products.json --repeat 200
+    python benchmark_queries.py --live --first 50
+"""
+
+import re
+import json
+import time
+import argparse
+from bulk import nest_children, ORDER_CONNECTIONS
+from utils import ORDER_FIELDS, PRODUCT_FIELDS
+from queries import (
+    paginated_query,
+    order_summary_fields,
+    order_totals_fields,
+    order_revenue_fields,
+    order_titles_fields,
+    PRODUCT_TITLE,
+    PRODUCT_STOCK_FIELDS,
+)
+
+ORDER_SELECTIONS = {
+    "full ORDER_FIELDS": ORDER_FIELDS,
+    "order summaries": order_summary_fields(),
+    "revenue summary": order_revenue_fields(),
+    "period comparison": order_totals_fields(),
+    "zero-sales check": order_titles_fields(),
+}
+
+PRODUCT_SELECTIONS = {
+    "full PRODUCT_FIELDS": PRODUCT_FIELDS,
+    "low inventory": PRODUCT_STOCK_FIELDS,
+    "zero-sales titles": PRODUCT_TITLE,
+}
+
+_TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|[{}()]|[^\s{}()]+")
+
+
+# ─────────────────────────────────────────────
+# Selection sets
+# ─────────────────────────────────────────────
+
+def parse_selection(fields: str) -> dict:
+    """
+    Parse a selection-set body into {field: (first, children)}; children is
+    None for scalars, `first` the connection size argument if any.
+    """
+    tokens = _TOKEN_RE.findall(fields)
+    pos = 0
+
+    def parse_block() -> dict:
+        nonlocal pos
+        selection = {}
+        while pos < len(tokens) and tokens[pos] != "}":
+            name = tokens[pos]
+            pos += 1
+            first = None
+            if pos < len(tokens) and tokens[pos] == "(":
+                depth = 0
+                while True:
+                    token = tokens[pos]
+                    depth += {"(": 1, ")": -1}.get(token, 0)
+                    if token == "first" and tokens[pos + 1] == ":" and tokens[pos + 2].isdigit():
+                        first = int(tokens[pos + 2])
+                    pos += 1
+                    if depth == 0:
+                        break
+            children = None
+            if pos < len(tokens) and tokens[pos] == "{":
+                pos += 1
+                children = parse_block()
+                pos += 1   # closing brace
+            selection[name] = (first, children)
+        return selection
+
+    return parse_block()
+
+
+def project(value, selection: dict | None):
+    """Keep only the selected fields of a response value (connections cut to `first`)."""
+    if selection is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, selection) for item in value]
+    if not isinstance(value, dict):
+        return value
+    out = {}
+    for name, (first, children) in selection.items():
+        if name not in value or name == "__typename":
+            continue
+        child = project(value[name], children)
+        if first is not None and isinstance(child, dict) and "edges" in child:
+            child = {**child, "edges": child["edges"][:first]}
+        out[name] = child
+    return out
+
+
+def estimated_cost(selection: dict) -> int:
+    """
+    Requested cost in Shopify's model: 1 per object, 2 + first × node cost per
+    connection, scalars free. Approximate — Shopify's calculator has its own
+    per-field exceptions.
+    """
+    total = 0
+    for _, (first, children) in selection.items():
+        if children is None:
+            continue
+        if "edges" in children:
+            node = (children["edges"][1] or {}).get("node", (None, {}))[1] or {}
+            total += 2 + (first or 1) * (1 + estimated_cost(node))
+        else:
+            total += 1 + estimated_cost(children)
+    return total
+
+
+# ─────────────────────────────────────────────
+# Offline report
+# ─────────────────────────────────────────────
+
+def _load_orders(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        lines = (json.loads(line) for line in f if line.strip())
+        return list(nest_children(lines, ORDER_CONNECTIONS))
+
+
+def _report(label: str, nodes: list, selections: dict, repeat: int) -> None:
+    print(f"\n{label} ({len(nodes)} sample nodes)")
+    print(f"  {'selection':<22} {'bytes/node':>10} {'parse µs/node':>14} {'est. cost/page':>15}")
+    for name, fields in selections.items():
+        selection = parse_selection(fields)
+        body = json.dumps([project(n, selection) for n in nodes])
+        started = time.perf_counter()
+        for _ in range(repeat):
+            json.loads(body)
+        parse_us = (time.perf_counter() - started) / repeat / max(len(nodes), 1) * 1e6
+        page_cost = 2 + 250 * (1 + estimated_cost(selection))
+        print(f"  {name:<22} {len(body) / max(len(nodes), 1):>10.0f} {parse_us:>14.2f} {page_cost:>15}")
+
+
+def offline(orders_path: str, products_path: str | None, repeat: int) -> None:
+    _report("Orders", _load_orders(orders_path), ORDER_SELECTIONS, repeat)
+    if products_path:
+        with open(products_path, encoding="utf-8") as f:
+            _report("Products", json.load(f), PRODUCT_SELECTIONS, repeat)
+
+
+# ─────────────────────────────────────────────
+# Live report
+# ─────────────────────────────────────────────
+
+def live(first: int) -> None:
+    from shopify_client import get_client
+    from utils import GRAPHQL_URL, SHOPIFY_HEADERS
+
+    for label, root, selections in (("Orders", "orders", ORDER_SELECTIONS), ("Products", "products", PRODUCT_SELECTIONS)):
+        print(f"\n{label} (first: {first})")
+        print(f"  {'selection':<22} {'bytes':>10} {'requested':>10} {'actual':>8}")
+        for name, fields in selections.items():
+            query = paginated_query(root, fields).replace("first: 250", f"first: {first}", 1)
+            response = get_client().post(
+                GRAPHQL_URL, json={"query": query, "variables": {"cursor": None, "query": None}},
+                headers=SHOPIFY_HEADERS,
+            )
+            response.raise_for_status()
+            result = response.json()
+            if "errors" in result:
+                print(f"  {name:<22} error: {result['errors']}")
+                continue
+            cost = (result.get("extensions") or {}).get("cost") or {}
+            print(
+                f"  {name:<22} {len(response.content):>10} "
+                f"{cost.get('requestedQueryCost', '-'):>10} {cost.get('actualQueryCost', '-'):>8}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full and per-tool projected GraphQL selections")
+    parser.add_argument("orders", nargs="?", default="bulk_orders_sample.jsonl", help="Bulk-format orders JSONL (offline mode)")
+    parser.add_argument("--products", help="JSON list of product nodes (offline mode)")
+    parser.add_argument("--repeat", type=int, default=100, help="json.loads repetitions per selection")
+    parser.add_argument("--live", action="store_true", help="Query the store instead of projecting sample nodes")
+    parser.add_argument("--first", type=int, default=50, help="Page size for --live")
+    args = parser.parse_args()
+
+    if args.live:
+        live(args.first)
+    else:
+        offline(args.orders, args.products, args.repeat)
@@ -0,0 +1,277 @@
+"""
+bulk.py — Shopify Bulk Operations for result sets too large to paginate.
+
+A bulk query runs asynchronously on Shopify's side: bulkOperationRunQuery
+submits it, the operation is polled until COMPLETED, and the result is a JSONL
+file at a signed URL. Nested connections are flattened in that file — each
+child object is its own line carrying `__parentId` — so bulk_nodes() streams
+the file line by line and re-nests children under `{connection: {edges: [{node}]}}`,
+yielding nodes shaped like gql_paginated's. Only one top-level node is held
+in memory at a time.
+
+Children are expected to follow their parent before the next top-level
+object, which is how Shopify writes bulk results. A line that doesn't, or
+whose __typename has no connection mapped, raises ValueError rather than
+silently going missing from the result.
+
+When the chat turn that started a bulk query is cancelled (cancellation.py),
+the operation is cancelled on Shopify's side too and the download stops.
+
+bulk_standin.py serves a JSONL file behind a local stand-in of the endpoints
+used here, for exercising this path without a store.
+
+Environment:
+    SHOPIFY_BULK_ENABLED       — "0" never uses bulk operations (default "1").
+    SHOPIFY_BULK_POLL_INTERVAL — Seconds between status polls (default 2).
+    SHOPIFY_BULK_TIMEOUT       — Give up on an operation after this many seconds (default 900).
+"""
+
+import os
+import json
+import time
+from typing import Iterator
+from shopify_client import get_client
+from throttle import PRIORITY_ANALYTICS
+from utils import gql
+from cancellation import OperationCancelled, raise_if_cancelled, shielded
+
+BULK_ENABLED = os.getenv("SHOPIFY_BULK_ENABLED", "1") == "1"
+POLL_INTERVAL = float(os.getenv("SHOPIFY_BULK_POLL_INTERVAL", "2"))
+BULK_TIMEOUT = float(os.getenv("SHOPIFY_BULK_TIMEOUT", "900"))
+
+# Orders one paginated stream returns at the default page cap (5 × 250). Sliced
+# scans (utils.created_at_slices) apply it per slice, so compare per-slice counts.
+PAGE_CAP_ORDERS = 5 * 250
+
+_RUN_MUTATION = """
+mutation ($query: String!) {
+    bulkOperationRunQuery(query: $query) {
+        bulkOperation { id status }
+        userErrors { field message }
+    }
+}
+"""
+
+_CANCEL_MUTATION = """
+mutation ($id: ID!) {
+    bulkOperationCancel(id: $id) {
+        bulkOperation { id status }
+        userErrors { field message }
+    }
+}
+"""
+
+_STATUS_QUERY = """
+query ($id: ID!) {
+    node(id: $id) {
+        ... on BulkOperation { id status errorCode objectCount url }
+    }
+}
+"""
+
+_ORDERS_COUNT_QUERY = """
+query ($query: String) {
+    ordersCount(query: $query, limit: null) { count }
+}
+"""
+
+# Bulk queries take no pagination arguments. Nested connection nodes select
+# __typename so their lines can be routed back to the right connection, and
+# refunds select id so their transactions can find them.
+BULK_ORDER_FIELDS = """
+    id
+    name
+    email
+    createdAt
+    updatedAt
+    closed
+    cancelledAt
+    note
+    tags
+    displayFinancialStatus
+    displayFulfillmentStatus
+    totalPriceSet { shopMoney { amount } }
+    shippingAddress { firstName lastName address1 city country phone }
+    lineItems {
+        edges { node { __typename title quantity originalUnitPrice } }
+    }
+    fulfillments { status trackingInfo { number url } }
+    refunds {
+        id
+        createdAt
+        note
+        transactions {
+            edges { node { __typename status amountSet { shopMoney { amount } } } }
+        }
+    }
+"""
+
+# __typename of a flattened child line → connection field on its parent
+ORDER_CONNECTIONS = {"LineItem": "lineItems", "OrderTransaction": "transactions"}
+
+
+# ─────────────────────────────────────────────
+# Operation lifecycle
+# ─────────────────────────────────────────────
+
+class BulkOperationRejected(RuntimeError):
+    """
+    Shopify refused to start the bulk query — most often because another bulk
+    query is already running (one per shop). Raised before any result is
+    read, so callers can fall back to pagination.
+    """
+
+
+def run_bulk_query(inner_query: str, priority: int = PRIORITY_ANALYTICS) -> str | None:
+    """
+    Submit a bulk query and wait for it; returns the result URL (None when
+    the query matched nothing). Raises BulkOperationRejected if it cannot
+    start, RuntimeError on failure or timeout.
+    """
+    data = gql(_RUN_MUTATION, {"query": inner_query}, priority)
+    result = data.get("bulkOperationRunQuery") or {}
+    if result.get("userErrors"):
+        raise BulkOperationRejected(f"Bulk operation rejected: {result['userErrors']}")
+    operation_id = result["bulkOperation"]["id"]
+
+    deadline = time.monotonic() + BULK_TIMEOUT
+    try:
+        while True:
+            operation = gql(_STATUS_QUERY, {"id": operation_id}, priority).get("node") or {}
+            status = operation.get("status")
+            if status == "COMPLETED":
+                return operation.get("url")
+            if status in ("FAILED", "CANCELED", "EXPIRED"):
+                raise RuntimeError(f"Bulk operation {operation_id} {status.lower()}: {operation.get('errorCode')}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Bulk operation {operation_id} still {status} after {BULK_TIMEOUT:.0f}s")
+            time.sleep(POLL_INTERVAL)
+    except OperationCancelled as cancelled:
+        # Only one bulk query runs per shop at a time; don't leave an abandoned one holding the slot.
+        try:
+            _cancel_operation(operation_id, priority)
+        except RuntimeError as e:
+            # Still a cancellation for the caller; the failed cancel travels as its cause.
+            raise cancelled from e
+        raise
+
+
+def _cancel_operation(operation_id: str, priority: int) -> None:
+    """Cancel a running bulk operation, even from a cancelled scope; raises RuntimeError if Shopify refuses."""
+    with shielded():
+        data = gql(_CANCEL_MUTATION, {"id": operation_id}, priority)
+    result = data.get("bulkOperationCancel") or {}
+    if result.get("userErrors"):
+        raise RuntimeError(f"Bulk operation {operation_id} could not be cancelled: {result['userErrors']}")
+
+
+def iter_jsonl(url: str) -> Iterator[dict]:
+    """Stream a bulk result file, one decoded line at a time."""
+    # The URL is pre-signed; no Shopify credentials are sent with it.
+    with get_client().stream("GET", url, timeout=None) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            raise_if_cancelled()
+            if line.strip():
+                yield json.loads(line)
+
+
+def nest_children(lines, connections: dict[str, str]) -> Iterator[dict]:
+    """
+    Re-nest flattened JSONL lines: each line without __parentId starts a new
+    top-level node, and each child is appended to its parent's connection.
+    Raises ValueError for a child outside its parent's block or of an
+    unmapped __typename.
+    """
+    current, by_id = None, {}
+
+    def register(obj):
+        if isinstance(obj, dict):
+            if obj.get("id"):
+                by_id[obj["id"]] = obj
+            for value in obj.values():
+                if isinstance(value, list):
+                    for item in value:
+                        register(item)
+
+    for obj in lines:
+        parent_id = obj.pop("__parentId", None)
+        if parent_id is None:
+            if current is not None:
+                yield current
+            current, by_id = obj, {}
+            register(obj)
+            continue
+        typename = obj.pop("__typename", None)
+        parent = by_id.get(parent_id)
+        if parent is None:
+            raise ValueError(f"Bulk result line for {parent_id} is not inside its parent's block")
+        field = connections.get(typename)
+        if field is None:
+            raise ValueError(f"Bulk result line of type {typename!r} has no connection to nest under")
+        connection = parent.get(field)
+        if not isinstance(connection, dict):
+            connection = parent[field] = {"edges": []}
+        connection["edges"].append({"node": obj})
+        register(obj)
+    if current is not None:
+        yield current
+
+
+def bulk_lines(inner_query: str, priority: int = PRIORITY_ANALYTICS) -> Iterator[dict]:
+    """Run a bulk query and stream its result lines as Shopify wrote them (flattened)."""
+    url = run_bulk_query(inner_query, priority)
+    if url:
+        yield from iter_jsonl(url)
+
+
+def bulk_nodes(inner_query: str, connections: dict[str, str], priority: int = PRIORITY_ANALYTICS) -> Iterator[dict]:
+    """Run a bulk query and stream its re-nested top-level nodes."""
+    yield from nest_children(bulk_lines(inner_query, priority), connections)
+
+
+# ─────────────────────────────────────────────
+# Orders
+# ─────────────────────────────────────────────
+
+def bulk_orders_query(query_filter: str = "", fields: str = BULK_ORDER_FIELDS) -> str:
+    """The inner (variable-free) bulk query for orders matching a search filter."""
+    arguments = f"(query: {json.dumps(query_filter)})" if query_filter else ""
+    return f"{{ orders{arguments} {{ edges {{ node {{ {fields} }} }} }} }}"
+
+
+def bulk_orders(
+    query_filter: str = "",
+    fields: str = BULK_ORDER_FIELDS,
+    priority: int = PRIORITY_ANALYTICS,
+) -> Iterator[dict]:
+    """
+    Stream every order matching `query_filter`, shaped like paginated order nodes.
+    `fields` is a bulk-form selection (see queries.py); the default is
+    everything the order warehouse stores.
+    """
+    yield from bulk_nodes(bulk_orders_query(query_filter, fields), ORDER_CONNECTIONS, priority)
+
+
+def bulk_order_lines(
+    query_filter: str = "",
+    fields: str = BULK_ORDER_FIELDS,
+    priority: int = PRIORITY_ANALYTICS,
+) -> Iterator[dict]:
+    """
+    Like bulk_orders() but without re-nesting: each order is followed by its
+    connection children as separate lines carrying __parentId. For consumers
+    that read the flat form directly (order_columns.OrderColumns).
+    """
+    yield from bulk_lines(bulk_orders_query(query_filter, fields), priority)
+
+
+def count_orders(query_filter: str = "", priority: int = PRIORITY_ANALYTICS) -> int:
+    """Shopify's count of orders matching a search filter."""
+    data = gql(_ORDERS_COUNT_QUERY, {"query": query_filter or None}, priority)
+    return int((data.get("ordersCount") or {}).get("count") or 0)
+
+
+def should_bulk_orders(query_filter: str = "", page_cap: int = PAGE_CAP_ORDERS, priority: int = PRIORITY_ANALYTICS) -> bool:
+    """True when bulk mode is enabled and the filter matches more orders than pagination would return."""
+    return BULK_ENABLED and count_orders(query_filter, priority) > page_cap
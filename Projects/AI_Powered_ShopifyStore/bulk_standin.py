@@ -0,0 +1,159 @@
+"""
+bulk_standin.py — Run the bulk-operation path (bulk.py) against a local JSONL file.
+
+Starts a small local server that stands in for the three Shopify calls bulk.py
+makes (bulkOperationRunQuery, BulkOperation status polling, ordersCount) and
+serves the given file as the operation's result URL. The GraphQL endpoint is
+pointed at it, every order is streamed back through bulk_orders(), and the
+re-nested result is checked against the flat file.
+
+The input is a Shopify bulk result: one JSON object per line, with nested
+connection items on their own lines carrying `__parentId`.
+
+Usage:
+    python bulk_standin.py bulk_orders_sample.jsonl
+    python bulk_standin.py export.jsonl --port 8765 --polls 3
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import utils
+import bulk
+
+_OPERATION_ID = "gid://shopify/BulkOperation/1"
+
+
+def _make_handler(path: str, polls_until_done: int):
+    state = {"polls": 0}
+
+    def count_top_level() -> int:
+        with open(path, encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip() and "__parentId" not in json.loads(line))
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # needed for the chunked result download
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, payload: dict) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            query = request["query"]
+            if "bulkOperationRunQuery" in query:
+                state["polls"] = 0
+                self._json({"data": {"bulkOperationRunQuery": {
+                    "bulkOperation": {"id": _OPERATION_ID, "status": "CREATED"}, "userErrors": [],
+                }}})
+            elif "BulkOperation" in query:
+                state["polls"] += 1
+                done = state["polls"] >= polls_until_done
+                host, port = self.server.server_address
+                self._json({"data": {"node": {
+                    "id": _OPERATION_ID,
+                    "status": "COMPLETED" if done else "RUNNING",
+                    "errorCode": None,
+                    "objectCount": None,
+                    "url": f"http://{host}:{port}/result.jsonl" if done else None,
+                }}})
+            elif "ordersCount" in query:
+                self._json({"data": {"ordersCount": {"count": count_top_level()}}})
+            else:
+                self._json({"errors": [{"message": "Not supported by the bulk stand-in"}]})
+
+        def do_GET(self):
+            # Chunked, so the client really streams instead of reading a sized body.
+            self.send_response(200)
+            self.send_header("Content-Type", "application/jsonl")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            with open(path, "rb") as f:
+                while chunk := f.read(4096):
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+def serve(path: str, polls_until_done: int = 2, port: int = 0) -> ThreadingHTTPServer:
+    """Start the stand-in on a daemon thread; point utils.GRAPHQL_URL at graphql_url(server)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(path, polls_until_done))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def graphql_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address
+    return f"http://{host}:{port}/admin/api/2026-01/graphql.json"
+
+
+def file_counts(path: str) -> tuple[int, int, int]:
+    """(orders, line items, transactions) in a flat bulk result file."""
+    orders = line_items = transactions = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                obj = json.loads(line)
+                if "__parentId" not in obj:
+                    orders += 1
+                elif obj.get("__typename") == "LineItem":
+                    line_items += 1
+                elif obj.get("__typename") == "OrderTransaction":
+                    transactions += 1
+    return orders, line_items, transactions
+
+
+def nested_counts(orders) -> tuple[int, int, int]:
+    """(orders, line items, transactions) in a stream of re-nested order nodes."""
+    streamed = nested_items = nested_transactions = 0
+    for order in orders:
+        streamed += 1
+        nested_items += len(order.get("lineItems", {}).get("edges", []))
+        nested_transactions += sum(
+            len(r.get("transactions", {}).get("edges", [])) for r in order.get("refunds", [])
+        )
+    return streamed, nested_items, nested_transactions
+
+
+def check(path: str) -> None:
+    """Stream every order through bulk.py and compare with the flat file."""
+    orders, line_items, transactions = file_counts(path)
+
+    started = time.monotonic()
+    print(f"should_bulk_orders: {bulk.should_bulk_orders('', page_cap=0)}")
+    streamed, nested_items, nested_transactions = nested_counts(bulk.bulk_orders("created_at:>2026-01-01"))
+    elapsed = time.monotonic() - started
+
+    print(f"orders:       {streamed} streamed / {orders} in file")
+    print(f"line items:   {nested_items} nested / {line_items} in file")
+    print(f"transactions: {nested_transactions} nested / {transactions} in file")
+    print(f"elapsed:      {elapsed:.2f}s")
+    ok = (streamed, nested_items, nested_transactions) == (orders, line_items, transactions)
+    print("OK" if ok else "MISMATCH")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exercise bulk.py against a local stand-in serving a JSONL file")
+    parser.add_argument("file", help="Shopify bulk-operation JSONL result file")
+    parser.add_argument("--port", type=int, default=0, help="Port for the stand-in (default: any free port)")
+    parser.add_argument("--polls", type=int, default=2, help="Status polls before the operation completes")
+    args = parser.parse_args()
+
+    server = serve(args.file, args.polls, args.port)
+    utils.GRAPHQL_URL = graphql_url(server)
+    bulk.POLL_INTERVAL = 0.1
+    try:
+        check(args.file)
+    finally:
+        server.shutdown()
@@ -0,0 +1,59 @@
+"""
+cancellation.py — Cooperative cancellation for Shopify work offloaded to threads.
+
+Cancelling a coroutine stops it at its next await, but a sync scan handed to
+a worker thread (asyncio.to_thread) runs to the end regardless — still
+spending query-cost budget for a chat turn nobody is waiting on.
+
+to_thread() here runs the function inside a cancellation scope: when the
+awaiting coroutine is cancelled the scope is marked, and the next
+raise_if_cancelled() in that thread (gql() calls it before every request)
+raises OperationCancelled. The scope is a ContextVar, so it follows the work
+onto pools that submit through run_in_context().
+
+shielded() opens an uncancellable scope, for clean-up calls that must still
+go out after cancellation (e.g. cancelling a running bulk operation).
+"""
+
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+
+_scope: contextvars.ContextVar[threading.Event | None] = contextvars.ContextVar("cancel_scope", default=None)
+
+
+class OperationCancelled(Exception):
+    """The coroutine that offloaded this work was cancelled; stop early."""
+
+
+def raise_if_cancelled() -> None:
+    scope = _scope.get()
+    if scope is not None and scope.is_set():
+        raise OperationCancelled("Cancelled by the caller")
+
+
+def run_in_context(pool, fn, *args):
+    """pool.submit(fn, *args) carrying the caller's context (and so its cancellation scope)."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+@contextmanager
+def shielded():
+    token = _scope.set(None)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+async def to_thread(fn, *args):
+    """asyncio.to_thread(fn, *args), cancelled cooperatively when the awaiting coroutine is."""
+    scope = threading.Event()
+    context = contextvars.copy_context()
+    context.run(_scope.set, scope)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, context.run, fn, *args)
+    except asyncio.CancelledError:
+        scope.set()
+        raise
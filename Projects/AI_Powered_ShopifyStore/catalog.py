@@ -0,0 +1,392 @@
+"""
+catalog.py — In-process mirror of the active Shopify product catalog.
+
+Product tools used to re-download the whole active catalog on every call. The
+mirror does one full load, then keeps itself current with incremental
+`updated_at:>=` syncs — on a background timer and on demand whenever a reader
+asks for data fresher than the last sync. Readers pass a `max_age` freshness
+bound.
+
+Inventory changes do not move a product's updatedAt, so incremental syncs
+never see them. Stock levels have their own clock: only a full reload or a
+stock-only refresh (every active product's variant quantities, nothing else)
+resets it. An inventory_levels webhook re-reads just the product it names and
+leaves the clock alone, since a delivery for one item says nothing about
+deliveries that were dropped for others. Stock readers pass `stock_max_age`;
+when the stock clock is older than that, the stock-only refresh runs first.
+
+Products that become inactive are dropped on the next incremental sync;
+deletions are only visible to a full reload, which runs every
+CATALOG_FULL_RESYNC_SECONDS. Shopify webhooks (webhooks.py) patch the mirror
+in place between syncs.
+
+When CATALOG_DB_PATH is set the mirror is persisted to SQLite, so a restart
+resumes from the stored cursor instead of reloading everything.
+
+Environment:
+    CATALOG_ENABLED              — "0" makes product tools query Shopify directly (default "1").
+    CATALOG_DB_PATH              — SQLite file for persistence (default: memory only).
+    CATALOG_SYNC_INTERVAL        — Background incremental sync period, seconds (default 120).
+    CATALOG_FULL_RESYNC_SECONDS  — Full reload period, seconds (default 21600).
+    CATALOG_MAX_AGE_BROWSE       — Freshness bound for browsing/search tools (default 300).
+    CATALOG_MAX_AGE_INVENTORY    — Freshness bound for stock levels (stock_max_age; default 30).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from utils import gql, gql_paginated, PRODUCT_FIELDS
+from throttle import PRIORITY_INTERACTIVE, PRIORITY_ANALYTICS
+
+# ─────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────
+
+CATALOG_ENABLED = os.getenv("CATALOG_ENABLED", "1") == "1"
+CATALOG_DB_PATH = os.getenv("CATALOG_DB_PATH", "")
+SYNC_INTERVAL = float(os.getenv("CATALOG_SYNC_INTERVAL", "120"))
+FULL_RESYNC_SECONDS = float(os.getenv("CATALOG_FULL_RESYNC_SECONDS", "21600"))
+
+# Freshness bounds (seconds) — pass as max_age / stock_max_age to ProductCatalog.products().
+MAX_AGE_BROWSE = float(os.getenv("CATALOG_MAX_AGE_BROWSE", "300"))
+MAX_AGE_INVENTORY = float(os.getenv("CATALOG_MAX_AGE_INVENTORY", "30"))
+
+# Pages per sync. Generous: syncs are rare and a truncated mirror is wrong for hours.
+_SYNC_MAX_PAGES = 40
+
+# Fields the mirror keeps on top of PRODUCT_FIELDS. The variants selection merges
+# with PRODUCT_FIELDS' identical `variants(first: 20)` field (standard GraphQL
+# field merging); inventoryItem ids let inventory webhooks find their product.
+_MIRROR_FIELDS = f"""
+    {PRODUCT_FIELDS}
+    status
+    updatedAt
+    variants(first: 20) {{ edges {{ node {{ inventoryItem {{ id }} }} }} }}
+"""
+
+_SYNC_QUERY = f"""
+query ($cursor: String, $query: String) {{
+    products(first: 250, after: $cursor, query: $query, sortKey: UPDATED_AT) {{
+        pageInfo {{ hasNextPage endCursor }}
+        edges {{
+            node {{
+                {_MIRROR_FIELDS}
+            }}
+        }}
+    }}
+}}
+"""
+
+_NODES_QUERY = f"""
+query ($ids: [ID!]!) {{
+    nodes(ids: $ids) {{
+        ... on Product {{
+            {_MIRROR_FIELDS}
+        }}
+    }}
+}}
+"""
+
+
+# Stock levels only, matched to mirrored variants by inventoryItem id.
+_STOCK_QUERY = """
+query ($cursor: String, $query: String) {
+    products(first: 250, after: $cursor, query: $query) {
+        pageInfo { hasNextPage endCursor }
+        edges {
+            node {
+                id
+                variants(first: 20) { edges { node { inventoryQuantity inventoryItem { id } } } }
+            }
+        }
+    }
+}
+"""
+
+
+def _inventory_item_ids(product: dict) -> list:
+    return [(edge["node"].get("inventoryItem") or {}).get("id") for edge in product.get("variants", {}).get("edges", [])]
+
+
+def product_sort_key(product: dict) -> int:
+    """Numeric part of a product GID — Shopify's default product ordering."""
+    try:
+        return int(str(product.get("id", "")).rsplit("/", 1)[-1])
+    except ValueError:
+        return 0
+
+
+def has_tag(product: dict, tag: str) -> bool:
+    """Case-insensitive exact tag match, like Shopify's `tag:"..."` search."""
+    return tag.lower() in {t.lower() for t in product.get("tags", [])}
+
+
+class ProductCatalog:
+    """
+    Thread-safe mirror of active products, keyed by product GID.
+
+    `version` increments on every change so derived indexes can tell when to rebuild.
+    """
+
+    def __init__(self, db_path: str = ""):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._products: dict[str, dict] = {}
+        self._ordered: list[dict] | None = None
+        self._by_inventory_item: dict[str, str] | None = None
+        self._cursor: str | None = None      # Max updatedAt seen (Shopify clock)
+        self._synced_at: float | None = None   # monotonic start time of last good sync
+        self._full_at: float | None = None
+        self._stock_at: float | None = None    # monotonic time stock levels were last known current
+        self.version = 0
+        self._timer: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._db = self._open_db(db_path) if db_path else None
+
+    # ── Persistence ───────────────────────────
+
+    def _open_db(self, path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.execute("CREATE TABLE IF NOT EXISTS products (id TEXT PRIMARY KEY, updated_at TEXT, node TEXT)")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._products = {row[0]: json.loads(row[1]) for row in db.execute("SELECT id, node FROM products")}
+        row = db.execute("SELECT value FROM meta WHERE key = 'cursor'").fetchone()
+        self._cursor = row[0] if row else None
+        if self._products:
+            # The stored mirror stands in for the startup full load.
+            self._full_at = time.monotonic()
+            self.version += 1
+        return db
+
+    def _persist(self, upserts: list[dict], removed: list[str], full: bool) -> None:
+        if self._db is None:
+            return
+        with self._db:
+            if full:
+                self._db.execute("DELETE FROM products")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO products (id, updated_at, node) VALUES (?, ?, ?)",
+                [(p["id"], p.get("updatedAt"), json.dumps(p)) for p in upserts],
+            )
+            self._db.executemany("DELETE FROM products WHERE id = ?", [(pid,) for pid in removed])
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cursor', ?)", (self._cursor,))
+
+    # ── Mutation ──────────────────────────────
+
+    def apply(self, nodes: list[dict], full: bool = False, advance_cursor: bool = True) -> None:
+        """
+        Merge product nodes (active ones kept, others dropped); `full` replaces the mirror.
+
+        Only sync results may advance the updatedAt cursor — a single refreshed
+        product can be newer than changes the next incremental sync still has to pick up.
+        """
+        with self._lock:
+            if full:
+                self._products = {}
+            upserts, removed = [], []
+            for node in nodes:
+                pid = node.get("id")
+                if not pid:
+                    continue
+                if node.get("status", "ACTIVE") == "ACTIVE":
+                    self._products[pid] = node
+                    upserts.append(node)
+                elif self._products.pop(pid, None) is not None:
+                    removed.append(pid)
+                updated = node.get("updatedAt")
+                if advance_cursor and updated and (self._cursor is None or updated > self._cursor):
+                    self._cursor = updated
+            if full or upserts or removed:
+                self._changed()
+            self._persist(upserts, removed, full)
+
+    def remove(self, product_id: str) -> None:
+        """Drop a product from the mirror by GID."""
+        with self._lock:
+            if self._products.pop(product_id, None) is not None:
+                self._changed()
+                self._persist([], [product_id], full=False)
+
+    def refresh_products(self, product_ids: list[str], priority: int = PRIORITY_ANALYTICS) -> None:
+        """Re-fetch specific products by GID; ones Shopify no longer returns are dropped."""
+        data = gql(_NODES_QUERY, {"ids": list(product_ids)}, priority)
+        nodes = [n for n in data.get("nodes", []) if n and n.get("id")]
+        self.apply(nodes, advance_cursor=False)
+        found = {n["id"] for n in nodes}
+        for pid in product_ids:
+            if pid not in found:
+                self.remove(pid)
+
+    def _changed(self) -> None:
+        """Invalidate derived views; caller holds the lock."""
+        self._ordered = None
+        self._by_inventory_item = None
+        self.version += 1
+
+    def product_for_inventory_item(self, inventory_item_id: str) -> str | None:
+        """GID of the mirrored product owning an InventoryItem GID, if any."""
+        with self._lock:
+            if self._by_inventory_item is None:
+                self._by_inventory_item = {
+                    (edge["node"].get("inventoryItem") or {}).get("id"): p["id"]
+                    for p in self._products.values()
+                    for edge in p.get("variants", {}).get("edges", [])
+                }
+            return self._by_inventory_item.get(inventory_item_id)
+
+    # ── Sync ──────────────────────────────────
+
+    def _needs_full(self) -> bool:
+        return (
+            self._cursor is None
+            or self._full_at is None
+            or time.monotonic() - self._full_at > FULL_RESYNC_SECONDS
+        )
+
+    def _sync_locked(self, priority: int, full: bool) -> None:
+        started = time.monotonic()
+        full = full or self._needs_full()
+        query_filter = "status:active" if full else f'updated_at:>="{self._cursor}"'
+        nodes = gql_paginated(
+            _SYNC_QUERY,
+            variables={"query": query_filter},
+            data_path=["products"],
+            max_pages=_SYNC_MAX_PAGES,
+            priority=priority,
+        )
+        self.apply(nodes, full=full)
+        with self._lock:
+            self._synced_at = started
+            if full:
+                self._full_at = self._stock_at = started
+
+    def _refresh_stock_locked(self, priority: int) -> None:
+        """Patch every mirrored product's variant quantities; re-read products whose variants changed."""
+        started = time.monotonic()
+        levels = gql_paginated(
+            _STOCK_QUERY,
+            variables={"query": "status:active"},
+            data_path=["products"],
+            max_pages=_SYNC_MAX_PAGES,
+            priority=priority,
+        )
+        patched, reread = [], []
+        with self._lock:
+            for level in levels:
+                product = self._products.get(level.get("id"))
+                if product is None:
+                    continue   # New products arrive with the next incremental sync.
+                if _inventory_item_ids(product) != _inventory_item_ids(level):
+                    reread.append(product["id"])
+                    continue
+                edges = product["variants"]["edges"]
+                quantities = [fresh["node"].get("inventoryQuantity", 0) for fresh in level["variants"]["edges"]]
+                if quantities == [edge["node"].get("inventoryQuantity", 0) for edge in edges]:
+                    continue
+                # New dicts: returned nodes are shared with readers and never mutated.
+                patched.append({**product, "variants": {"edges": [
+                    {"node": {**edge["node"], "inventoryQuantity": quantity}}
+                    for edge, quantity in zip(edges, quantities)
+                ]}})
+        if patched:
+            self.apply(patched, advance_cursor=False)
+        for start in range(0, len(reread), 250):
+            self.refresh_products(reread[start:start + 250], priority)
+        with self._lock:
+            self._stock_at = started
+
+    def sync(self, priority: int = PRIORITY_ANALYTICS, full: bool = False) -> None:
+        """Pull changes since the cursor from Shopify (or everything, when `full`)."""
+        with self._sync_lock:
+            self._sync_locked(priority, full)
+
+    def age(self) -> float:
+        """Seconds since the last successful sync started (inf if never synced)."""
+        with self._lock:
+            return float("inf") if self._synced_at is None else time.monotonic() - self._synced_at
+
+    def stock_age(self) -> float:
+        """Seconds since stock levels were last known current (inf if never)."""
+        with self._lock:
+            return float("inf") if self._stock_at is None else time.monotonic() - self._stock_at
+
+    def _stale(self, max_age: float, stock_max_age: float | None) -> bool:
+        return self.age() > max_age or (stock_max_age is not None and self.stock_age() > stock_max_age)
+
+    def products(
+        self,
+        max_age: float = MAX_AGE_BROWSE,
+        priority: int = PRIORITY_INTERACTIVE,
+        stock_max_age: float | None = None,
+    ) -> list[dict]:
+        """
+        All active product nodes in Shopify's default (id) order, no older than
+        `max_age` seconds, with stock levels no older than `stock_max_age` when given.
+
+        Syncs in the calling thread first if the mirror is stale. Returned
+        nodes are shared — treat them as read-only.
+        """
+        if self.age() > max_age:
+            with self._sync_lock:
+                if self.age() > max_age:   # Another thread may have synced while we waited
+                    self._sync_locked(priority, full=False)
+        if stock_max_age is not None and self.stock_age() > stock_max_age:
+            with self._sync_lock:
+                if self.stock_age() > stock_max_age:
+                    self._refresh_stock_locked(priority)
+        with self._lock:
+            if self._ordered is None:
+                self._ordered = sorted(self._products.values(), key=product_sort_key)
+            return self._ordered
+
+    async def aproducts(
+        self,
+        max_age: float = MAX_AGE_BROWSE,
+        priority: int = PRIORITY_INTERACTIVE,
+        stock_max_age: float | None = None,
+    ) -> list[dict]:
+        """Async counterpart of products(); a stale mirror is synced off the event loop."""
+        if self._stale(max_age, stock_max_age):
+            return await asyncio.to_thread(self.products, max_age, priority, stock_max_age)
+        return self.products(max_age, priority, stock_max_age)
+
+    # ── Background timer ──────────────────────
+
+    def start(self, interval: float = SYNC_INTERVAL) -> None:
+        """Start incremental syncs every `interval` seconds on a daemon thread."""
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._stop.clear()
+        self._timer = threading.Thread(target=self._run, args=(interval,), name="catalog-sync", daemon=True)
+        self._timer.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sync(PRIORITY_ANALYTICS)
+            except Exception as e:
+                print(f"Catalog sync failed: {e}")
+            self._stop.wait(interval)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "products": len(self._products),
+                "version": self.version,
+                "cursor": self._cursor,
+                "age_seconds": None if self._synced_at is None else round(self.age(), 1),
+                "stock_age_seconds": None if self._stock_at is None else round(self.stock_age(), 1),
+            }
+
+
+# ─────────────────────────────────────────────
+# Process-wide catalog
+# ─────────────────────────────────────────────
+
+catalog = ProductCatalog(CATALOG_DB_PATH)
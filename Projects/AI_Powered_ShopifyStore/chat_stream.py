@@ -0,0 +1,101 @@
+"""
+chat_stream.py — One chat turn as a stream of JSON-ready frames.
+
+stream_turn() drives graph.astream with the "messages", "custom" and
+"values" stream modes and turns LangGraph's events into small frames a
+chat widget can render as they arrive:
+
+    {"type": "token",    "text": "..."}                         — LLM text as it is generated
+    {"type": "tool",     "name": "...", "status": "started"}    — the model called a tool
+    {"type": "tool",     "name": "...", "status": "finished"}   — the tool returned
+    {"type": "progress", ...}                                   — custom events (get_stream_writer)
+    {"type": "done",     "reply": "...", "role": "..."}          — always last; the full final reply
+
+On failure the final frame is still "done", with "error": true and the
+error text as the reply, so clients have a single end-of-turn signal.
+
+The websocket sends each frame as a JSON text message; /chat/stream sends
+each as a Server-Sent Event named after its type (sse_event).
+"""
+
+import json
+from typing import AsyncIterator
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, ToolMessage
+
+
+# ─────────────────────────────────────────────
+# Turns
+# ─────────────────────────────────────────────
+
+def turn_input(messages: str | list[str], role: str) -> dict:
+    """Graph input for a user message (or several, for a coalesced turn); the router picks the agent from `role`."""
+    if isinstance(messages, str):
+        messages = [messages]
+    return {
+        "messages": [HumanMessage(content=m) for m in messages],
+        "user_role": role,
+        "active_agent": "customer_support_agent",
+    }
+
+
+def message_text(content) -> str:
+    """Plain text of a message's content (Gemini may return a list of blocks)."""
+    if isinstance(content, list):
+        return " ".join(
+            b.get("text", "") for b in content
+            if isinstance(b, dict) and b.get("type") == "text"
+        )
+    return content or ""
+
+
+def final_reply(messages: list) -> str:
+    for msg in reversed(messages):
+        if isinstance(msg, AIMessage):
+            return message_text(msg.content)
+    return "I'm sorry, I couldn't generate a response."
+
+
+# ─────────────────────────────────────────────
+# Frames
+# ─────────────────────────────────────────────
+
+def _message_frames(message) -> list[dict]:
+    if isinstance(message, AIMessageChunk):
+        frames = [
+            {"type": "tool", "name": chunk["name"], "status": "started"}
+            for chunk in message.tool_call_chunks if chunk.get("name")
+        ]
+        text = message_text(message.content)
+        if text:
+            frames.append({"type": "token", "text": text})
+        return frames
+    if isinstance(message, ToolMessage):
+        return [{"type": "tool", "name": message.name, "status": "finished"}]
+    return []
+
+
+async def stream_turn(graph, state_input: dict, config: dict, role: str) -> AsyncIterator[dict]:
+    """Run one turn through `graph`, yielding frames; the last one is always "done"."""
+    state = {}
+    try:
+        # subgraphs=True: the agents are create_agent graphs run inside our nodes,
+        # and their model tokens are only streamed when subgraph events are.
+        async for namespace, mode, event in graph.astream(
+            state_input, config=config, stream_mode=["messages", "custom", "values"], subgraphs=True,
+        ):
+            if mode == "messages":
+                for frame in _message_frames(event[0]):
+                    yield frame
+            elif mode == "custom":
+                yield {"type": "progress", **(event if isinstance(event, dict) else {"data": event})}
+            elif not namespace:
+                state = event
+    except Exception as e:
+        yield {"type": "done", "reply": f"Error processing request: {str(e)}", "role": role, "error": True}
+        return
+    yield {"type": "done", "reply": final_reply(state.get("messages", [])), "role": role}
+
+
+def sse_event(frame: dict) -> str:
+    """A frame as one Server-Sent Event: `event: <type>` plus the JSON frame as data."""
+    return f"event: {frame['type']}\ndata: {json.dumps(frame)}\n\n"
@@ -0,0 +1,211 @@
+"""
+chat_turns.py — Per-thread turn scheduling for the chat server.
+
+Every chat transport shares the graph's InMemorySaver checkpoint per
+thread_id (the user_id). Two turns on one thread running at once would
+race on that state and pay for two LLM runs, so turns on a thread are
+serialised by a TurnScheduler; turns on different threads run freely.
+
+What happens to a message that arrives while its thread is busy depends on
+the mode:
+
+    queue    — it gets its own turn once the earlier ones have finished.
+    coalesce — it joins the next not-yet-started turn, so a burst of
+               messages is answered by one turn that sees all of them.
+    cancel   — the running turn (and anything queued) is cancelled and a
+               new turn starts with it; cancelled turns end with a "done"
+               frame carrying "cancelled": true.
+
+submit() returns a Ticket; iterating it yields the frames of the turn that
+answers the message (see chat_stream.py). Every message of a coalesced
+turn gets the same frames.
+
+A turn whose tickets are all closed or cancelled (the client disconnected,
+or sent a cancel frame) is abandoned: dropped if it hasn't started,
+otherwise its task is cancelled, which cancels the pending LLM and Shopify
+calls (see cancellation.py for work running on threads).
+
+Environment:
+    CHAT_BUSY_MODE — "queue" (default), "coalesce" or "cancel".
+"""
+
+import os
+import time
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Callable
+
+BUSY_MODES = ("queue", "coalesce", "cancel")
+CHAT_BUSY_MODE = os.getenv("CHAT_BUSY_MODE", "queue")
+
+# run(messages) → the turn's frames; messages are the texts answered by the turn.
+TurnRunner = Callable[[list[str]], AsyncIterator[dict]]
+
+_CANCELLED_FRAME = {"type": "done", "reply": None, "cancelled": True}
+
+
+class _Turn:
+    """One graph run answering one or more messages."""
+
+    __slots__ = ("thread_id", "messages", "submitted_at", "run", "subscribers", "task")
+
+    def __init__(self, thread_id: str, message: str, run: TurnRunner):
+        self.thread_id = thread_id
+        self.messages = [message]
+        self.submitted_at = [time.monotonic()]
+        self.run = run
+        self.subscribers: list[asyncio.Queue] = []
+        self.task: asyncio.Task | None = None
+
+    def publish(self, frame: dict | None) -> None:
+        for queue in self.subscribers:
+            queue.put_nowait(frame)
+
+
+class Ticket:
+    """A submitted message's view of the turn that answers it; async-iterate for frames."""
+
+    def __init__(self, turn: _Turn, abandon: Callable[[_Turn], None]):
+        self.turn = turn
+        self._abandon = abandon
+        self._frames: asyncio.Queue = asyncio.Queue()
+        turn.subscribers.append(self._frames)
+
+    async def __aiter__(self):
+        try:
+            while (frame := await self._frames.get()) is not None:
+                yield frame
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stop receiving frames; the turn is abandoned if no other ticket is waiting on it."""
+        if self._frames in self.turn.subscribers:
+            self.turn.subscribers.remove(self._frames)
+            if not self.turn.subscribers:
+                self._abandon(self.turn)
+
+    def cancel(self) -> None:
+        """Close, and end iteration with a cancelled "done" frame."""
+        if self._frames in self.turn.subscribers:
+            self.close()
+            self._frames.put_nowait(_CANCELLED_FRAME)
+            self._frames.put_nowait(None)
+
+
+class _Thread:
+    __slots__ = ("waiting", "running", "driver")
+
+    def __init__(self):
+        self.waiting: deque[_Turn] = deque()
+        self.running: _Turn | None = None
+        self.driver: asyncio.Task | None = None
+
+
+class TurnScheduler:
+    """Runs turns one at a time per thread, in arrival order. Event-loop confined."""
+
+    def __init__(self, mode: str = "queue"):
+        if mode not in BUSY_MODES:
+            raise ValueError(f"CHAT_BUSY_MODE must be one of {BUSY_MODES}, got {mode!r}")
+        self.mode = mode
+        self._threads: dict[str, _Thread] = {}
+        self._waits = 0
+        self._stats = {
+            "turns": 0, "messages": 0, "coalesced": 0, "cancelled": 0,
+            "max_queue_depth": 0, "wait_seconds_total": 0.0, "max_wait_seconds": 0.0,
+        }
+
+    def submit(self, thread_id: str, message: str, run: TurnRunner) -> Ticket:
+        """Schedule `message` on `thread_id`; `run` is used if it starts a new turn."""
+        thread = self._threads.get(thread_id)
+        if thread is None:
+            thread = self._threads[thread_id] = _Thread()
+        self._stats["messages"] += 1
+
+        if self.mode == "coalesce" and thread.waiting:
+            turn = thread.waiting[-1]
+            turn.messages.append(message)
+            turn.submitted_at.append(time.monotonic())
+            self._stats["coalesced"] += 1
+            return Ticket(turn, self._abandon)
+
+        if self.mode == "cancel":
+            self._cancel_thread(thread)
+        turn = _Turn(thread_id, message, run)
+        ticket = Ticket(turn, self._abandon)
+        thread.waiting.append(turn)
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(thread.waiting))
+        if thread.driver is None:
+            thread.driver = asyncio.create_task(self._drive(thread_id, thread))
+        return ticket
+
+    def _cancel_thread(self, thread: _Thread) -> None:
+        while thread.waiting:
+            turn = thread.waiting.popleft()
+            turn.publish(_CANCELLED_FRAME)
+            turn.publish(None)
+            self._stats["cancelled"] += 1
+        if thread.running is not None and thread.running.task is not None:
+            thread.running.task.cancel()
+
+    def _abandon(self, turn: _Turn) -> None:
+        thread = self._threads.get(turn.thread_id)
+        if thread is None:
+            return
+        if turn in thread.waiting:
+            thread.waiting.remove(turn)
+            self._stats["cancelled"] += 1
+        elif thread.running is turn and turn.task is not None:
+            turn.task.cancel()
+
+    async def _drive(self, thread_id: str, thread: _Thread) -> None:
+        try:
+            while thread.waiting:
+                turn = thread.running = thread.waiting.popleft()
+                started = time.monotonic()
+                for submitted in turn.submitted_at:
+                    wait = started - submitted
+                    self._waits += 1
+                    self._stats["wait_seconds_total"] += wait
+                    self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], wait)
+                self._stats["turns"] += 1
+                turn.task = asyncio.create_task(self._run(turn))
+                # wait() rather than await: a cancelled turn must not end the driver.
+                await asyncio.wait({turn.task})
+        finally:
+            thread.running = None
+            if self._threads.get(thread_id) is thread:
+                del self._threads[thread_id]
+
+    async def _run(self, turn: _Turn) -> None:
+        try:
+            async for frame in turn.run(list(turn.messages)):
+                turn.publish(frame)
+        except asyncio.CancelledError:
+            self._stats["cancelled"] += 1
+            turn.publish(_CANCELLED_FRAME)
+        except Exception as e:
+            turn.publish({"type": "done", "reply": f"Error processing request: {str(e)}", "error": True})
+        finally:
+            turn.publish(None)
+
+    def snapshot(self) -> dict:
+        """Mode, busy threads, queue depth and wait times, suitable for a metrics endpoint."""
+        return {
+            "mode": self.mode,
+            "active_threads": sum(1 for t in self._threads.values() if t.running is not None),
+            "queued_turns": sum(len(t.waiting) for t in self._threads.values()),
+            **self._stats,
+            "wait_seconds_total": round(self._stats["wait_seconds_total"], 3),
+            "max_wait_seconds": round(self._stats["max_wait_seconds"], 3),
+            "avg_wait_seconds": round(self._stats["wait_seconds_total"] / max(self._waits, 1), 3),
+        }
+
+
+turns = TurnScheduler(CHAT_BUSY_MODE)
+
+
+def chat_turn_metrics() -> dict:
+    """Snapshot of the shared turn scheduler."""
+    return turns.snapshot()
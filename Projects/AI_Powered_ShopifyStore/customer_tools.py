@@ -1,21 +1,31 @@
 """
 customer_tools.py — Tools available to the Customer Support Agent.
 
-All Shopify data is fetched via the Admin GraphQL API.
+All Shopify data is fetched via the Admin GraphQL API. Product reads are served
+from the local catalog mirror (catalog.py) within each tool's freshness bound,
+and searched through its precomputed tag/colour/stock indexes (product_index.py).
 
 Tools:
 1. search_products    — Browse/filter products by tags, price, color, name, stock.
 2. get_best_sellers   — Featured collection / best-selling products.
 3. get_order_status   — Order tracking by order number.
 4. get_store_policies — Return, refund, and discount policy (static).
+
+Every tool also carries a native coroutine (attached below each definition),
+so `tool.ainvoke` — and therefore `graph.ainvoke` — awaits Shopify through
+agql/agql_paginated instead of blocking a worker thread.
 """
 
 from langchain.tools import tool
+from catalog import CATALOG_ENABLED, MAX_AGE_BROWSE, MAX_AGE_INVENTORY
+from product_index import ProductIndex, catalog_index, acatalog_index, mask_of
 from utils import (
     gql,
     gql_paginated,
-    filter_products_by_price,
-    filter_products_by_name,
+    agql,
+    agql_paginated,
+    run_bounded,
+    arun_bounded,
     summarize_product,
     summarize_order,
     PRODUCT_FIELDS,
@@ -23,6 +33,152 @@ from utils import (
 )
 
 
+# ─────────────────────────────────────────────────────────────
+# Private Helpers
+# ─────────────────────────────────────────────────────────────
+
+_PRODUCTS_QUERY = f"""
+query ($cursor: String, $query: String) {{
+    products(first: 250, after: $cursor, query: $query) {{
+        pageInfo {{ hasNextPage endCursor }}
+        edges {{
+            node {{
+                {PRODUCT_FIELDS}
+            }}
+        }}
+    }}
+}}
+"""
+
+_ORDER_BY_NAME_QUERY = f"""
+query ($query: String!) {{
+    orders(first: 1, query: $query) {{
+        edges {{
+            node {{
+                {ORDER_FIELDS}
+            }}
+        }}
+    }}
+}}
+"""
+
+
+# Tags folded into one `tag:"A" OR tag:"B"` scan. One collapsed scan costs a
+# single paginated query instead of one per tag; larger tag lists are split into
+# batches that are fetched concurrently.
+TAGS_PER_QUERY = 5
+
+
+def _search_filters(tags: list[str]) -> list[str]:
+    """Shopify query filters covering every tag (OR logic), or all active products."""
+    if not tags:
+        return ["status:active"]
+    batches = [tags[i:i + TAGS_PER_QUERY] for i in range(0, len(tags), TAGS_PER_QUERY)]
+    return [
+        "(" + " OR ".join(f'tag:"{tag}"' for tag in batch) + ") AND status:active"
+        for batch in batches
+    ]
+
+
+def _merge_by_tag(product_lists: list, tags: list[str]) -> list:
+    """
+    De-duplicate by product id and order results as the per-tag scans did:
+    every product of the first tag (in Shopify order), then any new products
+    of the second tag, and so on.
+    """
+    fetched = [p for products in product_lists for p in products]
+    groups = [[] for _ in tags] + [[]]
+    seen_ids = set()
+    for p in fetched:
+        pid = p.get("id")
+        if pid in seen_ids:
+            continue
+        seen_ids.add(pid)
+        product_tags = {t.lower() for t in p.get("tags", [])}
+        # Shopify tag search is case-insensitive; unmatched products go last.
+        slot = next((i for i, tag in enumerate(tags) if tag.lower() in product_tags), len(tags))
+        groups[slot].append(p)
+    return [p for group in groups for p in group]
+
+
+def _live_index(product_lists: list, tags: list[str]) -> tuple[ProductIndex, list[int]]:
+    """Index freshly fetched products; they are already in tag-scan order."""
+    index = ProductIndex(_merge_by_tag(product_lists, tags))
+    return index, list(range(len(index.summaries)))
+
+
+def _fetch_search_products(tags: list[str], stock_max_age: float | None) -> tuple[ProductIndex, list[int]]:
+    """Product index plus the positions matching `tags`, in tag-scan order."""
+    if CATALOG_ENABLED:
+        index = catalog_index(MAX_AGE_BROWSE, stock_max_age=stock_max_age)
+        return index, index.tag_positions(tags)
+
+    def fetch(f):
+        return gql_paginated(_PRODUCTS_QUERY, variables={"query": f}, data_path=["products"])
+    return _live_index(run_bounded(fetch, _search_filters(tags)), tags)
+
+
+async def _afetch_search_products(tags: list[str], stock_max_age: float | None) -> tuple[ProductIndex, list[int]]:
+    if CATALOG_ENABLED:
+        index = await acatalog_index(MAX_AGE_BROWSE, stock_max_age=stock_max_age)
+        return index, index.tag_positions(tags)
+
+    async def fetch(f):
+        return await agql_paginated(_PRODUCTS_QUERY, variables={"query": f}, data_path=["products"])
+    return _live_index(await arun_bounded(fetch, _search_filters(tags)), tags)
+
+
+def _filter_search_results(
+    index: ProductIndex,
+    order: list[int],
+    min_price: float,
+    max_price: float,
+    color: str,
+    product_name: str,
+    in_stock_only: bool,
+) -> list | str:
+    """Apply search_products' name, price, color, and stock filters to indexed positions."""
+    summaries = index.summaries
+
+    # Filter by product name (exact, then fuzzy) — may return a str message
+    if product_name and product_name.strip():
+        matched, exact = index.titles.match(product_name.strip(), order)
+        if not matched:
+            return "No matching product found. Please refine your search."
+        if len(matched) > 1 and not exact:
+            options = ", ".join(f'"{m}"' for m in matched)
+            return f"Multiple similar products found: [{options}]. Which one did you mean?"
+        order = [i for i in order if summaries[i]["title"] == matched[0]]
+
+    # Filter by price range (cheapest variant), from the sorted price index
+    if (min_price and min_price > 0) or (max_price and max_price > 0):
+        price_mask = index.prices.mask(min_price or 0.0, max_price or 0.0)
+        order = [i for i in order if price_mask >> i & 1]
+
+    # Filter by color (variant titles, title, or description)
+    if color:
+        color_mask = index.color_mask(color)
+        color_filtered = [i for i in order if color_mask >> i & 1]
+
+        if not color_filtered:
+            # Colours available across the filtered result set, from the facet index
+            available_colors = index.facets(mask_of(order))["colors"]
+            if available_colors:
+                return (
+                    f"'{color}' is not available, but we do have these colors: "
+                    f"{', '.join(sorted(available_colors))}."
+                )
+            return f"No products found matching color '{color}'."
+
+        order = color_filtered
+
+    # Filter by stock
+    if in_stock_only:
+        order = [i for i in order if index.in_stock_mask >> i & 1]
+
+    return [summaries[i] for i in order]
+
+
 # ─────────────────────────────────────────────────────────────
 # Tool 1: Search / Browse Products
 # ─────────────────────────────────────────────────────────────
@@ -31,12 +187,13 @@ from utils import (
 def search_products(
     tags: list[str] = [],
     max_price: float = 0.0,
+    min_price: float = 0.0,
     color: str = "",
     product_name: str = "",
     in_stock_only: bool = False,
 ):
     """
-    Search Silk Skin products by one or more tags, price, color, product name, and stock status.
+    Search Silk Skin products by one or more tags, price range, color, product name, and stock status.
 
     WHEN TO USE:
         Use for any product browsing, filtering, or searching request from a customer.
@@ -61,7 +218,8 @@ def search_products(
         exact title not required.
 
     PRICE:
-        All prices are in Pakistani Rupees (PKR). max_price=0.0 means no price filter.
+        All prices are in Pakistani Rupees (PKR) and compared against a product's
+        cheapest variant. max_price=0.0 / min_price=0.0 mean no bound on that side.
 
     COLOR:
         Pass a plain color word: "black", "brown", "red", "tan", etc.
@@ -69,6 +227,7 @@ def search_products(
     Args:
         tags:         List of tags to filter by (OR logic). Empty = all products.
         max_price:    Maximum price in PKR. 0.0 = no filter.
+        min_price:    Minimum price in PKR. 0.0 = no filter.
         color:        Color keyword to match in variant titles, product title, or description.
         product_name: Approximate product name for fuzzy title matching.
         in_stock_only: If True, only return products with at least one variant in stock.
@@ -77,102 +236,65 @@ def search_products(
         List of product summaries: {title, tags, price_range, in_stock, variants, description}.
     """
     try:
-        query = f"""
-        query ($cursor: String, $query: String) {{
-            products(first: 250, after: $cursor, query: $query) {{
-                pageInfo {{ hasNextPage endCursor }}
-                edges {{
-                    node {{
-                        {PRODUCT_FIELDS}
-                    }}
-                }}
-            }}
-        }}
-        """
-
-        all_products = []
-        seen_ids = set()
+        stock_max_age = MAX_AGE_INVENTORY if in_stock_only else None
+        index, order = _fetch_search_products(tags, stock_max_age)
+        return _filter_search_results(index, order, min_price, max_price, color, product_name, in_stock_only)
+    except Exception as e:
+        return f"Failed to search products: {str(e)}"
 
-        if tags:
-            for tag in tags:
-                tag_products = gql_paginated(
-                    query,
-                    variables={"query": f'tag:"{tag}" AND status:active'},
-                    data_path=["products"],
-                )
-                for p in tag_products:
-                    pid = p.get("id")
-                    if pid not in seen_ids:
-                        seen_ids.add(pid)
-                        all_products.append(p)
-        else:
-            all_products = gql_paginated(
-                query,
-                variables={"query": "status:active"},
-                data_path=["products"],
-            )
-
-        summarized = [summarize_product(p) for p in all_products]
-
-        # Filter by product name (fuzzy) — may return a str error message
-        if product_name:
-            result = filter_products_by_name(summarized, product_name)
-            if isinstance(result, str):
-                return result
-            summarized = result
-
-        # Filter by max price
-        if max_price and max_price > 0:
-            summarized = filter_products_by_price(summarized, max_price)
-
-        # Filter by color
-        if color:
-            color_lower = color.lower()
-            color_filtered = []
-            for p in summarized:
-                variant_match = any(
-                    color_lower in v.get("title", "").lower()
-                    for v in p.get("variants", [])
-                )
-                title_match = color_lower in p.get("title", "").lower()
-                desc_match = color_lower in p.get("description", "").lower()
-                if variant_match or title_match or desc_match:
-                    color_filtered.append(p)
-
-            if not color_filtered:
-                # Collect all available colors across the filtered result set
-                available_colors = set()
-                for p in summarized:
-                    for v in p.get("variants", []):
-                        title = v.get("title", "").lower()
-                        if title and title != "default title":
-                            available_colors.add(title)
-                if available_colors:
-                    return (
-                        f"'{color}' is not available, but we do have these colors: "
-                        f"{', '.join(sorted(available_colors))}."
-                    )
-                return f"No products found matching color '{color}'."
-
-            summarized = color_filtered
-
-        # Filter by stock
-        if in_stock_only:
-            summarized = [
-                p for p in summarized
-                if any(v.get("inventory_quantity", 0) > 0 for v in p.get("variants", []))
-            ]
-
-        return summarized
 
+async def _asearch_products(
+    tags: list[str] = [],
+    max_price: float = 0.0,
+    min_price: float = 0.0,
+    color: str = "",
+    product_name: str = "",
+    in_stock_only: bool = False,
+):
+    """Async variant of search_products."""
+    try:
+        stock_max_age = MAX_AGE_INVENTORY if in_stock_only else None
+        index, order = await _afetch_search_products(tags, stock_max_age)
+        return _filter_search_results(index, order, min_price, max_price, color, product_name, in_stock_only)
     except Exception as e:
         return f"Failed to search products: {str(e)}"
 
 
+search_products.coroutine = _asearch_products
+
+
 # ─────────────────────────────────────────────────────────────
 # Tool 2: Get Best-Selling Products
 # ─────────────────────────────────────────────────────────────
 
+_BEST_SELLERS_TAG = "featured collection"
+_BEST_SELLERS_FILTER = f'tag:"{_BEST_SELLERS_TAG}" AND status:active'
+
+
+def _fetch_best_sellers(limit: int) -> list:
+    if CATALOG_ENABLED:
+        index = catalog_index(MAX_AGE_BROWSE)
+        return [index.summaries[i] for i in index.tag_positions([_BEST_SELLERS_TAG])[:limit]]
+    products = gql_paginated(
+        _PRODUCTS_QUERY,
+        variables={"query": _BEST_SELLERS_FILTER},
+        data_path=["products"],
+    )
+    return [summarize_product(p) for p in products[:limit]]
+
+
+async def _afetch_best_sellers(limit: int) -> list:
+    if CATALOG_ENABLED:
+        index = await acatalog_index(MAX_AGE_BROWSE)
+        return [index.summaries[i] for i in index.tag_positions([_BEST_SELLERS_TAG])[:limit]]
+    products = await agql_paginated(
+        _PRODUCTS_QUERY,
+        variables={"query": _BEST_SELLERS_FILTER},
+        data_path=["products"],
+    )
+    return [summarize_product(p) for p in products[:limit]]
+
+
 @tool
 def get_best_sellers(limit: int = 5) -> list:
     """
@@ -191,29 +313,38 @@ def get_best_sellers(limit: int = 5) -> list:
     """
     try:
         limit = min(limit, 10)
-        query = f"""
-        query ($cursor: String) {{
-            products(first: 250, after: $cursor, query: "tag:\\"featured collection\\" AND status:active") {{
-                pageInfo {{ hasNextPage endCursor }}
-                edges {{
-                    node {{
-                        {PRODUCT_FIELDS}
-                    }}
-                }}
-            }}
-        }}
-        """
-        products = gql_paginated(query, variables={}, data_path=["products"])
-        return [summarize_product(p) for p in products[:limit]]
+        return _fetch_best_sellers(limit)
 
     except Exception as e:
         return f"Failed to get best sellers: {str(e)}"
 
 
+async def _aget_best_sellers(limit: int = 5) -> list:
+    """Async variant of get_best_sellers."""
+    try:
+        limit = min(limit, 10)
+        return await _afetch_best_sellers(limit)
+
+    except Exception as e:
+        return f"Failed to get best sellers: {str(e)}"
+
+
+get_best_sellers.coroutine = _aget_best_sellers
+
+
 # ─────────────────────────────────────────────────────────────
 # Tool 3: Get Order Status
 # ─────────────────────────────────────────────────────────────
 
+def _order_name_filters(clean_number: str) -> list[str]:
+    """Lookup filters tried in order: '#45821' (Shopify's format), then bare '45821'."""
+    return [f'name:"#{clean_number}"', f'name:"{clean_number}"']
+
+
+def _order_not_found(clean_number: str) -> str:
+    return f"No order found with number #{clean_number}. Please double-check the order number and try again."
+
+
 @tool
 def get_order_status(order_number: str) -> dict:
     """
@@ -234,35 +365,39 @@ def get_order_status(order_number: str) -> dict:
     try:
         clean_number = order_number.lstrip("#").strip()
 
-        query = f"""
-        query ($query: String!) {{
-            orders(first: 1, query: $query) {{
-                edges {{
-                    node {{
-                        {ORDER_FIELDS}
-                    }}
-                }}
-            }}
-        }}
-        """
-
         # Shopify order name format is '#45821'
-        data = gql(query, {"query": f'name:"#{clean_number}"'})
-        edges = data.get("orders", {}).get("edges", [])
-
-        if not edges:
-            data = gql(query, {"query": f'name:"{clean_number}"'})
+        for name_filter in _order_name_filters(clean_number):
+            data = gql(_ORDER_BY_NAME_QUERY, {"query": name_filter})
             edges = data.get("orders", {}).get("edges", [])
+            if edges:
+                return summarize_order(edges[0]["node"])
+
+        return _order_not_found(clean_number)
+
+    except Exception as e:
+        return f"Failed to retrieve order status: {str(e)}"
+
 
-        if not edges:
-            return f"No order found with number #{clean_number}. Please double-check the order number and try again."
+async def _aget_order_status(order_number: str) -> dict:
+    """Async variant of get_order_status."""
+    try:
+        clean_number = order_number.lstrip("#").strip()
 
-        return summarize_order(edges[0]["node"])
+        for name_filter in _order_name_filters(clean_number):
+            data = await agql(_ORDER_BY_NAME_QUERY, {"query": name_filter})
+            edges = data.get("orders", {}).get("edges", [])
+            if edges:
+                return summarize_order(edges[0]["node"])
+
+        return _order_not_found(clean_number)
 
     except Exception as e:
         return f"Failed to retrieve order status: {str(e)}"
 
 
+get_order_status.coroutine = _aget_order_status
+
+
 # ─────────────────────────────────────────────────────────────
 # Tool 4: Get Store Policies
 # ─────────────────────────────────────────────────────────────
@@ -316,6 +451,14 @@ def get_store_policies(policy_type: str) -> str:
     )
 
 
+async def _aget_store_policies(policy_type: str) -> str:
+    """Async variant of get_store_policies (static text — no I/O, avoids a thread hop)."""
+    return get_store_policies.func(policy_type)
+
+
+get_store_policies.coroutine = _aget_store_policies
+
+
 # ─────────────────────────────────────────────────────────────
 # Exported tool lists
 # ─────────────────────────────────────────────────────────────
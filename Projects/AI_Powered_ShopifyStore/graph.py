@@ -2,10 +2,15 @@
 graph.py — Main LangGraph StateGraph for Silk Skin AI Agent System.
 
 Memory: InMemorySaver (conversation memory across turns per thread_id)
+
+The agent nodes have both sync and async implementations, so the compiled
+graph supports `invoke` (CLI, Streamlit) and `ainvoke` (async servers) alike.
 """
 
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.config import get_stream_writer
 
 from state import State, Context
 from agents import create_customer_agent, create_admin_agent
@@ -49,6 +54,11 @@ def route_decision(state: State) -> str:
     return state.get("active_agent", "customer_support_agent")
 
 
+def _announce(agent: str) -> None:
+    """Tell streaming clients which agent is answering (a no-op unless stream_mode includes "custom")."""
+    get_stream_writer()({"agent": agent})
+
+
 # ─────────────────────────────────────────────
 # Node: Customer Support Agent
 # ─────────────────────────────────────────────
@@ -60,10 +70,18 @@ def customer_support_node(state: State) -> dict:
     Passes the full message history to maintain context across turns.
     Returns updated messages including the agent's response and any tool calls.
     """
+    _announce("customer_support_agent")
     result = _customer_agent.invoke({"messages": state["messages"]})
     return {"messages": result["messages"]}
 
 
+async def acustomer_support_node(state: State) -> dict:
+    """Async variant of customer_support_node — tools await Shopify natively."""
+    _announce("customer_support_agent")
+    result = await _customer_agent.ainvoke({"messages": state["messages"]})
+    return {"messages": result["messages"]}
+
+
 # ─────────────────────────────────────────────
 # Node: Admin Support Agent
 # ─────────────────────────────────────────────
@@ -77,10 +95,18 @@ def admin_support_node(state: State) -> dict:
     
     Returns updated messages including the agent's response and any tool calls.
     """
+    _announce("admin_support_agent")
     result = _admin_agent.invoke({"messages": state["messages"]})
     return {"messages": result["messages"]}
 
 
+async def aadmin_support_node(state: State) -> dict:
+    """Async variant of admin_support_node — tools await Shopify natively."""
+    _announce("admin_support_agent")
+    result = await _admin_agent.ainvoke({"messages": state["messages"]})
+    return {"messages": result["messages"]}
+
+
 # ─────────────────────────────────────────────
 # Build the Graph
 # ─────────────────────────────────────────────
@@ -107,8 +133,14 @@ def build_graph():
 
     # Register nodes
     graph_builder.add_node("router", router)
-    graph_builder.add_node("customer_support_agent", customer_support_node)
-    graph_builder.add_node("admin_support_agent", admin_support_node)
+    graph_builder.add_node(
+        "customer_support_agent",
+        RunnableLambda(customer_support_node, afunc=acustomer_support_node),
+    )
+    graph_builder.add_node(
+        "admin_support_agent",
+        RunnableLambda(admin_support_node, afunc=aadmin_support_node),
+    )
 
     # Define edges
     graph_builder.add_edge(START, "router")
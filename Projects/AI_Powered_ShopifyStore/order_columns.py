@@ -0,0 +1,102 @@
+"""
+order_columns.py — Columnar (NumPy) view of an order stream for revenue aggregation.
+
+OrderColumns reads orders once into flat arrays:
+    - amount      — order total per order (float64, parsed like _order_revenue)
+    - item_order  — owning order position per line item
+    - item_title  — title code per line item (codes in first-seen order)
+    - item_qty    — quantity per line item
+
+The input is either order nodes (paginated results, lineItems nested) or the
+flattened lines of a bulk operation result, where each LineItem is its own
+line carrying __parentId. Reading bulk lines directly skips re-nesting them
+(bulk.nest_children), which costs far more than the aggregation itself on
+large windows.
+
+Revenue, order counts and units per title are then array operations: a
+title lookup table masks line items, bincount sums units per title, and
+argpartition picks the top N titles without sorting every title.
+
+Results match admin_tools' loop aggregation exactly: revenue is summed in
+stream order (cumsum is sequential, unlike sum), and equal unit counts rank
+in first-seen order, as a stable sort over an insertion-ordered dict would.
+"""
+
+from array import array
+import numpy as np
+
+
+class OrderColumns:
+    """Flat arrays over one pass of order nodes or flattened bulk lines."""
+
+    def __init__(self, orders):
+        amounts, item_order, item_title, item_qty = array("d"), array("q"), array("q"), array("q")
+        add_order, add_title, add_qty = item_order.append, item_title.append, item_qty.append
+        codes: dict[str, int] = {}
+        position, current_id = -1, None
+
+        def add_item(item):
+            title = item.get("title", "Unknown")
+            code = codes.get(title)
+            if code is None:
+                code = codes[title] = len(codes)
+            add_order(position)
+            add_title(code)
+            add_qty(item.get("quantity", 0) or 0)
+
+        for obj in orders:
+            parent_id = obj.get("__parentId")
+            if parent_id is None:
+                position, current_id = position + 1, obj.get("id")
+                amounts.append(float(obj.get("totalPriceSet", {}).get("shopMoney", {}).get("amount", 0) or 0))
+                for edge in obj.get("lineItems", {}).get("edges", []):
+                    add_item(edge["node"])
+            # Bulk children follow their parent order (see bulk.py).
+            elif parent_id == current_id and obj.get("__typename") == "LineItem":
+                add_item(obj)
+
+        self.titles = list(codes)
+        self.amount = np.frombuffer(amounts, dtype=np.float64) if amounts else np.zeros(0, dtype=np.float64)
+        self.item_order, self.item_title, self.item_qty = (
+            np.frombuffer(column, dtype=np.int64) if column else np.zeros(0, dtype=np.int64)
+            for column in (item_order, item_title, item_qty)
+        )
+
+    def _item_mask(self, allowed_titles: set | None) -> np.ndarray:
+        if allowed_titles is None:
+            return np.ones(len(self.item_title), dtype=bool)
+        allowed = np.array([t in allowed_titles for t in self.titles], dtype=bool)
+        return allowed[self.item_title]
+
+    def revenue(self, allowed_titles: set | None, limit: int | None = None) -> tuple[float, int, list[tuple[str, int]]]:
+        """
+        (revenue, order_count, [(title, units)]) over orders with at least one
+        line item in `allowed_titles` (any title when None); titles ranked by
+        units sold, the top `limit` only when given.
+        """
+        mask = self._item_mask(allowed_titles)
+        contributes = np.zeros(len(self.amount), dtype=bool)
+        contributes[self.item_order[mask]] = True
+        amounts = self.amount[contributes]
+        total_revenue = float(np.cumsum(amounts)[-1]) if len(amounts) else 0.0
+
+        titles = self.item_title[mask]
+        present = np.bincount(titles, minlength=len(self.titles)) > 0
+        units = np.bincount(titles, weights=self.item_qty[mask], minlength=len(self.titles)).astype(np.int64)
+        codes = np.flatnonzero(present)
+        return total_revenue, int(contributes.sum()), [
+            (self.titles[c], int(units[c])) for c in _rank(codes, units[codes], limit)
+        ]
+
+
+def _rank(codes: np.ndarray, units: np.ndarray, limit: int | None) -> np.ndarray:
+    """Codes by units descending, ties by code (first seen); only the top `limit` when given."""
+    if limit is not None and limit < len(codes):
+        if limit <= 0:
+            return codes[:0]
+        # Everything at or above the limit-th largest count, then an exact ordering of just those.
+        threshold = units[np.argpartition(-units, limit - 1)[limit - 1]]
+        keep = units >= threshold
+        codes, units = codes[keep], units[keep]
+    order = np.lexsort((codes, -units))
+    return codes[order][:limit]
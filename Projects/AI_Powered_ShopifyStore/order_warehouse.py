@@ -0,0 +1,448 @@
+"""
+order_warehouse.py — Local SQLite store of Shopify orders for admin analytics.
+
+Admin tools used to re-download full order nodes for every question, and the
+5-page cap silently truncated any window with more than 1,250 orders. The
+warehouse loads every order once, then keeps itself current with incremental
+`updated_at:>=` syncs (background timer, on-demand when a reader needs fresher
+data than `max_age`, and order/refund webhooks via webhooks.py). A first load
+larger than the page cap is streamed from a bulk operation (bulk.py).
+
+Orders are normalized into two tables:
+    orders      — one row per order (status, created_at, total, full node JSON)
+    line_items  — one row per line item (title, quantity, unit price)
+indexed by created_at, financial status and product title, so admin reports
+are SQL queries with no page cap.
+
+Paid/pending orders are also rolled up per UTC day as they are ingested:
+    daily_sales        — revenue and order count
+    daily_title_units  — units sold per product title
+Whenever an order is upserted, the rollup rows for its old and new day are
+recomputed, so date-range totals are sums over day rows — O(days), not
+O(orders). Revenue restricted to specific titles still reads the base tables,
+since an order can contain several of them.
+
+Date bounds match the Shopify filters the tools used before:
+created_at:>"start" AND created_at:<"end", compared against UTC timestamps.
+
+Orders deleted in Shopify are not removed; they are rare and archived orders
+stay searchable in Shopify too.
+
+Environment:
+    ORDERS_WAREHOUSE_ENABLED — "0" makes admin tools query Shopify directly (default "1").
+    ORDERS_DB_PATH           — SQLite file (default: in-memory, reloaded on restart).
+    ORDERS_SYNC_INTERVAL     — Background incremental sync period, seconds (default 120).
+    ORDERS_MAX_AGE           — Freshness bound for admin reports, seconds (default 60).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from datetime import date
+from utils import gql, gql_paginated, ORDER_FIELDS
+from throttle import PRIORITY_ANALYTICS
+from bulk import bulk_orders, should_bulk_orders
+
+# ─────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────
+
+WAREHOUSE_ENABLED = os.getenv("ORDERS_WAREHOUSE_ENABLED", "1") == "1"
+ORDERS_DB_PATH = os.getenv("ORDERS_DB_PATH", "")
+SYNC_INTERVAL = float(os.getenv("ORDERS_SYNC_INTERVAL", "120"))
+MAX_AGE_ORDERS = float(os.getenv("ORDERS_MAX_AGE", "60"))
+
+# Orders per apply() while streaming a bulk first load.
+_BULK_BATCH = 1000
+
+PAID_STATUSES = ("PAID", "PENDING")
+REFUND_STATUSES = ("REFUNDED", "PARTIALLY_REFUNDED")
+UNFULFILLED_STATUSES = ("UNFULFILLED", "PARTIALLY_FULFILLED")
+
+_WAREHOUSE_FIELDS = f"""
+    {ORDER_FIELDS}
+    updatedAt
+    closed
+    cancelledAt
+"""
+
+_SYNC_QUERY = f"""
+query ($cursor: String, $query: String) {{
+    orders(first: 250, after: $cursor, query: $query, sortKey: UPDATED_AT) {{
+        pageInfo {{ hasNextPage endCursor }}
+        edges {{ node {{ {_WAREHOUSE_FIELDS} }} }}
+    }}
+}}
+"""
+
+_NODES_QUERY = f"""
+query ($ids: [ID!]!) {{
+    nodes(ids: $ids) {{
+        ... on Order {{ {_WAREHOUSE_FIELDS} }}
+    }}
+}}
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id                 TEXT PRIMARY KEY,
+    num                INTEGER NOT NULL,
+    name               TEXT,
+    created_at         TEXT,
+    updated_at         TEXT,
+    financial_status   TEXT,
+    fulfillment_status TEXT,
+    is_open            INTEGER,
+    total              REAL,
+    node               TEXT
+);
+CREATE TABLE IF NOT EXISTS line_items (
+    order_id   TEXT NOT NULL,
+    position   INTEGER NOT NULL,
+    title      TEXT,
+    quantity   INTEGER,
+    unit_price REAL,
+    PRIMARY KEY (order_id, position)
+);
+CREATE TABLE IF NOT EXISTS daily_sales (
+    day          TEXT PRIMARY KEY,
+    revenue      REAL,
+    orders       INTEGER,
+    item_revenue REAL,      -- orders with at least one line item
+    item_orders  INTEGER
+);
+CREATE TABLE IF NOT EXISTS daily_title_units (
+    day        TEXT NOT NULL,
+    title      TEXT,
+    units      INTEGER,
+    first_seen INTEGER      -- min(order num * 100 + position), for stable ranking
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE INDEX IF NOT EXISTS orders_created ON orders (created_at);
+CREATE INDEX IF NOT EXISTS orders_day ON orders (substr(created_at, 1, 10));
+CREATE INDEX IF NOT EXISTS daily_title_units_day ON daily_title_units (day);
+CREATE INDEX IF NOT EXISTS orders_financial ON orders (financial_status, created_at);
+CREATE INDEX IF NOT EXISTS line_items_title ON line_items (title);
+-- Tag rollups were never read; drop them from stores that still have them.
+DROP TABLE IF EXISTS daily_tag_units;
+DROP TABLE IF EXISTS line_item_tags;
+"""
+
+
+def order_number(order_id: str) -> int:
+    """Numeric part of an order GID — Shopify's default order ordering."""
+    try:
+        return int(str(order_id).rsplit("/", 1)[-1])
+    except ValueError:
+        return 0
+
+
+def _money(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _placeholders(values) -> str:
+    return ", ".join("?" for _ in values)
+
+
+def _day(created_at: str | None) -> str | None:
+    return created_at[:10] if created_at else None
+
+
+_PAID = f"o.financial_status IN ({_placeholders(PAID_STATUSES)})"
+
+# Rollup rebuild statements; each takes PAID_STATUSES then the days to rebuild.
+_ROLLUP_SQL = {
+    "daily_sales": """
+        INSERT INTO daily_sales (day, revenue, orders, item_revenue, item_orders)
+        SELECT day, SUM(total), COUNT(*), SUM(total * has_items), SUM(has_items) FROM (
+            SELECT substr(o.created_at, 1, 10) AS day, o.total,
+                   EXISTS (SELECT 1 FROM line_items li WHERE li.order_id = o.id) AS has_items
+            FROM orders o WHERE {paid} AND substr(o.created_at, 1, 10) IN ({days})
+        ) GROUP BY day""",
+    "daily_title_units": """
+        INSERT INTO daily_title_units (day, title, units, first_seen)
+        SELECT substr(o.created_at, 1, 10), li.title, SUM(li.quantity), MIN(o.num * 100 + li.position)
+        FROM line_items li JOIN orders o ON o.id = li.order_id
+        WHERE {paid} AND substr(o.created_at, 1, 10) IN ({days})
+        GROUP BY 1, 2""",
+}
+
+
+class OrderWarehouse:
+    """Thread-safe SQLite order store with an updatedAt sync cursor."""
+
+    def __init__(self, db_path: str = ""):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._db = sqlite3.connect(db_path or ":memory:", check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'cursor'").fetchone()
+        self._cursor: str | None = row[0] if row else None
+        if not self._db.execute("SELECT 1 FROM daily_sales LIMIT 1").fetchone():
+            # Store written before rollups existed (or empty): build them once.
+            with self._db:
+                days = [r[0] for r in self._db.execute("SELECT DISTINCT substr(created_at, 1, 10) FROM orders")]
+                self._refresh_rollups(days)
+        self._synced_at: float | None = None
+        self._timer: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    # ── Ingestion ─────────────────────────────
+
+    def apply(self, nodes: list[dict], advance_cursor: bool = True) -> None:
+        """Upsert order nodes and their line items; only syncs advance the cursor."""
+        order_rows, item_rows = [], []
+        for node in nodes:
+            oid = node.get("id")
+            if not oid:
+                continue
+            order_rows.append((
+                oid,
+                order_number(oid),
+                node.get("name"),
+                node.get("createdAt"),
+                node.get("updatedAt"),
+                node.get("displayFinancialStatus"),
+                node.get("displayFulfillmentStatus"),
+                int(not node.get("closed") and not node.get("cancelledAt")),
+                _money(node.get("totalPriceSet", {}).get("shopMoney", {}).get("amount", 0)),
+                json.dumps(node),
+            ))
+            for position, edge in enumerate(node.get("lineItems", {}).get("edges", [])):
+                item = edge["node"]
+                item_rows.append((
+                    oid,
+                    position,
+                    item.get("title", "Unknown"),
+                    item.get("quantity", 0) or 0,
+                    _money(item.get("originalUnitPrice")),
+                ))
+
+        with self._lock, self._db:
+            ids = [(row[0],) for row in order_rows]
+            # Days the orders used to fall on, plus the days they fall on now
+            days = {_day(row[3]) for row in order_rows}
+            for oid in ids:
+                row = self._db.execute("SELECT created_at FROM orders WHERE id = ?", oid).fetchone()
+                if row:
+                    days.add(_day(row[0]))
+
+            self._db.executemany("DELETE FROM line_items WHERE order_id = ?", ids)
+            self._db.executemany("INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", order_rows)
+            self._db.executemany("INSERT INTO line_items VALUES (?, ?, ?, ?, ?)", item_rows)
+            self._refresh_rollups([d for d in days if d])
+            if advance_cursor:
+                self._advance_cursor(max((n["updatedAt"] for n in nodes if n.get("updatedAt")), default=None))
+
+    def _advance_cursor(self, updated: str | None) -> None:
+        with self._lock, self._db:
+            if updated and (self._cursor is None or updated > self._cursor):
+                self._cursor = updated
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cursor', ?)", (updated,))
+
+    def _refresh_rollups(self, days: list[str]) -> None:
+        """Recompute every rollup row for `days`; caller holds the lock and a transaction."""
+        # Batches stay well under SQLite's bound-parameter limit.
+        for i in range(0, len(days), 500):
+            batch = days[i:i + 500]
+            marks = _placeholders(batch)
+            for table, sql in _ROLLUP_SQL.items():
+                self._db.execute(f"DELETE FROM {table} WHERE day IN ({marks})", batch)
+                self._db.execute(sql.format(paid=_PAID, days=marks), (*PAID_STATUSES, *batch))
+
+    def refresh_orders(self, order_ids: list[str], priority: int = PRIORITY_ANALYTICS) -> None:
+        """Re-fetch specific orders by GID (used by order/refund webhooks)."""
+        data = gql(_NODES_QUERY, {"ids": list(order_ids)}, priority)
+        self.apply([n for n in data.get("nodes", []) if n and n.get("id")], advance_cursor=False)
+
+    # ── Sync ──────────────────────────────────
+
+    def _bulk_load(self, priority: int) -> None:
+        """
+        Stream every order from a bulk operation, applying it in batches. The
+        cursor only moves once the whole file is in — the file is in id order,
+        so a partial load must not look like a complete one.
+        """
+        batch, newest = [], None
+        for node in bulk_orders("", priority=priority):
+            batch.append(node)
+            if node.get("updatedAt") and (newest is None or node["updatedAt"] > newest):
+                newest = node["updatedAt"]
+            if len(batch) >= _BULK_BATCH:
+                self.apply(batch, advance_cursor=False)
+                batch = []
+        self.apply(batch, advance_cursor=False)
+        self._advance_cursor(newest)
+
+    def _sync_locked(self, priority: int) -> None:
+        started = time.monotonic()
+        with self._lock:
+            cursor = self._cursor
+        if cursor is None and should_bulk_orders("", priority=priority):
+            self._bulk_load(priority)
+            with self._lock:
+                self._synced_at = started
+            return
+        # No cursor yet: load every order the app can read.
+        query_filter = f'updated_at:>="{cursor}"' if cursor else ""
+        nodes = gql_paginated(
+            _SYNC_QUERY,
+            variables={"query": query_filter},
+            data_path=["orders"],
+            max_pages=None,
+            priority=priority,
+        )
+        self.apply(nodes)
+        with self._lock:
+            self._synced_at = started
+
+    def sync(self, priority: int = PRIORITY_ANALYTICS) -> None:
+        """Pull orders updated since the cursor (everything on first run)."""
+        with self._sync_lock:
+            self._sync_locked(priority)
+
+    def age(self) -> float:
+        """Seconds since the last successful sync started (inf if never synced)."""
+        with self._lock:
+            return float("inf") if self._synced_at is None else time.monotonic() - self._synced_at
+
+    def ensure_fresh(self, max_age: float = MAX_AGE_ORDERS, priority: int = PRIORITY_ANALYTICS) -> None:
+        """Sync in the calling thread if the store is older than `max_age` seconds."""
+        if self.age() > max_age:
+            with self._sync_lock:
+                if self.age() > max_age:   # Another thread may have synced while we waited
+                    self._sync_locked(priority)
+
+    async def aensure_fresh(self, max_age: float = MAX_AGE_ORDERS, priority: int = PRIORITY_ANALYTICS) -> None:
+        """Async counterpart of ensure_fresh(); a stale store is synced off the event loop."""
+        if self.age() > max_age:
+            await asyncio.to_thread(self.ensure_fresh, max_age, priority)
+
+    # ── Queries ───────────────────────────────
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _nodes(self, where: str, params: tuple, order_by: str = "num") -> list[dict]:
+        rows = self._query(f"SELECT node FROM orders WHERE {where} ORDER BY {order_by}", params)
+        return [json.loads(row[0]) for row in rows]
+
+    def created_between(self, start: date, end: date) -> list[dict]:
+        """Order nodes created inside the window, oldest id first."""
+        return self._nodes("created_at > ? AND created_at < ?", (str(start), str(end)))
+
+    def refunded_between(self, start: date, end: date) -> list[dict]:
+        """Fully refunded orders, then partially refunded ones, created inside the window."""
+        return self._nodes(
+            f"financial_status IN ({_placeholders(REFUND_STATUSES)}) AND created_at > ? AND created_at < ?",
+            (*REFUND_STATUSES, str(start), str(end)),
+            order_by="financial_status = 'PARTIALLY_REFUNDED', num",
+        )
+
+    def unfulfilled(self) -> list[dict]:
+        """Open orders that are not (fully) fulfilled."""
+        return self._nodes(
+            f"is_open = 1 AND fulfillment_status IN ({_placeholders(UNFULFILLED_STATUSES)})",
+            UNFULFILLED_STATUSES,
+        )
+
+    # Rollup windows: created_at > "start" AND created_at < "end" covers exactly
+    # the UTC days start <= day < end.
+
+    def period_stats(self, start: date, end: date) -> dict:
+        """Paid order count and revenue inside the window, from the daily rollups."""
+        count, revenue = self._query(
+            "SELECT COALESCE(SUM(orders), 0), COALESCE(SUM(revenue), 0) FROM daily_sales WHERE day >= ? AND day < ?",
+            (str(start), str(end)),
+        )[0]
+        return {"order_count": count, "revenue": revenue}
+
+    def _ranked_units(self, start: date, end: date, titles: set | None) -> list[tuple[str, int]]:
+        title_clause, title_params = "", ()
+        if titles is not None:
+            title_clause, title_params = f"AND title IN ({_placeholders(titles)})", tuple(titles)
+        return self._query(
+            f"""SELECT title, SUM(units) AS total FROM daily_title_units
+                WHERE day >= ? AND day < ? {title_clause}
+                GROUP BY title ORDER BY total DESC, MIN(first_seen)""",
+            (str(start), str(end), *title_params),
+        )
+
+    def revenue(self, start: date, end: date, titles: set | None = None) -> tuple[float, int, list[tuple[str, int]]]:
+        """
+        Revenue report inputs for paid orders inside the window.
+
+        Only orders with at least one line item in `titles` (any title when None)
+        count. Returns (revenue, order_count, [(title, units)]) with titles ranked
+        by units, ties in order of first appearance.
+        """
+        ranked = self._ranked_units(start, end, titles)
+        if titles is None:
+            revenue, count = self._query(
+                """SELECT COALESCE(SUM(item_revenue), 0), COALESCE(SUM(item_orders), 0)
+                   FROM daily_sales WHERE day >= ? AND day < ?""",
+                (str(start), str(end)),
+            )[0]
+            return revenue, count, ranked
+
+        revenue, count = self._query(
+            f"""SELECT COALESCE(SUM(o.total), 0), COUNT(*) FROM orders o
+                WHERE {_PAID} AND o.created_at > ? AND o.created_at < ? AND EXISTS (
+                    SELECT 1 FROM line_items li
+                    WHERE li.order_id = o.id AND li.title IN ({_placeholders(titles)}))""",
+            (*PAID_STATUSES, str(start), str(end), *titles),
+        )[0]
+        return revenue, count, ranked
+
+    def sold_titles(self, start: date, end: date) -> set:
+        """Line item titles of paid orders inside the window."""
+        rows = self._query(
+            "SELECT DISTINCT title FROM daily_title_units WHERE day >= ? AND day < ?",
+            (str(start), str(end)),
+        )
+        return {row[0] for row in rows}
+
+    # ── Background timer ──────────────────────
+
+    def start(self, interval: float = SYNC_INTERVAL) -> None:
+        """Start incremental syncs every `interval` seconds on a daemon thread."""
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._stop.clear()
+        self._timer = threading.Thread(target=self._run, args=(interval,), name="orders-sync", daemon=True)
+        self._timer.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sync(PRIORITY_ANALYTICS)
+            except Exception as e:
+                print(f"Order sync failed: {e}")
+            self._stop.wait(interval)
+
+    def stats(self) -> dict:
+        orders, items = self._query("SELECT (SELECT COUNT(*) FROM orders), (SELECT COUNT(*) FROM line_items)")[0]
+        return {
+            "orders": orders,
+            "line_items": items,
+            "cursor": self._cursor,
+            "age_seconds": None if self._synced_at is None else round(self.age(), 1),
+        }
+
+
+# ─────────────────────────────────────────────
+# Process-wide warehouse
+# ─────────────────────────────────────────────
+
+warehouse = OrderWarehouse(ORDERS_DB_PATH)
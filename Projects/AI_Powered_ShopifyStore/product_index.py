@@ -0,0 +1,283 @@
+"""
+product_index.py — In-memory search indexes over the product catalog.
+
+ProductIndex precomputes, once per catalog version:
+    - LLM-ready product summaries (summarize_product output)
+    - tag → product bitset (every tag, matched case-insensitively)
+    - in-stock bitset
+    - text token → product bitset over variant titles, product title and
+      description, used to resolve colour filters without scanning
+    - colour (variant title) → product bitset, for facet counts
+    - numeric minimum variant price per product, sorted for range queries (PriceIndex)
+    - normalised and lowercased titles for exact/fuzzy name lookups (TitleIndex)
+
+Bitsets are plain Python ints where bit i is the product at position i of the
+catalog's id-ordered list, so filters combine with & and |.
+
+catalog_index() / acatalog_index() return the index for the current catalog
+mirror, rebuilding it only when the mirror has changed.
+
+Environment:
+    PRODUCT_FUZZY_WORKERS — Threads rapidfuzz uses to score titles (default 1; -1 = all cores).
+"""
+
+import os
+import re
+import bisect
+import threading
+import numpy as np
+from rapidfuzz import process, fuzz
+from utils import summarize_product
+from catalog import catalog, MAX_AGE_BROWSE
+from throttle import PRIORITY_INTERACTIVE
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_NON_ALNUM_RE = re.compile(r"[^a-zA-Z0-9]")
+
+FUZZY_WORKERS = int(os.getenv("PRODUCT_FUZZY_WORKERS", "1"))
+
+# Name matching: a normalised exact title wins, else the top two WRatio matches at or above the cutoff.
+FUZZY_SCORE_CUTOFF = 65
+FUZZY_LIMIT = 2
+
+
+def _tokens(text: str) -> set[str]:
+    return set(_TOKEN_RE.findall((text or "").lower()))
+
+
+def mask_of(order: list[int]) -> int:
+    """Bitset with the given positions set."""
+    mask = 0
+    for i in order:
+        mask |= 1 << i
+    return mask
+
+
+def positions(mask: int) -> list[int]:
+    """Set bit positions of a bitset, ascending."""
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return out
+
+
+def min_variant_price(product: dict) -> float | None:
+    """
+    Cheapest variant price of a raw product node, at the cent precision shown
+    to customers (summarize_product's PKR strings); None if no price parses.
+    """
+    prices = []
+    for edge in product.get("variants", {}).get("edges", []):
+        try:
+            prices.append(round(float(edge["node"].get("price", "0") or "0"), 2))
+        except ValueError:
+            pass
+    return min(prices) if prices else None
+
+
+class PriceIndex:
+    """
+    Product positions sorted by price, answering price-range queries with
+    bisect. Positions with no price are never matched.
+    """
+
+    def __init__(self, prices: list[float | None]):
+        ranked = sorted((price, i) for i, price in enumerate(prices) if price is not None)
+        self.prices = [price for price, _ in ranked]
+        self.positions = [i for _, i in ranked]
+
+    def _span(self, min_price: float, max_price: float) -> tuple[int, int]:
+        lo = bisect.bisect_left(self.prices, min_price) if min_price > 0 else 0
+        hi = bisect.bisect_right(self.prices, max_price) if max_price > 0 else len(self.prices)
+        return lo, max(lo, hi)
+
+    def mask(self, min_price: float = 0.0, max_price: float = 0.0) -> int:
+        """Bitset of products priced within [min_price, max_price]; 0 leaves that side open."""
+        lo, hi = self._span(min_price, max_price)
+        mask = 0
+        for i in self.positions[lo:hi]:
+            mask |= 1 << i
+        return mask
+
+
+class TitleIndex:
+    """
+    Title lookups: a normalised exact match wins, otherwise the top two WRatio
+    matches scoring at least 65. Normalised keys and lowercased choices are
+    computed once.
+    """
+
+    def __init__(self, titles: list[str]):
+        self.titles = titles
+        self.keys = [_normalize(t or "") for t in titles]
+        self.choices = [(t or "").lower() for t in titles]
+
+    def match(self, query: str, candidates: list[int] | None = None) -> tuple[list[str], bool]:
+        """
+        Titles matching `query` among the `candidates` positions (all by default),
+        searched in candidate order; untitled positions are ignored.
+
+        Returns (titles, exact): every normalised exact match if there is one,
+        else the distinct titles among the top fuzzy matches (possibly none).
+        """
+        if candidates is None:
+            candidates = range(len(self.titles))
+        candidates = [i for i in candidates if self.titles[i]]
+
+        key = _normalize(query)
+        exact = [self.titles[i] for i in candidates if self.keys[i] == key]
+        if exact or not candidates:
+            return exact, bool(exact)
+
+        # float64 scores so cutoff and tie-breaking match process.extract exactly
+        scores = process.cdist(
+            [query.lower()], [self.choices[i] for i in candidates],
+            scorer=fuzz.WRatio, score_cutoff=FUZZY_SCORE_CUTOFF,
+            dtype=np.float64, workers=FUZZY_WORKERS,
+        )[0]
+        top = np.argsort(-scores, kind="stable")[:FUZZY_LIMIT]
+        matched = []
+        for j in top:
+            title = self.titles[candidates[j]]
+            if scores[j] >= FUZZY_SCORE_CUTOFF and title not in matched:
+                matched.append(title)
+        return matched, False
+
+
+def _normalize(s: str) -> str:
+    """Exact-match comparison key: alphanumerics only, lowercased."""
+    return _NON_ALNUM_RE.sub("", s).lower()
+
+
+class ProductIndex:
+    """Read-only search structures over one snapshot of product nodes."""
+
+    def __init__(self, products: list[dict]):
+        self.source = products
+        self.summaries = [summarize_product(p) for p in products]
+        self.all_mask = (1 << len(products)) - 1
+        self.tag_masks: dict[str, int] = {}
+        self.in_stock_mask = 0
+        self.token_masks: dict[str, int] = {}
+        self.tag_labels: dict[str, str] = {}   # lowercased tag → display spelling
+        self.color_masks: dict[str, int] = {}  # lowercased variant title → products
+        self.prices = PriceIndex([min_variant_price(p) for p in products])
+        self.titles = TitleIndex([s["title"] for s in self.summaries])
+
+        for i, (product, summary) in enumerate(zip(products, self.summaries)):
+            bit = 1 << i
+            for tag in product.get("tags", []):
+                key = tag.lower()
+                self.tag_masks[key] = self.tag_masks.get(key, 0) | bit
+                self.tag_labels.setdefault(key, tag)
+            if summary["in_stock"]:
+                self.in_stock_mask |= bit
+
+            variant_titles = [v.get("title", "") for v in summary["variants"]]
+            text = " ".join([summary["title"], summary["description"], *variant_titles])
+            for token in _tokens(text):
+                self.token_masks[token] = self.token_masks.get(token, 0) | bit
+            for title in variant_titles:
+                key = title.lower()
+                if key and key != "default title":
+                    self.color_masks[key] = self.color_masks.get(key, 0) | bit
+
+    # ── Filters ───────────────────────────────
+
+    def tag_mask(self, tags: list[str]) -> int:
+        """Products carrying any of `tags` (OR); all products when `tags` is empty."""
+        if not tags:
+            return self.all_mask
+        mask = 0
+        for tag in tags:
+            mask |= self.tag_masks.get(tag.lower(), 0)
+        return mask
+
+    def tag_positions(self, tags: list[str]) -> list[int]:
+        """
+        Product positions for a tag OR-search, ordered like Shopify per-tag scans:
+        every product of the first tag, then new products of the next tag, and so on.
+        """
+        if not tags:
+            return positions(self.all_mask)
+        ordered, seen = [], 0
+        for tag in tags:
+            mask = self.tag_masks.get(tag.lower(), 0) & ~seen
+            ordered.extend(positions(mask))
+            seen |= mask
+        return ordered
+
+    def color_mask(self, color: str) -> int:
+        """
+        Products whose variant titles, title, or description contain `color`
+        as a case-insensitive substring.
+
+        Single-word queries are answered from the token index (a substring of
+        an alphanumeric run lies inside one token); anything else falls back
+        to scanning the summaries.
+        """
+        needle = color.lower()
+        if _TOKEN_RE.fullmatch(needle):
+            mask = 0
+            for token, token_mask in self.token_masks.items():
+                if needle in token:
+                    mask |= token_mask
+            return mask
+
+        mask = 0
+        for i, s in enumerate(self.summaries):
+            fields = [s["title"], s["description"], *(v.get("title", "") for v in s["variants"])]
+            if any(needle in f.lower() for f in fields):
+                mask |= 1 << i
+        return mask
+
+    # ── Facets ────────────────────────────────
+
+    def facets(self, mask: int) -> dict:
+        """Products per tag, per colour, and in stock within `mask` — popcounts, no scans."""
+        def counts(masks: dict[str, int], label=lambda k: k) -> dict[str, int]:
+            return {label(k): n for k, m in masks.items() if (n := (m & mask).bit_count())}
+
+        return {
+            "tags": counts(self.tag_masks, self.tag_labels.get),
+            "colors": counts(self.color_masks),
+            "in_stock": (self.in_stock_mask & mask).bit_count(),
+            "total": mask.bit_count(),
+        }
+
+
+# ─────────────────────────────────────────────
+# Catalog-backed index (rebuilt when the mirror changes)
+# ─────────────────────────────────────────────
+
+_index: ProductIndex | None = None
+_index_lock = threading.Lock()
+
+
+def _index_for(products: list[dict]) -> ProductIndex:
+    global _index
+    with _index_lock:
+        # The catalog hands out the same list object until its contents change.
+        if _index is None or _index.source is not products:
+            _index = ProductIndex(products)
+        return _index
+
+
+def catalog_index(
+    max_age: float = MAX_AGE_BROWSE,
+    priority: int = PRIORITY_INTERACTIVE,
+    stock_max_age: float | None = None,
+) -> ProductIndex:
+    """Index over the catalog mirror, no older than `max_age` seconds (stock levels: `stock_max_age`)."""
+    return _index_for(catalog.products(max_age, priority, stock_max_age))
+
+
+async def acatalog_index(
+    max_age: float = MAX_AGE_BROWSE,
+    priority: int = PRIORITY_INTERACTIVE,
+    stock_max_age: float | None = None,
+) -> ProductIndex:
+    """Async counterpart of catalog_index()."""
+    return _index_for(await catalog.aproducts(max_age, priority, stock_max_age))
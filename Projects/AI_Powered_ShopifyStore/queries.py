@@ -0,0 +1,107 @@
+"""
+queries.py — Field-projected GraphQL selections composed from reusable fragments.
+
+utils.ORDER_FIELDS / PRODUCT_FIELDS carry everything any tool might show.
+Reports that only aggregate need far less — a period comparison needs order
+totals, a zero-sales check only line item titles — and Shopify charges query
+cost (and we pay bytes and JSON parsing) for every field requested. Each
+report builds its query from just the fragments it reads.
+
+The `bulk=True` forms of the fragments fit bulkOperationRunQuery: no
+pagination arguments, and connection nodes select __typename so flattened
+JSONL lines can be re-nested (see bulk.py).
+
+benchmark_queries.py compares payload size and query cost per tool against
+the full field sets.
+"""
+
+# ─────────────────────────────────────────────
+# Builders
+# ─────────────────────────────────────────────
+
+def select(*fragments: str) -> str:
+    """Join field fragments into one selection set body."""
+    return "\n".join(f for f in fragments if f)
+
+
+def connection(name: str, *fields: str, first: int = 20, bulk: bool = False) -> str:
+    """A `name(first: N) { edges { node { ... } } }` selection."""
+    if bulk:
+        return f"{name} {{ edges {{ node {{ __typename {' '.join(fields)} }} }} }}"
+    return f"{name}(first: {first}) {{ edges {{ node {{ {' '.join(fields)} }} }} }}"
+
+
+def paginated_query(root: str, fields: str, sort_key: str = "") -> str:
+    """A cursor-paginated `root(first: 250, ...)` query for gql_paginated."""
+    sort = f", sortKey: {sort_key}" if sort_key else ""
+    return f"""
+query ($cursor: String, $query: String) {{
+    {root}(first: 250, after: $cursor, query: $query{sort}) {{
+        pageInfo {{ hasNextPage endCursor }}
+        edges {{ node {{ {fields} }} }}
+    }}
+}}
+"""
+
+
+# ─────────────────────────────────────────────
+# Order fragments
+# ─────────────────────────────────────────────
+
+ORDER_HEADER = "id name email createdAt displayFinancialStatus displayFulfillmentStatus tags"
+ORDER_TOTAL = "totalPriceSet { shopMoney { amount } }"
+ORDER_SHIPPING = "shippingAddress { firstName lastName address1 city country phone }"
+ORDER_FULFILLMENTS = "fulfillments { status trackingInfo { number url } }"
+
+
+def order_line_items(*fields: str, bulk: bool = False) -> str:
+    return connection("lineItems", *fields, first=20, bulk=bulk)
+
+
+def order_refunds(bulk: bool = False) -> str:
+    transactions = connection("transactions", "status amountSet { shopMoney { amount } }", first=5, bulk=bulk)
+    # Bulk children find their refund by id.
+    return f"refunds {{ {'id ' if bulk else ''}createdAt note {transactions} }}"
+
+
+# ─────────────────────────────────────────────
+# Per-report order selections
+# ─────────────────────────────────────────────
+
+def order_summary_fields(bulk: bool = False) -> str:
+    """Everything utils.summarize_order reads."""
+    return select(
+        ORDER_HEADER,
+        ORDER_TOTAL,
+        ORDER_SHIPPING,
+        order_line_items("title", "quantity", "originalUnitPrice", bulk=bulk),
+        ORDER_FULFILLMENTS,
+        order_refunds(bulk=bulk),
+    )
+
+
+# Aggregate selections always include id: sliced scans merge their streams in
+# id order and drop nodes seen twice (utils._node_order / _dedupe), and bulk
+# child lines are nested under their order by it.
+
+def order_totals_fields(bulk: bool = False) -> str:
+    """Period stats: order totals only."""
+    return select("id", ORDER_TOTAL)
+
+
+def order_revenue_fields(bulk: bool = False) -> str:
+    """Revenue summary: totals plus line item titles and quantities."""
+    return select("id", ORDER_TOTAL, order_line_items("title", "quantity", bulk=bulk))
+
+
+def order_titles_fields(bulk: bool = False) -> str:
+    """Zero-sales check: line item titles only."""
+    return select("id", order_line_items("title", bulk=bulk))
+
+
+# ─────────────────────────────────────────────
+# Product fragments and selections
+# ─────────────────────────────────────────────
+
+PRODUCT_TITLE = "title"
+PRODUCT_STOCK_FIELDS = select(PRODUCT_TITLE, connection("variants", "title", "inventoryQuantity", "sku", first=20))
@@ -0,0 +1,58 @@
+"""
+replay_webhooks.py — Post recorded Shopify webhook payloads to a local server.
+
+Each line of the input JSONL file is one delivery:
+    {"topic": "products/update", "payload": {...}}
+
+Bodies are signed with SHOPIFY_WEBHOOK_SECRET exactly as Shopify signs them, so
+the server's HMAC verification is exercised too.
+
+Usage:
+    python replay_webhooks.py webhook_samples.jsonl
+    python replay_webhooks.py recorded.jsonl --url http://localhost:8000 --delay 0.5
+"""
+
+import json
+import time
+import uuid
+import argparse
+import httpx
+from webhooks import sign, WEBHOOK_SECRET
+from utils import SHOPIFY_STORE_URL
+
+
+def replay(path: str, base_url: str, secret: str, delay: float) -> None:
+    with open(path, encoding="utf-8") as f, httpx.Client(base_url=base_url, timeout=10) as client:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            topic = record["topic"]
+            body = json.dumps(record["payload"]).encode()
+            response = client.post(
+                f"/webhooks/{topic}",
+                content=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Shopify-Topic": topic,
+                    "X-Shopify-Hmac-Sha256": sign(body, secret),
+                    "X-Shopify-Shop-Domain": SHOPIFY_STORE_URL,
+                    "X-Shopify-Webhook-Id": record.get("webhook_id") or str(uuid.uuid4()),
+                },
+            )
+            print(f"[{line_no}] {topic}: {response.status_code} {response.text}")
+            if delay:
+                time.sleep(delay)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded Shopify webhooks against the chat server")
+    parser.add_argument("file", help="JSONL file of {topic, payload} records")
+    parser.add_argument("--url", default="http://localhost:8000", help="Server base URL (default: http://localhost:8000)")
+    parser.add_argument("--secret", default=WEBHOOK_SECRET, help="Signing secret (default: SHOPIFY_WEBHOOK_SECRET)")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait between deliveries")
+    args = parser.parse_args()
+
+    if not args.secret:
+        parser.error("No signing secret: set SHOPIFY_WEBHOOK_SECRET or pass --secret.")
+    replay(args.file, args.url, args.secret, args.delay)
@@ -0,0 +1,164 @@
+"""
+retry.py — Retry policy for transient Shopify GraphQL failures.
+
+gql/agql raise RetryableError for failures worth another attempt (HTTP 429/5xx,
+dropped connections, GraphQL THROTTLED) and plain RuntimeError for everything
+else. RetryPolicy re-runs the attempt with exponential backoff and full jitter,
+never sooner than the server's Retry-After header or the time Shopify's restore
+rate needs to refill the query's cost.
+
+Only idempotent operations (queries) are retried after a failure that may have
+reached Shopify; mutations are retried only when Shopify provably did not
+execute them (throttled, or the connection was never established).
+
+Environment:
+    SHOPIFY_RETRY_MAX_ATTEMPTS — Total attempts including the first (default 4).
+    SHOPIFY_RETRY_DEADLINE     — Give up once this many seconds have elapsed (default 30).
+    SHOPIFY_RETRY_BASE_DELAY   — Backoff base in seconds (default 0.5).
+    SHOPIFY_RETRY_MAX_DELAY    — Backoff ceiling in seconds (default 8).
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+_MUTATION_RE = re.compile(r"^\s*(#[^\n]*\n\s*)*mutation\b")
+
+
+class RetryableError(RuntimeError):
+    """
+    A transient GraphQL failure.
+
+    Attributes:
+        reason:      Short label for metrics ("throttled", "http_502", "transport", ...).
+        retry_after: Minimum seconds to wait before retrying, if the server said so.
+        executed:    False when Shopify certainly did not run the operation.
+    """
+
+    def __init__(self, message: str, reason: str, retry_after: float | None = None, executed: bool = True):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+        self.executed = executed
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def throttle_wait(cost: dict | None) -> float | None:
+    """Seconds until Shopify's bucket can absorb the throttled query, from extensions.cost."""
+    status = (cost or {}).get("throttleStatus")
+    if not status or not status.get("restoreRate"):
+        return None
+    deficit = float(cost.get("requestedQueryCost", 0)) - float(status.get("currentlyAvailable", 0))
+    return max(deficit / float(status["restoreRate"]), 0.0)
+
+
+def is_idempotent(query: str) -> bool:
+    """GraphQL queries are safe to repeat; mutations are not."""
+    return not _MUTATION_RE.match(query)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by attempts and an overall deadline."""
+
+    def __init__(self, max_attempts: int, deadline: float, base_delay: float, max_delay: float):
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._stats = {"attempts_total": 0, "retries_total": 0, "give_ups_total": 0, "retries_by_reason": {}}
+
+    def backoff(self, attempt: int, error: RetryableError) -> float:
+        """Delay before retry number `attempt` (1-based), honoring the server's minimum wait."""
+        jittered = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return max(jittered, error.retry_after or 0.0)
+
+    def _next_delay(self, query: str, attempt: int, started: float, error: RetryableError) -> float | None:
+        """Seconds to sleep before the next attempt, or None to give up."""
+        if attempt >= self.max_attempts or (error.executed and not is_idempotent(query)):
+            return self._give_up()
+        delay = self.backoff(attempt, error)
+        if time.monotonic() - started + delay > self.deadline:
+            return self._give_up()
+        with self._lock:
+            self._stats["retries_total"] += 1
+            by_reason = self._stats["retries_by_reason"]
+            by_reason[error.reason] = by_reason.get(error.reason, 0) + 1
+        return delay
+
+    def _give_up(self) -> None:
+        with self._lock:
+            self._stats["give_ups_total"] += 1
+        return None
+
+    def _count_attempt(self) -> None:
+        with self._lock:
+            self._stats["attempts_total"] += 1
+
+    def call(self, query: str, attempt_fn):
+        """Run attempt_fn() until it succeeds, fails permanently, or the policy gives up."""
+        started, attempt = time.monotonic(), 0
+        while True:
+            attempt += 1
+            self._count_attempt()
+            try:
+                return attempt_fn()
+            except RetryableError as e:
+                delay = self._next_delay(query, attempt, started, e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def acall(self, query: str, attempt_fn):
+        """Async counterpart of call(); attempt_fn returns an awaitable."""
+        started, attempt = time.monotonic(), 0
+        while True:
+            attempt += 1
+            self._count_attempt()
+            try:
+                return await attempt_fn()
+            except RetryableError as e:
+                delay = self._next_delay(query, attempt, started, e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self._stats, "retries_by_reason": dict(self._stats["retries_by_reason"])}
+
+
+# ─────────────────────────────────────────────
+# Process-wide policy
+# ─────────────────────────────────────────────
+
+policy = RetryPolicy(
+    max_attempts=int(os.getenv("SHOPIFY_RETRY_MAX_ATTEMPTS", "4")),
+    deadline=float(os.getenv("SHOPIFY_RETRY_DEADLINE", "30")),
+    base_delay=float(os.getenv("SHOPIFY_RETRY_BASE_DELAY", "0.5")),
+    max_delay=float(os.getenv("SHOPIFY_RETRY_MAX_DELAY", "8")),
+)
+
+
+def retry_metrics() -> dict:
+    """Attempt, retry, and give-up counters for the shared policy."""
+    return policy.snapshot()
@@ -0,0 +1,125 @@
+"""
+shopify_client.py — Pooled HTTP transport for the Shopify Admin GraphQL API.
+
+A single keep-alive client is shared by every tool call (and every page of a
+paginated query), so requests reuse open TCP+TLS connections instead of paying
+a fresh handshake each time. gzip/deflate response bodies are decoded
+transparently, and HTTP/2 is negotiated when the `h2` package is installed.
+
+The sync client is thread-safe and created lazily on first use. Async code
+gets its own pooled AsyncClient per running event loop (httpx async pools are
+bound to the loop that opened them).
+
+Environment:
+    SHOPIFY_HTTP2            — "1" to enable HTTP/2, "0" to force HTTP/1.1 (default "1").
+    SHOPIFY_POOL_SIZE        — Max open connections in the pool (default 10).
+    SHOPIFY_POOL_KEEPALIVE   — Max idle keep-alive connections (default 10).
+    SHOPIFY_KEEPALIVE_EXPIRY — Seconds an idle connection is kept open (default 60).
+    SHOPIFY_CONNECT_TIMEOUT  — Connect timeout in seconds (default 5).
+    SHOPIFY_READ_TIMEOUT     — Read/write/pool timeout in seconds (default 20).
+"""
+
+import os
+import atexit
+import asyncio
+import threading
+import weakref
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ─────────────────────────────────────────────
+# Transport Config
+# ─────────────────────────────────────────────
+
+HTTP2_ENABLED = os.getenv("SHOPIFY_HTTP2", "1") == "1"
+POOL_SIZE = int(os.getenv("SHOPIFY_POOL_SIZE", "10"))
+POOL_KEEPALIVE = int(os.getenv("SHOPIFY_POOL_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("SHOPIFY_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.getenv("SHOPIFY_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("SHOPIFY_READ_TIMEOUT", "20"))
+
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+
+def _http2_supported() -> bool:
+    """HTTP/2 needs the optional `h2` package (installed via httpx[http2])."""
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def client_options() -> dict:
+    """Keyword arguments shared by the sync and async httpx clients."""
+    return {
+        "http2": _http2_supported(),
+        "headers": DEFAULT_HEADERS,
+        "timeout": httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=POOL_SIZE,
+            max_keepalive_connections=POOL_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+# ─────────────────────────────────────────────
+# Shared Client
+# ─────────────────────────────────────────────
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    """Return the process-wide pooled client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(**client_options())
+    return _client
+
+
+def close_client() -> None:
+    """Close the pooled client and drop its idle connections."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+atexit.register(close_client)
+
+
+# ─────────────────────────────────────────────
+# Shared Async Clients (one per event loop)
+# ─────────────────────────────────────────────
+
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the pooled async client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**client_options())
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client() -> None:
+    """Close the running loop's async client (call from the app's shutdown hook)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
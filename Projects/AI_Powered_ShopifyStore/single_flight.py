@@ -0,0 +1,101 @@
+"""
+single_flight.py — Share one in-flight computation between identical concurrent calls.
+
+SingleFlight.do(key, fn) runs fn() unless a call with the same key is
+already running, in which case it waits for that call and returns its
+result (or raises its exception). ado() is the async counterpart. Results
+are shared objects; callers treat them as read-only.
+
+Flights are plain concurrent Futures, so async callers can join a flight led
+from a worker thread or another event loop. A sync caller never joins a
+flight led by a coroutine: blocking on it could block the very event loop
+that has to finish it, so it runs its own call instead.
+
+If the caller running a flight is cancelled (asyncio cancellation, or
+OperationCancelled from cancellation.py), waiters don't inherit the
+cancellation — one of them runs the call instead.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from cancellation import OperationCancelled
+
+
+class _LeaderGone(Exception):
+    """The flight's leader was cancelled before finishing."""
+
+
+class SingleFlight:
+    """Per-key de-duplication of concurrent calls, for threads and coroutines alike."""
+
+    def __init__(self):
+        self._flights: dict = {}   # key → (future, led by a coroutine)
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "coalesced": 0, "bypassed": 0}
+
+    def _join(self, key, is_async: bool) -> tuple[bool, Future | None]:
+        """(True, future) to lead a new flight, (False, future) to wait on one, (False, None) to run alone."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                future = Future()
+                self._flights[key] = (future, is_async)
+                self._stats["leaders"] += 1
+                return True, future
+            future, led_async = flight
+            if led_async and not is_async:
+                self._stats["bypassed"] += 1
+                return False, None
+            self._stats["coalesced"] += 1
+            return False, future
+
+    def _land(self, key, future: Future, result=None, error: BaseException | None = None) -> None:
+        with self._lock:
+            self._flights.pop(key, None)
+        if error is None:
+            future.set_result(result)
+        else:
+            gone = not isinstance(error, Exception) or isinstance(error, OperationCancelled)
+            future.set_exception(_LeaderGone() if gone else error)
+
+    def do(self, key, fn):
+        """fn(), or the result of an identical call already in flight."""
+        while True:
+            leader, future = self._join(key, is_async=False)
+            if future is None:
+                return fn()
+            if not leader:
+                try:
+                    return future.result()
+                except _LeaderGone:
+                    continue
+            try:
+                result = fn()
+            except BaseException as e:
+                self._land(key, future, error=e)
+                raise
+            self._land(key, future, result)
+            return result
+
+    async def ado(self, key, afn):
+        """Async counterpart of do(); afn() returns an awaitable."""
+        while True:
+            leader, future = self._join(key, is_async=True)
+            if not leader:
+                try:
+                    # Shielded: a cancelled waiter must not cancel the shared future.
+                    return await asyncio.shield(asyncio.wrap_future(future))
+                except _LeaderGone:
+                    continue
+            try:
+                result = await afn()
+            except BaseException as e:
+                self._land(key, future, error=e)
+                raise
+            self._land(key, future, result)
+            return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._flights)}
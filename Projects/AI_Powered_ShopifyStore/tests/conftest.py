@@ -0,0 +1,42 @@
+"""
+Shared test setup. The app's modules sit flat in the project directory, so it
+goes on sys.path; Shopify is never contacted — tests stub the GraphQL
+endpoint with httpx.MockTransport (shopify_graphql) or bulk_standin.py.
+"""
+
+import os
+import sys
+import json
+import httpx
+import pytest
+
+os.environ.setdefault("SHOPIFY_STORE_URL", "test-store.myshopify.com")
+os.environ.setdefault("X_SHOPIFY_ACCESS_TOKEN", "test-token")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shopify_client  # noqa: E402
+
+
+@pytest.fixture
+def shopify_graphql(monkeypatch):
+    """
+    Route GraphQL calls to a stub: assign `.respond = fn(query, variables) -> data`.
+    Every request is recorded in `.requests` as (query, variables).
+    """
+
+    class Stub:
+        def __init__(self):
+            self.requests = []
+
+        def respond(self, query, variables):
+            raise AssertionError(f"Unexpected Shopify request: {query[:80]}")
+
+    stub = Stub()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        stub.requests.append((body["query"], body.get("variables") or {}))
+        return httpx.Response(200, json={"data": stub.respond(body["query"], body.get("variables") or {})})
+
+    monkeypatch.setattr(shopify_client, "_client", httpx.Client(transport=httpx.MockTransport(handler)))
+    return stub
@@ -0,0 +1,133 @@
+"""bulk.py: re-nesting flattened bulk results, and a full run against bulk_standin.py."""
+
+import os
+import json
+import pytest
+import bulk
+import utils
+import bulk_standin
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bulk_orders_sample.jsonl")
+
+ORDER_1 = "gid://shopify/Order/1"
+ORDER_2 = "gid://shopify/Order/2"
+REFUND = "gid://shopify/Refund/9"
+
+
+def _nest(lines):
+    return list(bulk.nest_children(lines, bulk.ORDER_CONNECTIONS))
+
+
+# ─────────────────────────────────────────────
+# nest_children
+# ─────────────────────────────────────────────
+
+def test_children_nest_under_their_parents():
+    orders = _nest([
+        {"id": ORDER_1},
+        {"__typename": "LineItem", "title": "Wallet", "__parentId": ORDER_1},
+        {"__typename": "LineItem", "title": "Tote", "__parentId": ORDER_1},
+        {"id": ORDER_2, "refunds": [{"id": REFUND}]},
+        {"__typename": "OrderTransaction", "status": "SUCCESS", "__parentId": REFUND},
+    ])
+    assert orders == [
+        {"id": ORDER_1, "lineItems": {"edges": [{"node": {"title": "Wallet"}}, {"node": {"title": "Tote"}}]}},
+        {"id": ORDER_2, "refunds": [{"id": REFUND, "transactions": {"edges": [{"node": {"status": "SUCCESS"}}]}}]},
+    ]
+
+
+def test_parent_without_children_is_yielded_as_is():
+    assert _nest([{"id": ORDER_1}, {"id": ORDER_2}]) == [{"id": ORDER_1}, {"id": ORDER_2}]
+    assert _nest([]) == []
+
+
+def test_child_before_its_parent_raises():
+    with pytest.raises(ValueError, match="not inside its parent's block"):
+        _nest([
+            {"__typename": "LineItem", "title": "Wallet", "__parentId": ORDER_1},
+            {"id": ORDER_1},
+        ])
+
+
+def test_child_after_the_next_parent_raises():
+    with pytest.raises(ValueError, match="not inside its parent's block"):
+        _nest([
+            {"id": ORDER_1},
+            {"id": ORDER_2},
+            {"__typename": "LineItem", "title": "Wallet", "__parentId": ORDER_1},
+        ])
+
+
+@pytest.mark.parametrize("child", [
+    {"__typename": "Fulfillment", "status": "SUCCESS", "__parentId": ORDER_1},
+    {"title": "Wallet", "__parentId": ORDER_1},
+])
+def test_unmapped_child_type_raises(child):
+    with pytest.raises(ValueError, match="no connection to nest under"):
+        _nest([{"id": ORDER_1}, child])
+
+
+# ─────────────────────────────────────────────
+# Stand-in run
+# ─────────────────────────────────────────────
+
+@pytest.fixture
+def standin(monkeypatch):
+    server = bulk_standin.serve(SAMPLE, polls_until_done=2)
+    monkeypatch.setattr(utils, "GRAPHQL_URL", bulk_standin.graphql_url(server))
+    monkeypatch.setattr(bulk, "POLL_INTERVAL", 0.01)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_standin_bulk_orders_match_the_flat_file(standin):
+    assert bulk.should_bulk_orders("", page_cap=0)
+    assert not bulk.should_bulk_orders("", page_cap=1000)
+    assert bulk_standin.nested_counts(bulk.bulk_orders("created_at:>2026-01-01")) == bulk_standin.file_counts(SAMPLE)
+
+
+def test_standin_bulk_order_lines_pass_through_unchanged(standin):
+    with open(SAMPLE, encoding="utf-8") as f:
+        expected = [json.loads(line) for line in f if line.strip()]
+    assert list(bulk.bulk_order_lines("")) == expected
+
+
+def test_rejected_operation_raises_before_any_line(shopify_graphql):
+    shopify_graphql.respond = lambda query, variables: {"bulkOperationRunQuery": {
+        "bulkOperation": None,
+        "userErrors": [{"field": None, "message": "A bulk query operation for this app and shop is already in progress"}],
+    }}
+    with pytest.raises(bulk.BulkOperationRejected, match="already in progress"):
+        next(bulk.bulk_orders(""))
+    assert len(shopify_graphql.requests) == 1
+
+
+@pytest.mark.parametrize("cancel_errors", [[], [{"field": None, "message": "Bulk operation is already completed"}]])
+def test_cancelled_scan_cancels_the_operation(shopify_graphql, monkeypatch, cancel_errors):
+    import threading
+    from cancellation import OperationCancelled, _scope
+
+    monkeypatch.setattr(bulk, "POLL_INTERVAL", 0.01)
+    scope = threading.Event()
+
+    def respond(query, variables):
+        if "bulkOperationRunQuery" in query:
+            return {"bulkOperationRunQuery": {"bulkOperation": {"id": "gid://shopify/BulkOperation/1", "status": "CREATED"}, "userErrors": []}}
+        if "bulkOperationCancel" in query:
+            return {"bulkOperationCancel": {"bulkOperation": None, "userErrors": cancel_errors}}
+        scope.set()   # The caller goes away while the operation is running.
+        return {"node": {"id": variables["id"], "status": "RUNNING"}}
+
+    shopify_graphql.respond = respond
+    token = _scope.set(scope)
+    try:
+        with pytest.raises(OperationCancelled) as raised:
+            bulk.run_bulk_query("{ orders { edges { node { id } } } }")
+    finally:
+        _scope.reset(token)
+    assert "bulkOperationCancel" in shopify_graphql.requests[-1][0]
+    if cancel_errors:
+        assert "could not be cancelled" in str(raised.value.__cause__)
+    else:
+        assert raised.value.__cause__ is None
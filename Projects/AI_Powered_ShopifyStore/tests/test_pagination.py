@@ -0,0 +1,68 @@
+"""Sliced order scans: per-slice streams merge in id order without repeats."""
+
+from datetime import date
+import pytest
+import utils
+from queries import paginated_query, order_totals_fields, order_revenue_fields, order_titles_fields
+
+
+def _order(n: int) -> dict:
+    return {"id": f"gid://shopify/Order/{n}", "totalPriceSet": {"shopMoney": {"amount": "100.00"}}}
+
+
+@pytest.mark.parametrize("fields", [order_totals_fields, order_revenue_fields, order_titles_fields])
+def test_aggregate_projections_select_id(fields):
+    for bulk in (False, True):
+        assert fields(bulk=bulk).split()[0] == "id"
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_sliced_scan_merges_in_id_order_and_drops_repeats(shopify_graphql, streaming):
+    slices = utils.created_at_slices(date(2026, 1, 1), date(2026, 1, 3), n=2)
+    # Order 3 sits on the slice boundary and comes back from both slices.
+    by_slice = {slices[0]: [_order(1), _order(3), _order(5)], slices[1]: [_order(2), _order(3), _order(4)]}
+
+    def respond(query, variables):
+        [nodes] = [nodes for clause, nodes in by_slice.items() if variables["query"].endswith(clause)]
+        return {"orders": {"pageInfo": {"hasNextPage": False, "endCursor": None}, "edges": [{"node": n} for n in nodes]}}
+
+    shopify_graphql.respond = respond
+    scan = utils.iter_gql_paginated if streaming else utils.gql_paginated
+    orders = list(scan(
+        paginated_query("orders", order_totals_fields()),
+        variables={"query": "financial_status:PAID"},
+        data_path=["orders"],
+        slices=slices,
+    ))
+    assert [o["id"].rsplit("/", 1)[1] for o in orders] == ["1", "2", "3", "4", "5"]
+    assert len(shopify_graphql.requests) == 2
+
+
+@pytest.mark.parametrize("per_slice_count, bulk_used", [(400, False), (2000, True)])
+def test_order_stream_only_goes_bulk_when_a_slice_would_hit_its_cap(shopify_graphql, monkeypatch, per_slice_count, bulk_used):
+    import admin_tools
+
+    window = (date(2026, 1, 1), date(2026, 1, 5))
+    slices = utils.created_at_slices(*window)
+    bulk_calls = []
+    monkeypatch.setattr(admin_tools, "bulk_orders", lambda query_filter, fields: bulk_calls.append(query_filter) or iter([]))
+
+    def respond(query, variables):
+        if "ordersCount" in query:
+            return {"ordersCount": {"count": per_slice_count if variables["query"].endswith(slices[2]) else 300}}
+        # Two pages per slice: more than one page, far below the 5-page cap.
+        n = slices.index(next(c for c in slices if variables["query"].endswith(c)))
+        page = int(variables.get("cursor") or 0)
+        return {"orders": {
+            "pageInfo": {"hasNextPage": page == 0, "endCursor": "1" if page == 0 else None},
+            "edges": [{"node": _order(n * 10 + page * 5 + k)} for k in range(5)],
+        }}
+
+    shopify_graphql.respond = respond
+    orders = list(admin_tools._order_stream("financial_status:PAID", window, admin_tools._ORDER_TOTALS))
+    counts = [q for q, _ in shopify_graphql.requests if "ordersCount" in q]
+    if bulk_used:
+        assert bulk_calls == ["financial_status:PAID"] and orders == []
+    else:
+        assert bulk_calls == [] and len(orders) == 10 * len(slices)
+        assert len(counts) == len(slices)
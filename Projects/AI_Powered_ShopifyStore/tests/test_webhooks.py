@@ -0,0 +1,179 @@
+"""webhooks.py: the recorded samples replayed through dispatch() against fresh stores."""
+
+import os
+import json
+from datetime import date
+import pytest
+import webhooks
+from catalog import ProductCatalog
+from order_warehouse import OrderWarehouse
+from tool_cache import ToolCache
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "webhook_samples.jsonl")
+
+PRODUCT = "gid://shopify/Product/8123456789"
+ORDER = "gid://shopify/Order/5900000000001"
+JANUARY = (date(2026, 1, 1), date(2026, 2, 1))
+
+
+def _deliveries() -> list[dict]:
+    with open(SAMPLES, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _order_node(financial_status: str) -> dict:
+    return {
+        "id": ORDER,
+        "name": "#1042",
+        "email": "customer@example.com",
+        "createdAt": "2026-01-15T09:05:39Z",
+        "updatedAt": "2026-01-16T04:30:00Z",
+        "closed": False,
+        "cancelledAt": None,
+        "displayFinancialStatus": financial_status,
+        "displayFulfillmentStatus": "UNFULFILLED",
+        "totalPriceSet": {"shopMoney": {"amount": "2500.00"}},
+        "lineItems": {"edges": [{"node": {"title": "Classic Bifold Wallet", "quantity": 1, "originalUnitPrice": "2500.00"}}]},
+    }
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    catalog, warehouse, cache = ProductCatalog(), OrderWarehouse(), ToolCache(16)
+    monkeypatch.setattr(webhooks, "catalog", catalog)
+    monkeypatch.setattr(webhooks, "warehouse", warehouse)
+    monkeypatch.setattr(webhooks, "tool_cache", cache)
+    monkeypatch.setattr(webhooks, "CATALOG_ENABLED", True)
+    monkeypatch.setattr(webhooks, "WAREHOUSE_ENABLED", True)
+    return catalog, warehouse, cache
+
+
+def _mirrored(catalog: ProductCatalog) -> list[dict]:
+    # Never synced, so age() is inf and an inf bound never triggers a sync.
+    return catalog.products(max_age=float("inf"))
+
+
+def _quantities(product: dict) -> list[int]:
+    return [edge["node"]["inventoryQuantity"] for edge in product["variants"]["edges"]]
+
+
+def test_replay_patches_catalog_and_warehouse(stores, shopify_graphql):
+    catalog, warehouse, _ = stores
+    state = {"order": "PAID"}
+
+    def respond(query, variables):
+        [gid] = variables["ids"]
+        if gid == PRODUCT:
+            product = webhooks.product_node_from_rest(_deliveries()[0]["payload"])
+            product["variants"]["edges"][1]["node"]["inventoryQuantity"] = 4
+            return {"nodes": [product]}
+        assert gid == ORDER
+        return {"nodes": [_order_node(state["order"])]}
+
+    shopify_graphql.respond = respond
+    products_update, inventory_update, orders_create, refunds_create, products_delete = _deliveries()
+
+    assert webhooks.dispatch(products_update["topic"], products_update["payload"]) == 1
+    [product] = _mirrored(catalog)
+    assert product["id"] == PRODUCT
+    assert product["tags"] == ["Wallet", "featured collection"]
+    assert product["description"].startswith("Full-grain leather bifold with 6 card slots")
+    assert "<" not in product["description"]
+    assert _quantities(product) == [7, 0]
+    assert shopify_graphql.requests == []
+
+    webhooks.dispatch(inventory_update["topic"], inventory_update["payload"])
+    [product] = _mirrored(catalog)
+    assert _quantities(product) == [7, 4]
+    assert catalog.stock_age() == float("inf")   # Only a full stock refresh resets the stock clock.
+
+    webhooks.dispatch(orders_create["topic"], orders_create["payload"])
+    assert warehouse.period_stats(*JANUARY) == {"order_count": 1, "revenue": 2500.0}
+
+    state["order"] = "REFUNDED"
+    webhooks.dispatch(refunds_create["topic"], refunds_create["payload"])
+    assert warehouse.period_stats(*JANUARY) == {"order_count": 0, "revenue": 0}
+    assert [o["id"] for o in warehouse.refunded_between(*JANUARY)] == [ORDER]
+
+    webhooks.dispatch(products_delete["topic"], products_delete["payload"])
+    assert _mirrored(catalog) == []
+    assert len(shopify_graphql.requests) == 3
+
+
+def test_disabled_stores_are_left_alone(stores, shopify_graphql, monkeypatch):
+    catalog, warehouse, _ = stores
+    monkeypatch.setattr(webhooks, "CATALOG_ENABLED", False)
+    monkeypatch.setattr(webhooks, "WAREHOUSE_ENABLED", False)
+    for delivery in _deliveries():
+        webhooks.dispatch(delivery["topic"], delivery["payload"])
+    assert shopify_graphql.requests == []
+    assert _mirrored(catalog) == []
+    assert warehouse.stats()["orders"] == 0
+
+
+def test_product_webhooks_drop_product_reports(stores, shopify_graphql, monkeypatch):
+    _, _, cache = stores
+    monkeypatch.setattr(webhooks, "CATALOG_ENABLED", False)
+
+    def fill():
+        for name in ("get_low_inventory_products", "get_zero_sales_products", "get_recent_orders"):
+            cache.get_or_compute((name, ()), 60, lambda: name)
+
+    products_update, inventory_update = _deliveries()[:2]
+    fill()
+    webhooks.dispatch(inventory_update["topic"], inventory_update["payload"])
+    assert cache.stats()["size"] == 2
+    fill()
+    webhooks.dispatch(products_update["topic"], products_update["payload"])
+    assert cache.stats()["size"] == 1
+    assert cache.stats()["invalidated"] == 3
+
+
+def test_order_webhooks_drop_order_reports(stores, monkeypatch):
+    _, _, cache = stores
+    monkeypatch.setattr(webhooks, "WAREHOUSE_ENABLED", False)
+
+    def fill():
+        for name in ("get_low_inventory_products", "get_revenue_summary", "get_unfulfilled_orders"):
+            cache.get_or_compute((name, ()), 60, lambda: name)
+
+    for delivery in _deliveries()[2:4]:
+        fill()
+        webhooks.dispatch(delivery["topic"], delivery["payload"])
+        assert cache.stats()["size"] == 1
+    assert cache.stats()["invalidated"] == 4
+
+
+def test_signatures_and_duplicates():
+    body = json.dumps(_deliveries()[0]["payload"]).encode()
+    signature = webhooks.sign(body, "secret")
+    assert webhooks.verify_hmac(body, signature, "secret")
+    assert not webhooks.verify_hmac(body + b" ", signature, "secret")
+    assert not webhooks.verify_hmac(body, signature, "")
+    assert not webhooks.is_duplicate("delivery-1")
+    assert webhooks.is_duplicate("delivery-1")
+
+
+def test_inventory_webhooks_do_not_postpone_the_stock_refresh(stores, shopify_graphql):
+    catalog, _, _ = stores
+    products_update, inventory_update = _deliveries()[:2]
+    webhooks.dispatch(products_update["topic"], products_update["payload"])
+    product = _mirrored(catalog)[0]
+
+    def respond(query, variables):
+        if "ids" in variables:
+            return {"nodes": [product]}
+        # Stock-only refresh: a level whose webhook never arrived has changed.
+        edges = [
+            {"node": {"inventoryQuantity": 2, "inventoryItem": edge["node"]["inventoryItem"]}}
+            for edge in product["variants"]["edges"]
+        ]
+        return {"products": {"pageInfo": {"hasNextPage": False, "endCursor": None},
+                             "edges": [{"node": {"id": PRODUCT, "variants": {"edges": edges}}}]}}
+
+    shopify_graphql.respond = respond
+    webhooks.dispatch(inventory_update["topic"], inventory_update["payload"])
+    [product] = catalog.products(max_age=float("inf"), stock_max_age=30)
+    assert _quantities(product) == [2, 2]
+    assert catalog.stock_age() < 30
+    assert len(shopify_graphql.requests) == 2
@@ -0,0 +1,212 @@
+"""
+throttle.py — Process-wide Shopify query-cost scheduler.
+
+Shopify's GraphQL Admin API rate-limits by *query cost* using a leaky bucket:
+each response carries `extensions.cost` with the requested/actual cost and a
+`throttleStatus` (maximumAvailable, currentlyAvailable, restoreRate). Once the
+bucket runs dry, requests fail with THROTTLED.
+
+CostBucket mirrors that bucket locally. Every gql/agql call reserves its
+estimated cost before it is sent and waits (without hitting Shopify) while the
+budget is short, then re-syncs with the authoritative throttleStatus from the
+response. Waiters are served by priority, and analytics traffic must leave a
+reserve untouched so interactive customer queries are never starved by an
+admin report.
+
+Environment:
+    SHOPIFY_BUCKET_SIZE         — Initial bucket size until Shopify reports it (default 1000).
+    SHOPIFY_RESTORE_RATE        — Initial restore rate, points/second (default 50).
+    SHOPIFY_DEFAULT_QUERY_COST  — Estimate for a query never seen before (default 100).
+    SHOPIFY_ANALYTICS_RESERVE   — Fraction of the bucket analytics may not consume (default 0.2).
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+
+# ─────────────────────────────────────────────
+# Priorities (lower value is served first)
+# ─────────────────────────────────────────────
+
+PRIORITY_INTERACTIVE = 0   # Customer-facing tool calls
+PRIORITY_ANALYTICS = 1     # Admin reports and background scans
+
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_ANALYTICS: "analytics"}
+
+# Shortest / longest single sleep while waiting for budget (seconds).
+_MIN_WAIT = 0.02
+_MAX_WAIT = 1.0
+
+
+class CostBucket:
+    """
+    Local model of Shopify's query-cost leaky bucket.
+
+    Thread-safe; sync callers use acquire(), async callers use aacquire().
+    Both must hand the returned reservation back to settle() once the
+    response (or failure) is known.
+    """
+
+    def __init__(
+        self,
+        maximum_available: float,
+        restore_rate: float,
+        default_query_cost: float,
+        analytics_reserve: float,
+    ):
+        self._lock = threading.Lock()
+        self._maximum = maximum_available
+        self._available = maximum_available
+        self._restore_rate = restore_rate
+        self._updated_at = time.monotonic()
+        self._default_cost = default_query_cost
+        self._analytics_reserve = analytics_reserve
+        self._estimates: dict[str, float] = {}
+        self._in_flight = 0.0
+        self._waiters: list[tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._stats = {
+            "requests_total": 0,
+            "throttled_total": 0,
+            "waited_total": 0,
+            "wait_seconds_total": 0.0,
+        }
+
+    # ── Budget accounting ─────────────────────
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._available = min(
+            self._maximum,
+            self._available + (now - self._updated_at) * self._restore_rate,
+        )
+        self._updated_at = now
+
+    def _estimate(self, query: str) -> float:
+        return self._estimates.get(query, self._default_cost)
+
+    def _try_reserve(self, ticket: tuple[int, int], cost: float) -> float:
+        """Reserve `cost` if this ticket is next in line and the budget allows; else return seconds to wait."""
+        with self._lock:
+            self._refill()
+            floor = self._maximum * self._analytics_reserve if ticket[0] == PRIORITY_ANALYTICS else 0.0
+            # A query larger than the bucket can only ever run from a full bucket.
+            needed = min(cost + floor, self._maximum)
+            if self._waiters and self._waiters[0] == ticket and self._available >= needed:
+                heapq.heappop(self._waiters)
+                self._available -= cost
+                self._in_flight += cost
+                self._stats["requests_total"] += 1
+                return 0.0
+            deficit = max(needed - self._available, 0.0)
+            return min(max(deficit / self._restore_rate, _MIN_WAIT), _MAX_WAIT)
+
+    def _enqueue(self, priority: int) -> tuple[int, int]:
+        ticket = (priority, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _abandon(self, ticket: tuple[int, int]) -> None:
+        with self._lock:
+            if ticket in self._waiters:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+
+    def _record_wait(self, started: float) -> None:
+        waited = time.monotonic() - started
+        if waited >= _MIN_WAIT:
+            with self._lock:
+                self._stats["waited_total"] += 1
+                self._stats["wait_seconds_total"] += waited
+
+    # ── Public API ────────────────────────────
+
+    def acquire(self, query: str, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """Block until `query`'s estimated cost fits the budget; returns the reserved cost."""
+        cost = self._estimate(query)
+        ticket = self._enqueue(priority)
+        started = time.monotonic()
+        try:
+            while (wait := self._try_reserve(ticket, cost)) > 0:
+                time.sleep(wait)
+        finally:
+            self._abandon(ticket)
+        self._record_wait(started)
+        return cost
+
+    async def aacquire(self, query: str, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """Async counterpart of acquire() — waits with asyncio.sleep instead of blocking."""
+        cost = self._estimate(query)
+        ticket = self._enqueue(priority)
+        started = time.monotonic()
+        try:
+            while (wait := self._try_reserve(ticket, cost)) > 0:
+                await asyncio.sleep(wait)
+        finally:
+            self._abandon(ticket)
+        self._record_wait(started)
+        return cost
+
+    def settle(self, query: str, reserved: float, cost: dict | None, throttled: bool = False) -> None:
+        """
+        Release a reservation and re-sync with Shopify's `extensions.cost` block.
+
+        With a throttleStatus the server's view is authoritative (less whatever
+        other in-flight requests have reserved). Without one — e.g. the request
+        never reached Shopify — the reservation is simply refunded.
+        """
+        with self._lock:
+            self._in_flight = max(self._in_flight - reserved, 0.0)
+            if throttled:
+                self._stats["throttled_total"] += 1
+
+            status = (cost or {}).get("throttleStatus")
+            if status:
+                self._maximum = float(status.get("maximumAvailable", self._maximum))
+                self._restore_rate = float(status.get("restoreRate", self._restore_rate)) or self._restore_rate
+                self._available = max(float(status.get("currentlyAvailable", 0.0)) - self._in_flight, 0.0)
+                self._updated_at = time.monotonic()
+            else:
+                self._refill()
+                self._available = min(self._available + reserved, self._maximum)
+
+            if cost and cost.get("requestedQueryCost") is not None:
+                self._estimates[query] = float(cost["requestedQueryCost"])
+
+    def snapshot(self) -> dict:
+        """Current bucket state and counters, suitable for a metrics endpoint."""
+        with self._lock:
+            self._refill()
+            waiting = {name: 0 for name in _PRIORITY_NAMES.values()}
+            for priority, _ in self._waiters:
+                waiting[_PRIORITY_NAMES.get(priority, str(priority))] += 1
+            return {
+                "maximum_available": self._maximum,
+                "currently_available": round(self._available, 2),
+                "restore_rate": self._restore_rate,
+                "in_flight_cost": self._in_flight,
+                "waiting": waiting,
+                **self._stats,
+                "wait_seconds_total": round(self._stats["wait_seconds_total"], 3),
+            }
+
+
+# ─────────────────────────────────────────────
+# Process-wide bucket
+# ─────────────────────────────────────────────
+
+bucket = CostBucket(
+    maximum_available=float(os.getenv("SHOPIFY_BUCKET_SIZE", "1000")),
+    restore_rate=float(os.getenv("SHOPIFY_RESTORE_RATE", "50")),
+    default_query_cost=float(os.getenv("SHOPIFY_DEFAULT_QUERY_COST", "100")),
+    analytics_reserve=float(os.getenv("SHOPIFY_ANALYTICS_RESERVE", "0.2")),
+)
+
+
+def throttle_metrics() -> dict:
+    """Snapshot of the shared cost bucket."""
+    return bucket.snapshot()
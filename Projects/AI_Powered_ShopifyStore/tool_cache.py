@@ -0,0 +1,230 @@
+"""
+tool_cache.py — Shared LRU + TTL result cache for agent tools.
+
+Admins ask near-identical questions repeatedly, and the LLM often calls the
+same report tool several times in one conversation. cache_tool() puts a
+@tool's sync function and its attached coroutine behind one shared cache:
+
+    - Keys are the tool name plus its canonicalised arguments: defaults filled
+      in, dates as YYYY-MM-DD, and chosen string arguments stripped and
+      case-folded, so equivalent calls share an entry.
+    - Each tool has its own TTL; the cache as a whole keeps at most
+      TOOL_CACHE_SIZE entries, evicting the least recently used.
+    - Concurrent identical misses are single-flight (single_flight.py): one
+      caller computes and the others wait for its result.
+    - Results a tool reports as failures are returned but not stored.
+    - invalidate(names) drops a tool's entries when its data changes (e.g. a
+      product webhook); results still being computed then are not stored.
+
+Cached results are shared between callers, so each caller gets its own copy.
+
+Environment:
+    TOOL_CACHE_ENABLED — "0" leaves tools uncached (default "1").
+    TOOL_CACHE_SIZE    — Maximum cached results across all tools (default 256).
+"""
+
+import os
+import copy
+import time
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from single_flight import SingleFlight
+
+TOOL_CACHE_ENABLED = os.getenv("TOOL_CACHE_ENABLED", "1") == "1"
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "256"))
+
+
+def _always(result) -> bool:
+    return True
+
+
+class ToolCache:
+    """Thread-safe LRU of (expires_at, result); misses are single-flight per key."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "expired": 0, "evictions": 0, "invalidated": 0}
+        self._per_tool: dict[str, dict[str, int]] = {}
+        self._generations: dict[str, int] = {}   # tool name → invalidations so far
+
+    # ── Bookkeeping ───────────────────────────
+
+    def _count(self, key: tuple, event: str) -> None:
+        with self._lock:
+            self._stats[event] += 1
+            tool_stats = self._per_tool.setdefault(key[0], {"hits": 0, "misses": 0, "coalesced": 0})
+            if event in tool_stats:
+                tool_stats[event] += 1
+
+    def _fresh(self, key: tuple) -> tuple[bool, object]:
+        """(True, result) for an unexpired entry, else (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return True, entry[1]
+            del self._entries[key]
+            self._stats["expired"] += 1
+            return False, None
+
+    def _generation(self, key: tuple) -> int:
+        with self._lock:
+            return self._generations.get(key[0], 0)
+
+    def _store(self, key: tuple, ttl: float, result, generation: int) -> None:
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                return   # Invalidated while computing; the result may predate the change.
+            self._entries[key] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    # ── Lookup ────────────────────────────────
+
+    def get_or_compute(self, key: tuple, ttl: float, compute, cacheable=_always):
+        """Cached result for `key`, or compute() it (once across concurrent callers) and cache it for `ttl` seconds."""
+        found, result = self._fresh(key)
+        if found:
+            self._count(key, "hits")
+            return copy.deepcopy(result)
+        led = []
+
+        def lead():
+            # A flight may have landed between the lookup above and this one.
+            found, result = self._fresh(key)
+            if found:
+                return result
+            led.append(True)
+            generation = self._generation(key)
+            result = compute()
+            if cacheable(result):
+                self._store(key, ttl, result, generation)
+            return result
+
+        try:
+            result = self._flights.do(key, lead)
+        finally:
+            self._count(key, "misses" if led else "coalesced")
+        return copy.deepcopy(result)
+
+    async def aget_or_compute(self, key: tuple, ttl: float, compute, cacheable=_always):
+        """Async counterpart of get_or_compute(); `compute` returns an awaitable."""
+        found, result = self._fresh(key)
+        if found:
+            self._count(key, "hits")
+            return copy.deepcopy(result)
+        led = []
+
+        async def lead():
+            found, result = self._fresh(key)
+            if found:
+                return result
+            led.append(True)
+            generation = self._generation(key)
+            result = await compute()
+            if cacheable(result):
+                self._store(key, ttl, result, generation)
+            return result
+
+        try:
+            result = await self._flights.ado(key, lead)
+        finally:
+            self._count(key, "misses" if led else "coalesced")
+        return copy.deepcopy(result)
+
+    def invalidate(self, tool_names) -> int:
+        """Drop every cached result of the named tools; returns how many were dropped."""
+        tool_names = set(tool_names)
+        with self._lock:
+            stale = [key for key in self._entries if key[0] in tool_names]
+            for key in stale:
+                del self._entries[key]
+            for name in tool_names:
+                self._generations[name] = self._generations.get(name, 0) + 1
+            self._stats["invalidated"] += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "in_flight": self._flights.snapshot()["in_flight"],
+                "tools": {name: dict(counts) for name, counts in self._per_tool.items()},
+            }
+
+
+cache = ToolCache(TOOL_CACHE_SIZE)
+
+
+# ─────────────────────────────────────────────
+# Tool wrapping
+# ─────────────────────────────────────────────
+
+def _canonical(value, fold: bool):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()[:10]
+    if isinstance(value, str):
+        value = value.strip()
+        return value.casefold() if fold else value
+    if isinstance(value, (list, tuple, set)):
+        items = [_canonical(v, fold) for v in value]
+        return tuple(sorted(items, key=repr) if isinstance(value, set) else items)
+    return value
+
+
+def canonical_args(func, args: tuple, kwargs: dict, fold: tuple[str, ...] = ()) -> tuple:
+    """Arguments bound to func's signature with defaults applied, as a hashable canonical tuple."""
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    return tuple((name, _canonical(value, name in fold)) for name, value in bound.arguments.items())
+
+
+def cache_tool(tool, ttl: float, fold: tuple[str, ...] = (), cacheable=_always, tool_cache: ToolCache = cache):
+    """
+    Route a @tool's func (and coroutine, if attached) through `tool_cache`.
+
+    Args:
+        ttl:       Seconds a result stays fresh.
+        fold:      Names of string arguments compared case-insensitively.
+        cacheable: Predicate on a result; False (e.g. an error dict) skips storing it.
+    """
+    if not TOOL_CACHE_ENABLED:
+        return tool
+    func, coroutine = tool.func, tool.coroutine
+
+    def key(args, kwargs) -> tuple:
+        return (tool.name, canonical_args(func, args, kwargs, fold))
+
+    @functools.wraps(func)
+    def cached(*args, **kwargs):
+        return tool_cache.get_or_compute(key(args, kwargs), ttl, lambda: func(*args, **kwargs), cacheable)
+
+    tool.func = cached
+    if coroutine is not None:
+        @functools.wraps(coroutine)
+        async def acached(*args, **kwargs):
+            return await tool_cache.aget_or_compute(key(args, kwargs), ttl, lambda: coroutine(*args, **kwargs), cacheable)
+
+        tool.coroutine = acached
+    return tool
+
+
+def tool_cache_metrics() -> dict:
+    """Snapshot of the shared tool result cache."""
+    return cache.stats()
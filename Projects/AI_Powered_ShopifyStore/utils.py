@@ -3,14 +3,28 @@ utils.py — Shared utilities for the Silk Skin AI Agent system.
 
 All Shopify communication uses the Admin GraphQL API (2026-01).
 GraphQL endpoint: https://{store}/admin/api/2026-01/graphql.json
+
+Environment:
+    SHOPIFY_COALESCE_REQUESTS — "0" disables sharing of identical in-flight queries (default "1").
+    SHOPIFY_PAGINATION_SLICES — created_at slices per date-bounded scan (default 4).
+    SHOPIFY_FANOUT_WORKERS    — Concurrent scans per tool call (default 4).
 """
 
 import os
-import re
-import requests
+import json
+import heapq
+import asyncio
+import threading
+import httpx
+from datetime import date, datetime, time, timezone
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from typing import List
-from rapidfuzz import process, fuzz
+from typing import Iterator, AsyncIterator
+from shopify_client import get_client, get_async_client
+from throttle import bucket, PRIORITY_INTERACTIVE
+from retry import policy as retry_policy, RetryableError, parse_retry_after, throttle_wait, is_idempotent
+from single_flight import SingleFlight
+from cancellation import raise_if_cancelled, run_in_context
 
 load_dotenv()
 
@@ -36,28 +50,165 @@ VALID_TAGS = [
 # Core GraphQL Executor
 # ─────────────────────────────────────────────
 
-def gql(query: str, variables: dict = None) -> dict:
+def _graphql_result(response: httpx.Response) -> dict:
+    """Raise on HTTP failure and return the decoded JSON body."""
+    response.raise_for_status()
+    return response.json()
+
+
+def _graphql_data(result: dict) -> dict:
+    """Raise on GraphQL errors and return the 'data' portion of a response body."""
+    if "errors" in result:
+        message = f"GraphQL errors: {result['errors']}"
+        if _is_throttled(None, result):
+            # Throttled requests are rejected before execution, so any operation may retry.
+            cost = (result.get("extensions") or {}).get("cost")
+            raise RetryableError(message, "throttled", retry_after=throttle_wait(cost), executed=False)
+        raise RuntimeError(message)
+    return result.get("data", {})
+
+
+# HTTP statuses worth retrying. 429 is rejected before execution; 5xx may not be.
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _http_error(e: httpx.HTTPStatusError) -> RuntimeError:
+    status = e.response.status_code
+    message = f"Shopify GraphQL HTTP error: {status} - {e.response.text}"
+    if status in _RETRY_STATUSES:
+        retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+        return RetryableError(message, f"http_{status}", retry_after=retry_after, executed=status != 429)
+    return RuntimeError(message)
+
+
+def _request_error(e: httpx.HTTPError) -> RuntimeError:
+    message = f"Shopify GraphQL request failed: {e}"
+    if isinstance(e, httpx.TransportError):
+        never_sent = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+        return RetryableError(message, "transport", executed=not never_sent)
+    return RuntimeError(message)
+
+
+def _is_throttled(response: httpx.Response | None, result: dict) -> bool:
+    """True for HTTP 429 or a GraphQL error with extensions.code == THROTTLED."""
+    if response is not None and response.status_code == 429:
+        return True
+    errors = result.get("errors")
+    return isinstance(errors, list) and any(
+        isinstance(e, dict) and (e.get("extensions") or {}).get("code") == "THROTTLED"
+        for e in errors
+    )
+
+
+def _settle(query: str, reserved: float, response: httpx.Response | None, result: dict) -> None:
+    """Hand the reserved cost back to the throttle along with Shopify's extensions.cost."""
+    result = result if isinstance(result, dict) else {}
+    cost = (result.get("extensions") or {}).get("cost")
+    bucket.settle(query, reserved, cost, throttled=_is_throttled(response, result))
+
+
+def _graphql_payload(query: str, variables: dict = None) -> dict:
+    return {"query": query, **({"variables": variables} if variables else {})}
+
+
+def _connection_at(data: dict, data_path: list) -> dict:
+    """Walk data_path from the 'data' dict down to a paginated connection."""
+    connection = data
+    for key in data_path:
+        connection = connection.get(key, {})
+    return connection
+
+
+# ─────────────────────────────────────────────
+# Request Coalescing
+# ─────────────────────────────────────────────
+
+COALESCE_REQUESTS = os.getenv("SHOPIFY_COALESCE_REQUESTS", "1") == "1"
+
+# Identical concurrent queries (same text and variables) share one request;
+# callers treat the returned data as read-only. Mutations always run alone.
+_flights = SingleFlight()
+
+
+def _flight_key(query: str, variables: dict | None, *extra) -> tuple | None:
+    """Coalescing key for a read-only query, or None when it must run on its own."""
+    if not COALESCE_REQUESTS or not is_idempotent(query):
+        return None
+    return (query, json.dumps(variables or {}, sort_keys=True, default=str), *extra)
+
+
+def _scan_key(query: str, variables: dict, data_path: list, max_pages, slices) -> tuple | None:
+    # Fan-out workers don't wait on whole scans: the scan they'd wait on may
+    # itself be queued behind them on the pool. Their pages still coalesce.
+    if getattr(_fanout_local, "active", False):
+        return None
+    return _flight_key(query, variables, "paginated", tuple(data_path), max_pages, tuple(slices or ()))
+
+
+def coalesce_metrics() -> dict:
+    """Leaders, callers served by another's request, and requests in flight."""
+    return _flights.snapshot()
+
+
+def _gql_attempt(query: str, variables: dict, priority: int) -> dict:
+    """One throttled request/response round-trip; see gql()."""
+    raise_if_cancelled()
+    reserved = bucket.acquire(query, priority)
+    response, result = None, {}
+    try:
+        # The caller may have been cancelled while waiting for budget (see cancellation.py).
+        raise_if_cancelled()
+        response = get_client().post(
+            GRAPHQL_URL, json=_graphql_payload(query, variables), headers=SHOPIFY_HEADERS
+        )
+        result = _graphql_result(response)
+        return _graphql_data(result)
+    except httpx.HTTPStatusError as e:
+        raise _http_error(e) from e
+    except httpx.HTTPError as e:
+        raise _request_error(e) from e
+    finally:
+        _settle(query, reserved, response, result)
+
+
+def gql(query: str, variables: dict = None, priority: int = PRIORITY_INTERACTIVE) -> dict:
     """
     Execute a GraphQL query against the Shopify Admin API.
 
-    Returns the 'data' portion of the response.
+    Requests go through the shared pooled client (see shopify_client.py), so
+    consecutive calls reuse the same keep-alive connection, and through the
+    process-wide cost bucket (see throttle.py), which holds the request back
+    until Shopify's query-cost budget can absorb it. `priority` decides who
+    goes first when the budget is short.
+
+    Transient failures (HTTP 429/5xx, dropped connections, THROTTLED) are
+    retried with jittered backoff per the shared policy in retry.py.
+
+    A query identical to one already in flight (same text and variables)
+    waits for that request instead of sending its own; both callers get the
+    same result, or the same error. Mutations are never shared.
+
+    Work offloaded by cancellation.to_thread stops here, before the next
+    request, once its caller is cancelled (OperationCancelled).
+
+    Returns the 'data' portion of the response (shared — don't mutate it).
     Raises RuntimeError on HTTP failure or GraphQL errors.
     """
-    payload = {"query": query, **({"variables": variables} if variables else {})}
-    try:
-        response = requests.post(GRAPHQL_URL, json=payload, headers=SHOPIFY_HEADERS, timeout=20)
-        response.raise_for_status()
-        result = response.json()
-        if "errors" in result:
-            raise RuntimeError(f"GraphQL errors: {result['errors']}")
-        return result.get("data", {})
-    except requests.exceptions.HTTPError as e:
-        raise RuntimeError(f"Shopify GraphQL HTTP error: {e.response.status_code} - {e.response.text}")
-    except requests.exceptions.RequestException as e:
-        raise RuntimeError(f"Shopify GraphQL request failed: {e}")
-
-
-def gql_paginated(query: str, variables: dict, data_path: list, max_pages: int = 5) -> list:
+    def send():
+        return retry_policy.call(query, lambda: _gql_attempt(query, variables, priority))
+
+    key = _flight_key(query, variables)
+    return send() if key is None else _flights.do(key, send)
+
+
+def gql_paginated(
+    query: str,
+    variables: dict,
+    data_path: list,
+    max_pages: int | None = 5,
+    priority: int = PRIORITY_INTERACTIVE,
+    slices: list[str] | None = None,
+) -> list:
     """
     Execute a cursor-paginated GraphQL query.
 
@@ -69,17 +220,35 @@ def gql_paginated(query: str, variables: dict, data_path: list, max_pages: int =
         query:      GraphQL query string with $cursor variable.
         variables:  Initial variables (cursor managed automatically).
         data_path:  Keys to traverse from 'data' to the connection (e.g. ["orders"]).
-        max_pages:  Page cap — default 5 (up to 1,250 records at 250/page).
+        max_pages:  Page cap — default 5 (up to 1,250 records at 250/page); None = no cap.
+                    With slices, the cap applies to each slice.
+        priority:   Throttle priority for every page (see throttle.py).
+        slices:     Optional search clauses (see created_at_slices) ANDed onto
+                    variables["query"]. Each slice is paginated separately and
+                    concurrently on the fan-out pool, and the results are merged
+                    in id order with duplicates dropped.
+
+    Identical concurrent scans share one run (see gql()); each caller gets
+    its own list of the shared node dicts.
 
     Returns:
         Flat list of all node dicts across all pages.
     """
+    key = _scan_key(query, variables, data_path, max_pages, slices)
+    if key is None:
+        return _gql_paginated(query, variables, data_path, max_pages, priority, slices)
+    return list(_flights.do(key, lambda: _gql_paginated(query, variables, data_path, max_pages, priority, slices)))
+
+
+def _gql_paginated(query, variables, data_path, max_pages, priority, slices) -> list:
+    if slices and len(slices) > 1:
+        return _merge_slices(run_bounded(
+            lambda v: gql_paginated(query, v, data_path, max_pages, priority),
+            _slice_variables(variables, slices),
+        ))
     all_nodes, cursor, page = [], None, 0
-    while page < max_pages:
-        data = gql(query, {**variables, "cursor": cursor})
-        connection = data
-        for key in data_path:
-            connection = connection.get(key, {})
+    while max_pages is None or page < max_pages:
+        connection = _connection_at(gql(query, {**variables, "cursor": cursor}, priority), data_path)
         all_nodes.extend(edge["node"] for edge in connection.get("edges", []))
         page_info = connection.get("pageInfo", {})
         if not page_info.get("hasNextPage"):
@@ -89,88 +258,302 @@ def gql_paginated(query: str, variables: dict, data_path: list, max_pages: int =
     return all_nodes
 
 
+def iter_gql_paginated(
+    query: str,
+    variables: dict,
+    data_path: list,
+    max_pages: int | None = 5,
+    priority: int = PRIORITY_INTERACTIVE,
+    slices: list[str] | None = None,
+    more_pages: list | None = None,
+) -> Iterator[dict]:
+    """
+    Streaming form of gql_paginated(): same arguments and nodes, yielded page
+    by page so only the current and the next page are held in memory.
+
+    The first page is requested as soon as this is called, and each next
+    page is requested (on the prefetch pool) before the current page's nodes
+    are handed out, so the network round-trip overlaps the caller's work.
+    Sliced scans run one stream per slice and merge them lazily in id order.
+
+    When `more_pages` is a list, each stream (one per slice) whose first page
+    has a next page appends its search filter (variables["query"]) once that
+    page has been read — after the first node is taken, every entry is in.
+    """
+    if slices and len(slices) > 1:
+        streams = [
+            iter_gql_paginated(query, v, data_path, max_pages, priority, more_pages=more_pages)
+            for v in _slice_variables(variables, slices)
+        ]
+        return _dedupe(heapq.merge(*streams, key=_node_order))
+
+    def fetch(cursor):
+        return run_in_context(_prefetch_pool, gql, query, {**variables, "cursor": cursor}, priority)
+
+    def pages(pending):
+        page = 0
+        try:
+            while pending is not None:
+                connection = _connection_at(pending.result(), data_path)
+                pending, page = None, page + 1
+                page_info = connection.get("pageInfo", {})
+                if more_pages is not None and page == 1 and page_info.get("hasNextPage"):
+                    more_pages.append(variables.get("query"))
+                if page_info.get("hasNextPage") and (max_pages is None or page < max_pages):
+                    pending = fetch(page_info.get("endCursor"))
+                yield from (edge["node"] for edge in connection.get("edges", []))
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    return pages(fetch(None))
+
+
 # ─────────────────────────────────────────────
-# Formatting Helpers
+# Async GraphQL Executor
 # ─────────────────────────────────────────────
 
-def format_money(amount) -> str:
-    """Format a value as PKR. Handles None, empty string, float, and string inputs."""
+async def _agql_attempt(query: str, variables: dict, priority: int) -> dict:
+    """Async counterpart of _gql_attempt()."""
+    reserved = await bucket.aacquire(query, priority)
+    response, result = None, {}
     try:
-        if amount is None or amount == "":
-            return "Rs. 0.00"
-        return f"Rs. {float(amount):,.2f}"
-    except (ValueError, TypeError):
-        return str(amount)
+        response = await get_async_client().post(
+            GRAPHQL_URL, json=_graphql_payload(query, variables), headers=SHOPIFY_HEADERS
+        )
+        result = _graphql_result(response)
+        return _graphql_data(result)
+    except httpx.HTTPStatusError as e:
+        raise _http_error(e) from e
+    except httpx.HTTPError as e:
+        raise _request_error(e) from e
+    finally:
+        _settle(query, reserved, response, result)
+
+
+async def agql(query: str, variables: dict = None, priority: int = PRIORITY_INTERACTIVE) -> dict:
+    """
+    Async counterpart of gql() — awaits the response instead of blocking the thread.
+
+    Same return value, throttling, retry, coalescing and error semantics as gql().
+    """
+    def send():
+        return retry_policy.acall(query, lambda: _agql_attempt(query, variables, priority))
+
+    key = _flight_key(query, variables)
+    return await (send() if key is None else _flights.ado(key, send))
+
+
+async def agql_paginated(
+    query: str,
+    variables: dict,
+    data_path: list,
+    max_pages: int | None = 5,
+    priority: int = PRIORITY_INTERACTIVE,
+    slices: list[str] | None = None,
+) -> list:
+    """Async counterpart of gql_paginated() — same arguments, same flat node list."""
+    key = _flight_key(query, variables, "paginated", tuple(data_path), max_pages, tuple(slices or ()))
+    if key is None:
+        return await _agql_paginated(query, variables, data_path, max_pages, priority, slices)
+    return list(await _flights.ado(key, lambda: _agql_paginated(query, variables, data_path, max_pages, priority, slices)))
+
+
+async def _agql_paginated(query, variables, data_path, max_pages, priority, slices) -> list:
+    if slices and len(slices) > 1:
+        return _merge_slices(await arun_bounded(
+            lambda v: agql_paginated(query, v, data_path, max_pages, priority),
+            _slice_variables(variables, slices),
+        ))
+    all_nodes, cursor, page = [], None, 0
+    while max_pages is None or page < max_pages:
+        connection = _connection_at(await agql(query, {**variables, "cursor": cursor}, priority), data_path)
+        all_nodes.extend(edge["node"] for edge in connection.get("edges", []))
+        page_info = connection.get("pageInfo", {})
+        if not page_info.get("hasNextPage"):
+            break
+        cursor = page_info.get("endCursor")
+        page += 1
+    return all_nodes
+
+
+async def aiter_gql_paginated(
+    query: str,
+    variables: dict,
+    data_path: list,
+    max_pages: int | None = 5,
+    priority: int = PRIORITY_INTERACTIVE,
+    slices: list[str] | None = None,
+) -> AsyncIterator[dict]:
+    """Async counterpart of iter_gql_paginated(); the next page is a task awaited after the current one is consumed."""
+    if slices and len(slices) > 1:
+        streams = [
+            aiter_gql_paginated(query, v, data_path, max_pages, priority)
+            for v in _slice_variables(variables, slices)
+        ]
+        async for node in _amerge_streams(streams):
+            yield node
+        return
+
+    def fetch(cursor):
+        return asyncio.ensure_future(agql(query, {**variables, "cursor": cursor}, priority))
+
+    pending, page = fetch(None), 0
+    try:
+        while pending is not None:
+            connection = _connection_at(await pending, data_path)
+            pending, page = None, page + 1
+            page_info = connection.get("pageInfo", {})
+            if page_info.get("hasNextPage") and (max_pages is None or page < max_pages):
+                pending = fetch(page_info.get("endCursor"))
+            for edge in connection.get("edges", []):
+                yield edge["node"]
+    finally:
+        if pending is not None:
+            pending.cancel()
 
 
 # ─────────────────────────────────────────────
-# Product Filtering Helpers
+# Time-sliced Pagination
 # ─────────────────────────────────────────────
 
-def filter_products_by_price(products: list, max_price: float) -> list:
-    """
-    Filter summarized products where at least one variant price is <= max_price (PKR).
+# created_at slices a date-bounded scan is split into (1 = serial pagination).
+PAGINATION_SLICES = int(os.getenv("SHOPIFY_PAGINATION_SLICES", "4"))
 
-    Args:
-        products:   List of summarized product dicts (output of summarize_product).
-        max_price:  Maximum price in PKR.
+
+def _iso(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def created_at_slices(start: date, end: date, n: int = PAGINATION_SLICES) -> list[str]:
     """
-    result = []
-    for p in products:
-        prices = []
-        for v in p.get("variants", []):
-            raw = v.get("price", "").replace("Rs.", "").replace(",", "").strip()
-            try:
-                prices.append(float(raw))
-            except ValueError:
-                pass
-        if prices and min(prices) <= max_price:
-            result.append(p)
-    return result
-
-
-def filter_products_by_name(products: list, name_query: str) -> list | str:
+    Split [start, end) into n equal created_at search clauses for
+    gql_paginated(slices=...). The outer slices are open-ended, so together
+    they cover whatever bounds the base filter itself applies.
     """
-    Filter products by fuzzy name match.
+    lo = datetime.combine(start, time(), timezone.utc)
+    hi = datetime.combine(end, time(), timezone.utc)
+    if n <= 1 or hi <= lo:
+        return []
+    cuts = [_iso(lo + (hi - lo) * k / n) for k in range(1, n)]
+    clauses = [f'created_at:<"{cuts[0]}"']
+    clauses += [f'created_at:>="{a}" AND created_at:<"{b}"' for a, b in zip(cuts, cuts[1:])]
+    clauses.append(f'created_at:>="{cuts[-1]}"')
+    return clauses
+
+
+def _slice_variables(variables: dict, slices: list[str]) -> list[dict]:
+    base = variables.get("query")
+    return [{**variables, "query": f"({base}) AND {clause}" if base else clause} for clause in slices]
+
+
+def _node_order(node: dict) -> tuple:
+    # Numeric gid suffix, Shopify's default (ID) sort order for connections.
+    tail = str(node.get("id", "")).rsplit("/", 1)[-1]
+    return (0, int(tail), "") if tail.isdigit() else (1, 0, tail)
+
+
+def _dedupe(nodes) -> Iterator[dict]:
+    """Drop repeats of an id already seen (a node on a slice boundary); id-less nodes pass through."""
+    seen = set()
+    for node in nodes:
+        node_id = node.get("id")
+        if node_id is not None:
+            if node_id in seen:
+                continue
+            seen.add(node_id)
+        yield node
+
+
+def _merge_slices(pages: list[list]) -> list:
+    """Merge per-slice results (each already in id order) into one id-ordered, de-duplicated list."""
+    return list(_dedupe(heapq.merge(*pages, key=_node_order)))
+
+
+async def _amerge_streams(streams: list) -> AsyncIterator[dict]:
+    """Async heapq.merge of id-ordered node streams, de-duplicated."""
+    heads = await asyncio.gather(*(anext(stream, None) for stream in streams))
+    heap = [(_node_order(node), k, node) for k, node in enumerate(heads) if node is not None]
+    heapq.heapify(heap)
+    seen = set()
+    while heap:
+        _, k, node = heapq.heappop(heap)
+        node_id = node.get("id")
+        if node_id is None or node_id not in seen:
+            if node_id is not None:
+                seen.add(node_id)
+            yield node
+        following = await anext(streams[k], None)
+        if following is not None:
+            heapq.heappush(heap, (_node_order(following), k, following))
 
-    Returns:
-        - list of matched product dicts on a confident single match.
-        - str disambiguation message if multiple close matches exist.
-        - str not-found message if no match meets the confidence threshold.
+
+# ─────────────────────────────────────────────
+# Concurrency Helpers
+# ─────────────────────────────────────────────
+
+# Max independent Shopify scans a single tool call runs at once (sync and async).
+FANOUT_WORKERS = int(os.getenv("SHOPIFY_FANOUT_WORKERS", "4"))
+
+_fanout_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="shopify-fanout")
+
+# Page prefetches for iter_gql_paginated(). Separate from the fan-out pool:
+# prefetches are often issued from fan-out workers, and they never wait on
+# each other, so this pool can't deadlock.
+_prefetch_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="shopify-prefetch")
+_fanout_local = threading.local()
+
+
+def _run_on_pool(fn, item):
+    _fanout_local.active = True
+    try:
+        return fn(item)
+    finally:
+        _fanout_local.active = False
+
+
+def run_bounded(fn, items) -> list:
     """
-    if not name_query or not name_query.strip():
-        return products
+    Apply fn to every item on the shared fan-out pool; results keep input order.
 
-    query_strip = name_query.strip()
-    titles = [p.get("title", "") for p in products if p.get("title")]
+    Calls made from inside a pool worker run inline, so nested fan-outs can't
+    deadlock the pool. Workers run in the caller's context, so a cancellation
+    scope (cancellation.py) covers them too.
+    """
+    items = list(items)
+    if len(items) <= 1 or getattr(_fanout_local, "active", False):
+        return [fn(item) for item in items]
+    futures = [run_in_context(_fanout_pool, _run_on_pool, fn, item) for item in items]
+    try:
+        return [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
 
-    # Exact (normalized) match takes priority
-    exact = is_same_string(query_strip, titles)
-    if exact:
-        return [p for p in products if p.get("title") == exact[0]]
 
-    fuzzy_matches = process.extract(
-        query_strip, titles,
-        scorer=fuzz.WRatio, processor=str.lower,
-        score_cutoff=65, limit=2,
-    )
-    matched = {m[0] for m in fuzzy_matches}
+async def arun_bounded(afn, items, limit: int = FANOUT_WORKERS) -> list:
+    """Async counterpart of run_bounded(): at most `limit` coroutines in flight, input order kept."""
+    semaphore = asyncio.Semaphore(limit)
 
-    if not matched:
-        return "No matching product found. Please refine your search."
-    if len(matched) > 1:
-        options = ", ".join(f'"{m}"' for m in matched)
-        return f"Multiple similar products found: [{options}]. Which one did you mean?"
+    async def run(item):
+        async with semaphore:
+            return await afn(item)
 
-    match = next(iter(matched))
-    return [p for p in products if p.get("title") == match]
+    return list(await asyncio.gather(*(run(item) for item in items)))
 
 
-def is_same_string(a: str, b: List[str]) -> List[str]:
-    """Return items from b that normalize-match a (strips non-alphanumeric, lowercased)."""
-    def normalize(s: str) -> str:
-        return re.sub(r"[^a-zA-Z0-9]", "", s).lower()
-    return [item for item in b if normalize(a) == normalize(item)]
+# ─────────────────────────────────────────────
+# Formatting Helpers
+# ─────────────────────────────────────────────
+
+def format_money(amount) -> str:
+    """Format a value as PKR. Handles None, empty string, float, and string inputs."""
+    try:
+        if amount is None or amount == "":
+            return "Rs. 0.00"
+        return f"Rs. {float(amount):,.2f}"
+    except (ValueError, TypeError):
+        return str(amount)
 
 
 # ─────────────────────────────────────────────
@@ -0,0 +1,230 @@
+"""
+webhooks.py — Shopify webhook verification and in-place cache updates.
+
+Shopify signs every webhook with HMAC-SHA256 over the raw request body using
+the app's secret, sent base64-encoded in `X-Shopify-Hmac-Sha256`. FastAPI.py
+verifies the signature and hands the parsed payload to dispatch(), which runs
+every handler registered for the topic with @on(topic).
+
+Product handlers patch the catalog mirror (catalog.py) directly, so product
+tools stay within seconds of Shopify without polling, and drop the cached
+admin reports built from product data (tool_cache.py). Order and refund
+handlers re-read the affected order into the order warehouse
+(order_warehouse.py), so admin reports see changes before the next sync, and
+drop the cached reports built from orders.
+Each side is skipped when its store is disabled.
+
+replay_webhooks.py signs and posts recorded payloads for local testing.
+
+Environment:
+    SHOPIFY_WEBHOOK_SECRET — App secret used to verify signatures. Without it every webhook is rejected.
+"""
+
+import os
+import re
+import hmac
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from html import unescape
+from dotenv import load_dotenv
+from catalog import catalog, CATALOG_ENABLED
+from order_warehouse import warehouse, WAREHOUSE_ENABLED
+from tool_cache import cache as tool_cache
+
+load_dotenv()
+
+WEBHOOK_SECRET = os.getenv("SHOPIFY_WEBHOOK_SECRET", "")
+
+TOPICS = (
+    "products/update",
+    "products/delete",
+    "inventory_levels/update",
+    "orders/create",
+    "orders/updated",
+    "refunds/create",
+)
+
+# Cached admin tools (admin_tools.py) whose results depend on product data.
+PRODUCT_REPORT_TOOLS = ("get_revenue_summary", "get_zero_sales_products", "get_low_inventory_products")
+STOCK_REPORT_TOOLS = ("get_low_inventory_products",)
+# ... and on order data.
+ORDER_REPORT_TOOLS = (
+    "get_revenue_summary",
+    "compare_sales_periods",
+    "get_refunded_orders",
+    "get_zero_sales_products",
+    "get_unfulfilled_orders",
+    "get_recent_orders",
+)
+
+
+# ─────────────────────────────────────────────
+# Verification
+# ─────────────────────────────────────────────
+
+def sign(body: bytes, secret: str = WEBHOOK_SECRET) -> str:
+    """Base64 HMAC-SHA256 of a raw webhook body, as Shopify computes it."""
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+def verify_hmac(body: bytes, signature: str | None, secret: str = WEBHOOK_SECRET) -> bool:
+    """Constant-time check of the X-Shopify-Hmac-Sha256 header against the raw body."""
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(sign(body, secret), signature)
+
+
+# Shopify retries deliveries it thinks failed; remember recent webhook ids.
+_SEEN_LIMIT = 1000
+_seen_ids: OrderedDict = OrderedDict()
+_seen_lock = threading.Lock()
+
+
+def is_duplicate(webhook_id: str | None) -> bool:
+    """True if this X-Shopify-Webhook-Id was already accepted recently."""
+    if not webhook_id:
+        return False
+    with _seen_lock:
+        if webhook_id in _seen_ids:
+            return True
+        _seen_ids[webhook_id] = None
+        if len(_seen_ids) > _SEEN_LIMIT:
+            _seen_ids.popitem(last=False)
+        return False
+
+
+# ─────────────────────────────────────────────
+# Dispatch
+# ─────────────────────────────────────────────
+
+_handlers: dict[str, list] = {topic: [] for topic in TOPICS}
+
+
+def on(topic: str):
+    """Register a handler(payload: dict) for a webhook topic."""
+    if topic not in _handlers:
+        raise ValueError(f"Unsupported webhook topic: {topic}")
+
+    def register(fn):
+        _handlers[topic].append(fn)
+        return fn
+    return register
+
+
+def dispatch(topic: str, payload: dict) -> int:
+    """Run every handler for `topic`; returns how many ran. Handler errors are logged, not raised."""
+    handlers = _handlers.get(topic, [])
+    for fn in handlers:
+        try:
+            fn(payload)
+        except Exception as e:
+            print(f"Webhook handler {fn.__name__} failed for {topic}: {e}")
+    return len(handlers)
+
+
+# ─────────────────────────────────────────────
+# Payload Conversion
+# ─────────────────────────────────────────────
+
+def _gid(resource: str, numeric_id) -> str:
+    return f"gid://shopify/{resource}/{numeric_id}"
+
+
+def _plain_text(html: str | None) -> str:
+    """Approximate GraphQL's `description` (plain text) from REST `body_html`."""
+    return re.sub(r"\s+", " ", unescape(re.sub(r"<[^>]+>", " ", html or ""))).strip()
+
+
+def product_node_from_rest(payload: dict) -> dict:
+    """
+    Convert a REST products/* webhook payload into the GraphQL node shape the
+    catalog stores (see catalog._MIRROR_FIELDS).
+
+    updatedAt is deliberately omitted — webhook timestamps carry the shop's UTC
+    offset and must not move the catalog's sync cursor.
+    """
+    tags = payload.get("tags") or ""
+    return {
+        "id": payload.get("admin_graphql_api_id") or _gid("Product", payload.get("id")),
+        "title": payload.get("title", ""),
+        "tags": [t.strip() for t in tags.split(",") if t.strip()] if isinstance(tags, str) else tags,
+        "description": _plain_text(payload.get("body_html")),
+        "status": (payload.get("status") or "active").upper(),
+        "variants": {
+            "edges": [
+                {
+                    "node": {
+                        "title": v.get("title", "Default Title"),
+                        "price": v.get("price", "0"),
+                        "sku": v.get("sku", ""),
+                        "inventoryQuantity": v.get("inventory_quantity", 0),
+                        "inventoryItem": {"id": _gid("InventoryItem", v.get("inventory_item_id"))},
+                    }
+                }
+                for v in (payload.get("variants") or [])[:20]
+            ]
+        },
+    }
+
+
+# ─────────────────────────────────────────────
+# Catalog Handlers
+# ─────────────────────────────────────────────
+
+@on("products/update")
+def _product_updated(payload: dict) -> None:
+    try:
+        if CATALOG_ENABLED:
+            catalog.apply([product_node_from_rest(payload)], advance_cursor=False)
+    finally:
+        # After the mirror changes, so a report recomputed meanwhile isn't kept.
+        tool_cache.invalidate(PRODUCT_REPORT_TOOLS)
+
+
+@on("products/delete")
+def _product_deleted(payload: dict) -> None:
+    try:
+        if CATALOG_ENABLED:
+            catalog.remove(_gid("Product", payload.get("id")))
+    finally:
+        tool_cache.invalidate(PRODUCT_REPORT_TOOLS)
+
+
+@on("inventory_levels/update")
+def _inventory_updated(payload: dict) -> None:
+    try:
+        if not CATALOG_ENABLED:
+            return
+        # The payload only has a per-location level, so re-read the product's totals.
+        product_id = catalog.product_for_inventory_item(_gid("InventoryItem", payload.get("inventory_item_id")))
+        if product_id:
+            catalog.refresh_products([product_id])
+    finally:
+        tool_cache.invalidate(STOCK_REPORT_TOOLS)
+
+
+# ─────────────────────────────────────────────
+# Order Warehouse Handlers
+# ─────────────────────────────────────────────
+
+@on("orders/create")
+@on("orders/updated")
+def _order_changed(payload: dict) -> None:
+    try:
+        if WAREHOUSE_ENABLED:
+            warehouse.refresh_orders([payload.get("admin_graphql_api_id") or _gid("Order", payload.get("id"))])
+    finally:
+        # Live scans are cached too, so this runs with the warehouse off as well.
+        tool_cache.invalidate(ORDER_REPORT_TOOLS)
+
+
+@on("refunds/create")
+def _refund_created(payload: dict) -> None:
+    try:
+        if WAREHOUSE_ENABLED:
+            warehouse.refresh_orders([_gid("Order", payload.get("order_id"))])
+    finally:
+        tool_cache.invalidate(ORDER_REPORT_TOOLS)